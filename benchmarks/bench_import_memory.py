@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Memory of imported frames: every column read as-is versus the compact schema of the importers.
+
+The test statements are repeated to a large export first:
+
+    python benchmarks/bench_import_memory.py [-r 2000]
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import sys
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from import_deg import import_transactions  # noqa: E402
+from import_ibkr import import_ibkr_stock_transactions, IMPORT_PREFIX, ASSET_STOCKS  # noqa: E402
+
+DEGIRO_TEST_FILE = ROOT / "tests/test_data/Transactions-deg-en-2021.csv"
+IBKR_TEST_FILE = ROOT / "tests/test_data/U74_2022_test.csv"
+
+
+def repeat_degiro(path: Path, out: Path, repeat: int) -> None:
+    header, *rows = path.read_text(encoding="utf8").splitlines(keepends=True)
+    out.write_text(header + "".join(rows * repeat), encoding="utf8")
+
+
+def repeat_ibkr(path: Path, out: Path, repeat: int) -> None:
+    lines = path.read_text(encoding="utf-8").splitlines(keepends=True)
+    trades = [line for line in lines if line.startswith(f"{IMPORT_PREFIX}{ASSET_STOCKS}")]
+    at = lines.index(trades[-1]) + 1
+    out.write_text("".join(lines[:at] + trades * (repeat - 1) + lines[at:]), encoding="utf-8")
+
+
+def plain_ibkr(path: Path) -> pd.DataFrame:
+    """The stock trades with pandas' default dtypes, like the importer before the compact schema."""
+    df = import_ibkr_stock_transactions([path])
+    return df.astype({"Currency": object, "Symbol": object, "Quantity": "float64"})
+
+
+def megabytes(df: pd.DataFrame) -> float:
+    return df.memory_usage(deep=True).sum() / 2**20
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Benchmark memory of imported frames")
+    p.add_argument("-r", "--repeat", type=int, default=2000, help="Copies of the test trades (default: 2000)")
+    args = p.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        deg_path, ibkr_path = Path(tmp) / "deg.csv", Path(tmp) / "ibkr.csv"
+        repeat_degiro(DEGIRO_TEST_FILE, deg_path, args.repeat)
+        repeat_ibkr(IBKR_TEST_FILE, ibkr_path, args.repeat)
+        with contextlib.redirect_stdout(io.StringIO()):
+            cases = {
+                "degiro": (pd.read_csv(deg_path, encoding="utf8"), import_transactions(str(deg_path))),
+                "ibkr": (plain_ibkr(ibkr_path), import_ibkr_stock_transactions([ibkr_path])),
+            }
+
+    print(f"{'export':<8} {'rows':>9} {'all columns':>12} {'compact':>9} {'saved':>6}")
+    for name, (plain, compact) in cases.items():
+        saved = 1 - megabytes(compact) / megabytes(plain)
+        print(f"{name:<8} {len(compact):>9} {megabytes(plain):10.1f}MB {megabytes(compact):7.1f}MB {saved:6.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Startup-time benchmark for the common main.py invocations.
+
+Every case runs in a fresh interpreter, so the numbers include module import time:
+
+    python benchmarks/bench_startup.py [-n 5]
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+IBKR_TEST_FILE = "tests/test_data/U74_2022_test.csv"
+
+CASES: dict[str, list[str]] = {
+    "import core": ["-c", "import optimizer, transaction"],
+    "import main": ["-c", "import main"],
+    "--help": ["main.py", "--help"],
+    "argument error": ["main.py", "--deg", "--ibkr", "x.csv"],
+    "unknown strategy": ["main.py", "--ibkr", "--strategy", "nope", IBKR_TEST_FILE],
+    "ibkr one symbol": ["main.py", "--ibkr", "--year", "2022", "--fifo", "--symbols", "MELI", IBKR_TEST_FILE],
+}
+
+
+def time_case(argv: list[str], repeat: int) -> list[float]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *argv], cwd=ROOT,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Benchmark CLI startup time")
+    p.add_argument("-n", "--repeat", type=int, default=5, help="Runs per case (default: 5)")
+    args = p.parse_args()
+
+    print(f"{'case':<20} {'median':>9} {'min':>9}")
+    for name, argv in CASES.items():
+        timings = time_case(argv, args.repeat)
+        print(f"{name:<20} {statistics.median(timings) * 1000:7.1f}ms {min(timings) * 1000:7.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
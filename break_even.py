@@ -0,0 +1,134 @@
+"""
+Vectorized break-even prices (BEP), the running average cost of the held shares of one product.
+
+A sale removes shares at the current BEP and leaves it unchanged, so the BEP only changes at buys. With h
+shares held before a buy of n shares at price p, ``BEP_k = a_k * BEP_k-1 + b_k`` for ``a_k = h / (h + n)``
+and ``b_k = n * p / (h + n)``. This linear recurrence is solved with cumulative sums: with
+``P_k = a_1 * ... * a_k``, ``BEP_k = P_k * sum(b_j / P_j for j <= k)``. The sums restart at every buy opening
+a position (h = 0), grouped per position episode; as P only shrinks, an episode is also cut wherever P
+falls below ``exp(-MAX_LOG_SCALE)``, and its next part continues from the last BEP. Sales take the BEP of
+the last buy.
+
+Quantized to ``IMPORT_PRECISION``, the result equals ``optimizer.calculate_break_even_prices``: the float
+error stays below about ``n * eps`` relative for n trades, and the few BEPs within ``BOUNDARY_ULPS`` times
+that of a rounding boundary are taken from a Decimal replay of the reference recurrence instead. For
+histories so long that the band covers whole units, this replays every trade.
+"""
+from __future__ import annotations
+
+import itertools
+from decimal import Decimal
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from transaction import IMPORT_PRECISION, Transaction
+
+MAX_LOG_SCALE = 300.0  # Keeps b / P well within the float range.
+BOUNDARY_ULPS = 32      # Margin of the float error bound (n + MAX_LOG_SCALE) * eps; measured up to 0.6 n eps.
+
+
+def _buy_beps(held_before: np.ndarray, count: np.ndarray, price: np.ndarray) -> np.ndarray:
+    """BEP after each buy, for buys in time order with the shares held before them."""
+    total = held_before + count
+    opened = held_before == 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_a = np.where(opened, 0.0, np.log(held_before / total))
+        b = count * price / total
+    episode = np.cumsum(opened)
+    log_scale = np.cumsum(log_a)
+    starts = np.flatnonzero(opened)
+    log_scale -= log_scale[starts][episode - 1]  # Relative to the opening buy of the episode.
+
+    level = np.floor(-log_scale / MAX_LOG_SCALE).astype(np.int64)
+    bep = np.empty(len(count))
+    for lvl in np.unique(level):
+        rows = np.flatnonzero(level == lvl)
+        new_part = np.r_[True, (np.diff(rows) != 1) | opened[rows[1:]]]  # Contiguous rows of one episode.
+        part = np.cumsum(new_part)
+        first = rows[new_part]
+        # Parts after the first level continue from the BEP of the buy before them.
+        carry = np.where(opened[first], 0.0, bep[np.maximum(first - 1, 0)])
+        base = np.where(opened[first], 0.0, log_scale[np.maximum(first - 1, 0)])
+        scale = np.exp(log_scale[rows] - base[part - 1])
+        sums = pd.Series(b[rows] / scale).groupby(part).cumsum().to_numpy()
+        bep[rows] = scale * (carry[part - 1] + sums)
+    return bep
+
+
+def break_even_prices(count: np.ndarray, price: np.ndarray) -> np.ndarray:
+    """
+    BEP at each trade of one product in time order: after a buy, and before (= after) a sale; NaN for
+    sales with no shares held. Sales must not exceed the held shares.
+    """
+    count = np.asarray(count, dtype=np.float64)
+    price = np.asarray(price, dtype=np.float64)
+    held = np.cumsum(count)
+    if np.any(held < 0):
+        raise ValueError(f"Break-even prices need a long position, sold {-held.min():g} shares more than held")
+    held_before = held - count
+    is_buy = count >= 0
+
+    bep = np.full(len(count), np.nan)
+    buys = np.flatnonzero(is_buy)
+    bep[buys] = _buy_beps(held_before[buys], count[buys], price[buys])
+    last_buy = np.maximum.accumulate(np.where(is_buy, np.arange(len(count)), -1))
+    sales = np.flatnonzero(~is_buy & (held_before > 0))
+    bep[sales] = bep[last_buy[sales]]
+    return bep
+
+
+def _reference_beps(counts: List[int], prices: List[Decimal], stop: int) -> List[Decimal]:
+    """The BEPs of optimizer.calculate_break_even_prices for the first *stop* trades, same Decimal steps."""
+    quantity, total_cost, beps = 0, Decimal(0), []
+    for count, price in zip(counts[:stop], prices[:stop]):
+        if count >= 0:
+            total_cost += count * price
+            quantity += count
+            beps.append(total_cost / quantity)
+        else:
+            bep = total_cost / quantity
+            beps.append(bep)
+            total_cost += count * bep
+            quantity += count
+    return beps
+
+
+def quantized_break_even_prices(counts: List[int], prices: List[Decimal]) -> List[Decimal]:
+    """break_even_prices quantized to IMPORT_PRECISION exactly like the Decimal reference rounds them."""
+    bep = break_even_prices(counts, [float(p) for p in prices])
+    unit = float(IMPORT_PRECISION)
+    tolerance = BOUNDARY_ULPS * (len(bep) + MAX_LOG_SCALE) * np.finfo(np.float64).eps * np.maximum(np.abs(bep), 1.0)
+    near = np.flatnonzero(np.abs(bep / unit % 1.0 - 0.5) * unit <= tolerance)
+    result = [Decimal(b).quantize(IMPORT_PRECISION) for b in bep.tolist()]
+    if len(near):
+        exact = _reference_beps(counts, prices, int(near[-1]) + 1)
+        for i in near.tolist():
+            result[i] = exact[i].quantize(IMPORT_PRECISION)
+    return result
+
+
+def calculate_break_even_prices_vectorized(txs: List[Transaction], reset_yearly: bool = False) -> List[Transaction]:
+    """
+    Copies of *txs* carrying the break-even price, quantized to IMPORT_PRECISION. With *reset_yearly*,
+    every year starts from the held shares at the previous year-end BEP rounded to IMPORT_PRECISION,
+    like the average price of a yearly statement, instead of continuing the exact average.
+    """
+    counts = [int(t.count) for t in txs]
+    prices = [t.share_price for t in txs]
+    if not reset_yearly:
+        bep = quantized_break_even_prices(counts, prices)
+    else:
+        bep, held, carried = [], 0, None
+        for _, rows in itertools.groupby(range(len(txs)), key=lambda i: txs[i].time.year):
+            rows = list(rows)
+            year_counts, year_prices = [counts[i] for i in rows], [prices[i] for i in rows]
+            if held:
+                # The carried shares enter the year as one buy at the rounded year-end BEP.
+                bep += quantized_break_even_prices([held] + year_counts, [carried] + year_prices)[1:]
+            else:
+                bep += quantized_break_even_prices(year_counts, year_prices)
+            held += sum(year_counts)
+            carried = bep[-1]
+    return [t.with_bep(b) for t, b in zip(txs, bep)]
@@ -0,0 +1,75 @@
+"""
+Year-boundary checkpoints of a pairing run.
+
+Before the first transaction of every year, the pairing loop saves the per-product lot state: remaining counts
+and fee availability of the buys, the open shorts and how far the pairing result has grown. Snapshots are
+copy-on-write: the first one holds every buy, each later one only the lots written since its parent. They
+refer to transactions by their index in the run's transaction list, so they can be pickled and spilled to
+disk.
+
+``optimizer.rerun_year`` restores a snapshot and pairs the remaining years again under other strategies.
+"""
+import os
+import pickle
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+LotState = Tuple[int, bool]  # remaining count, fee available
+
+
+@dataclass
+class LotStateSnapshot:
+    position: int                     # Index of the next transaction in chronological order.
+    lots: Dict[int, LotState]         # Lots written since the parent snapshot (all buys in the first one).
+    parent: Optional[int]             # Year of the previous snapshot.
+    open_shorts: List[Tuple[int, int]]  # (sale index, shares still open), in FIFO order.
+    sale_count: int                   # Sale records of the pairing result so far.
+    pair_count: int                   # Pairs of the pairing result so far.
+
+
+class CheckpointStore:
+    """Snapshots of one pairing run by year, kept in memory or pickled to *spill_dir*."""
+    def __init__(self, spill_dir: Optional[str] = None):
+        self.spill_dir = spill_dir
+        self._snapshots: Dict[int, LotStateSnapshot] = {}
+        self._years: List[int] = []
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    @property
+    def years(self) -> List[int]:
+        return list(self._years)
+
+    def _path(self, year: int) -> str:
+        return os.path.join(self.spill_dir, f"lots-{year}.pkl")
+
+    def save(self, year: int, snapshot: LotStateSnapshot) -> None:
+        if self.spill_dir:
+            with open(self._path(year), 'wb') as f:
+                pickle.dump(snapshot, f)
+        else:
+            self._snapshots[year] = snapshot
+        self._years.append(year)
+
+    def load(self, year: int) -> LotStateSnapshot:
+        if year not in self._years:
+            raise KeyError(f"No checkpoint for {year}")
+        if not self.spill_dir:
+            return self._snapshots[year]
+        with open(self._path(year), 'rb') as f:
+            return pickle.load(f)
+
+    def lot_state(self, year: int) -> Dict[int, LotState]:
+        """Full lot state at the start of *year*, composed along the parent chain."""
+        chain = []
+        snapshot = self.load(year)
+        while True:
+            chain.append(snapshot.lots)
+            if snapshot.parent is None:
+                break
+            snapshot = self.load(snapshot.parent)
+
+        state: Dict[int, LotState] = {}
+        for lots in reversed(chain):
+            state.update(lots)
+        return state
@@ -0,0 +1,103 @@
+"""
+Side-by-side comparison of pairing strategies.
+
+Every product is converted and split-adjusted once. The configured strategies pair it once with year
+checkpoints, then every candidate strategy re-pairs from the start of each compared year only (see
+``optimizer.rerun_year``), on its own lot overlay. Products are independent, so they are evaluated in
+worker processes when more than one worker is requested.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Dict, List, Tuple, Union
+
+from checkpoints import CheckpointStore
+from optimizer import pair_transactions, rerun_year, calculate_break_even_prices, calculate_tax, \
+    calculate_totals, calculate_untaxed_totals
+from transaction import Transaction
+
+# year -> strategy -> totals
+ProductComparison = Dict[int, Dict[str, 'Totals']]
+
+
+@dataclass(frozen=True)
+class Totals:
+    income: Decimal = Decimal(0)
+    cost: Decimal = Decimal(0)
+    fees: Decimal = Decimal(0)
+    untaxed_count: int = 0
+
+    @property
+    def profit(self) -> Decimal:
+        return self.income - self.cost
+
+    @property
+    def taxable(self) -> Decimal:
+        """Profit after fees, the amount the strategies are ranked by."""
+        return self.income - self.cost - self.fees
+
+    def __add__(self, other: 'Totals') -> 'Totals':
+        return Totals(self.income + other.income, self.cost + other.cost, self.fees + other.fees,
+                      self.untaxed_count + other.untaxed_count)
+
+
+def compare_product(txs: List[Transaction], years: List[int], strategies: Dict[int, str], candidates: List[str],
+                    enable_bep: bool = False, enable_ttest: bool = False) -> ProductComparison:
+    """Totals of every candidate strategy in each of *years*, the other years paired by *strategies*."""
+    if enable_bep:
+        txs = calculate_break_even_prices(txs)
+    checkpoints = CheckpointStore()
+    base = pair_transactions(txs, strategies, enable_ttest=enable_ttest, checkpoints=checkpoints)
+
+    comparison = {}
+    for year in years:
+        results = {strategies[year]: base}
+        results.update(rerun_year(
+            txs, base, checkpoints, year,
+            {name: {**strategies, year: name} for name in candidates if name not in results},
+            enable_ttest=enable_ttest))
+
+        comparison[year] = {}
+        for name in candidates:
+            report = results[name].sale_records()
+            calculate_tax(report, year, enable_bep, enable_ttest)
+            comparison[year][name] = Totals(*calculate_totals(report, year), calculate_untaxed_totals(report, year))
+    return comparison
+
+
+def compare_products(products: Dict[str, List[Transaction]], years: List[int], strategies: Dict[int, str],
+                     candidates: List[str], enable_bep: bool = False, enable_ttest: bool = False, *,
+                     workers: int = 1) -> Dict[str, Union[ProductComparison, Exception]]:
+    """``compare_product`` for every product; a product that fails maps to its exception."""
+    args = (years, strategies, candidates, enable_bep, enable_ttest)
+    results: Dict[str, Union[ProductComparison, Exception]] = {}
+    if workers <= 1:
+        for pid, txs in products.items():
+            try:
+                results[pid] = compare_product(txs, *args)
+            except Exception as e:
+                results[pid] = e
+        return results
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pid: pool.submit(compare_product, txs, *args) for pid, txs in products.items()}
+        for pid, future in futures.items():
+            try:
+                results[pid] = future.result()
+            except Exception as e:
+                results[pid] = e
+    return results
+
+
+def best_by_year(comparisons: List[ProductComparison]) -> Dict[int, Tuple[str, Dict[str, Totals]]]:
+    """Per year the strategy with the lowest profit after fees over all products, and the summed totals."""
+    summed: Dict[int, Dict[str, Totals]] = {}
+    for comparison in comparisons:
+        for year, by_strategy in comparison.items():
+            year_totals = summed.setdefault(year, {})
+            for name, totals in by_strategy.items():
+                year_totals[name] = year_totals.get(name, Totals()) + totals
+
+    # min() keeps the first of equal strategies, i.e. the candidate order decides ties.
+    return {year: (min(totals, key=lambda name: totals[name].taxable), totals)
+            for year, totals in sorted(summed.items())}
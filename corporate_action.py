@@ -6,11 +6,14 @@ from datetime import datetime
 
 import pandas as pd
 
+from timeline import SPLIT, product_timeline
+
 
 def load_stock_splits(path: str) -> pd.DataFrame:
     try:
         df = pd.read_csv(path, parse_dates=["Report Date"])
-        return df[["Symbol", "ISIN", "Report Date", "Numerator", "Denominator"]]
+        # Identifier changes (see identifiers.load_identifier_index) have no ratio.
+        return df.loc[df["Numerator"].notna(), ["Symbol", "ISIN", "Report Date", "Numerator", "Denominator"]]
     except FileNotFoundError:
         raise SystemExit("Stock split file, " + path + " not found.")
 
@@ -22,7 +25,7 @@ def apply_stock_splits_for_product(
     *,
     id_col: str,
 ) -> None:
-    """Mutates *tx_list* in-place, adjusting quantities and prices."""
+    """Replaces the product's transactions in *tx_list* by split-adjusted copies."""
     if not tx_list:
         return
     
@@ -53,12 +56,20 @@ def apply_stock_splits_for_product(
             print("  First transaction time: %s (last split 2022-08-25)" % first_tx_time)
             raise ValueError("Missing stock split data for %s" % (product_id))
 
+    ratios = []
     for _, split in s.iterrows():
         print("Applying stock split %d:%d, product id %s, cut off %s"
               % (split["Numerator"], split["Denominator"], product_id, split["ts"]))
+        ratios.append((int(split["Numerator"]), int(split["Denominator"])))
 
-        numerator, denominator = int(split["Numerator"]), int(split["Denominator"])
-        cut_off = split["ts"]
-        for tx in tx_list:
-            if tx.isin == product_id and tx.time.date() < cut_off.date():
-                tx.apply_split(numerator, denominator)
+    # Walking the timeline backwards, every trade gets the splits after its day, in time order.
+    rows = [i for i, tx in enumerate(tx_list) if tx.isin == product_id]
+    events = product_timeline([tx_list[i].time for i in rows], s["ts"].dt.normalize().to_numpy())
+    later = []
+    for event in reversed(list(events)):
+        if event.kind == SPLIT:
+            later.insert(0, ratios[event.index])
+            continue
+        i = rows[event.index]
+        for numerator, denominator in later:
+            tx_list[i] = tx_list[i].with_split(numerator, denominator)
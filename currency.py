@@ -1,5 +1,6 @@
 import decimal
 from decimal import Decimal
+from typing import Dict, List
 
 FIRST_YEAR = 2017
 LAST_YEAR = 2025
@@ -9,54 +10,65 @@ LAST_YEAR = 2025
 # https://www.kodap.cz/cs/pro-vas/prehledy/jednotny-kurz/jednotne-kurzy-men-stanovene-ministerstvem-financi-prehled.html
 # https://www.kurzy.cz/kurzy-men/jednotny-kurz/2017/
 
+# Rates from FIRST_YEAR onwards, per source currency.
+UNIFIED_RATES: Dict[str, List[Decimal]] = {
+    'USD': [
+        Decimal('23.18'),  # 2017 == FIRST_YEAR, TODO: add a couple more previous years
+        Decimal('21.78'),
+        Decimal('22.93'),
+        Decimal('23.14'),  # 2020
+        Decimal('21.72'),
+        Decimal('23.41'),
+        Decimal('22.14'),
+        Decimal('23.28'),
+        Decimal('22.30'),   # LAST_YEAR; TODO: Update!
+    ],
+    'EUR': [
+        Decimal('26.29'),  # 2017
+        Decimal('25.68'),
+        Decimal('25.66'),
+        Decimal('26.50'),  # 2020
+        Decimal('25.65'),
+        Decimal('24.54'),
+        Decimal('23.97'),
+        Decimal('25.16'),
+        Decimal('25.00'),   # LAST_YEAR; TODO: Update!
+    ],
+    'CAD': [
+        Decimal('17.87'),  # 2017
+        Decimal('16.74'),
+        Decimal('17.32'),
+        Decimal('17.23'),  # 2020
+        Decimal('17.33'),
+        Decimal('17.93'),
+        Decimal('16.40'),
+        Decimal('16.96')   # 2024
+    ],
+}
+
+
 def unified_fx_rate(year: int, from_curr: str, to_curr: str = 'CZK') -> decimal:
     if to_curr != 'CZK':
         raise ValueError(f"Unsupported target currency: {to_curr}")
 
-    if from_curr == 'USD':
-        rates = [
-            Decimal('23.18'),  # 2017 == FIRST_YEAR, TODO: add a couple more previous years
-            Decimal('21.78'),
-            Decimal('22.93'),
-            Decimal('23.14'),  # 2020
-            Decimal('21.72'),
-            Decimal('23.41'),
-            Decimal('22.14'),
-            Decimal('23.28'),
-            Decimal('22.30'),   # LAST_YEAR; TODO: Update!
-        ]
-    elif from_curr == 'EUR':
-        rates = [
-            Decimal('26.29'),  # 2017
-            Decimal('25.68'),
-            Decimal('25.66'),
-            Decimal('26.50'),  # 2020
-            Decimal('25.65'),
-            Decimal('24.54'),
-            Decimal('23.97'),
-            Decimal('25.16'),
-            Decimal('25.00'),   # LAST_YEAR; TODO: Update!
-        ]
-    elif from_curr == 'CAD':
-        rates = [
-            Decimal('17.87'),  # 2017
-            Decimal('16.74'),
-            Decimal('17.32'),
-            Decimal('17.23'),  # 2020
-            Decimal('17.33'),
-            Decimal('17.93'),
-            Decimal('16.40'),
-            Decimal('16.96')   # LAST_YEAR
-        ]
-    else:
+    rates = UNIFIED_RATES.get(from_curr)
+    if rates is None:
         raise ValueError(f"Unsupported source currency: {from_curr}")
 
     if year < FIRST_YEAR or year > LAST_YEAR:
         raise ValueError(f"Year {year} is out of supported range ({FIRST_YEAR} to {LAST_YEAR}).")
+    if year >= FIRST_YEAR + len(rates):
+        raise ValueError(f"No {from_curr} rate for {year} yet.")
+
+    return rates[year - FIRST_YEAR]
+
 
-    return rates[year - 2017]
+def last_rate_year(currency: str) -> int:
+    """Last year with a unified rate of *currency*, or FIRST_YEAR - 1 if it is not supported."""
+    return FIRST_YEAR + len(UNIFIED_RATES.get(currency, ())) - 1
 
 
 def check_currency(currency: str):
-    unified_fx_rate(LAST_YEAR, currency)
+    if currency not in UNIFIED_RATES:
+        raise ValueError(f"Unsupported source currency: {currency}")
     return currency
@@ -0,0 +1,57 @@
+"""
+Removal of trades repeated across overlapping broker statements.
+
+Trades are identified by a 64-bit hash of their natural key: the Order ID for Degiro (with ISIN, time,
+quantity and price, so the partial fills of one order stay apart) and symbol, time, quantity, price and
+commission for IBKR. Identical fills within one statement are genuine and kept; a later statement only
+adds the occurrences of a key beyond the most any earlier statement had. Everything is done with grouped
+pandas operations on the hashes, linear in the number of rows.
+"""
+from __future__ import annotations
+
+from typing import List, Sequence
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+DEGIRO_KEY: List[str] = ["Order ID", "ISIN", "DateTime", "Quantity", "Price"]
+IBKR_KEY: List[str] = ["Symbol", "Date/Time", "Quantity", "T. Price", "Comm/Fee"]
+
+
+def key_columns(df: DataFrame) -> List[str]:
+    if "Order ID" in df.columns:
+        return DEGIRO_KEY
+    if "Symbol" in df.columns:
+        return IBKR_KEY
+    raise ValueError("Unknown dataframe format: no Order ID or Symbol column")
+
+
+def trade_hashes(df: DataFrame) -> pd.Series:
+    """Hash of every row's natural key."""
+    return pd.util.hash_pandas_object(df[key_columns(df)], index=False)
+
+
+def drop_duplicate_trades(frames: Sequence[DataFrame], names: Sequence[str]) -> DataFrame:
+    """Concatenate the statements *frames* (read from *names*) without the trades repeated between them."""
+    frames = list(frames)
+    df = pd.concat(frames, ignore_index=True)
+    if df.empty:
+        return df
+
+    file_ids = np.repeat(np.arange(len(frames)), [len(f) for f in frames])
+    keys = DataFrame({"file": file_ids, "hash": trade_hashes(df).to_numpy()})
+    occurrence = keys.groupby(["file", "hash"], sort=False).cumcount()
+
+    # Occurrences of each key per file, in file order, and the most any earlier file had.
+    counts = keys.groupby(["file", "hash"], sort=False).size().rename("count").reset_index()
+    most = counts.groupby("hash", sort=False)["count"].cummax()
+    counts["earlier"] = most.groupby(counts["hash"], sort=False).shift(fill_value=0)
+    earlier = keys.merge(counts[["file", "hash", "earlier"]], on=["file", "hash"], how="left")["earlier"]
+
+    keep = (occurrence.to_numpy() >= earlier.to_numpy())
+    removed = np.bincount(file_ids[~keep], minlength=len(frames))
+    if len(frames) > 1:
+        for name, frame, n in zip(names, frames, removed):
+            print(f"{name}: {n} of {len(frame)} trades already imported from other statements, dropped")
+    return df[keep].reset_index(drop=True)
@@ -0,0 +1,67 @@
+"""
+Aggregation of partial fills into orders before the conversion to Transactions.
+
+Degiro lists every fill of an order as its own row under the same Order ID, IBKR splits orders into
+executions of the same symbol, side and time. ``aggregate_fills`` merges them into one row per order:
+the summed quantity and fees, the volume-weighted average price and the other columns of the first fill;
+a ``Fills`` column counts the merged rows. Degiro rows without an Order ID stay as they are. The merged
+fills are returned with the time, quantity and price of their order, which is how the order's
+transaction appears in the pairings export.
+"""
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from import_deg import FEE_COLUMN
+from import_utils import detect_columns
+
+
+def _order_ids(df: DataFrame, id_col: str, date_col: str) -> np.ndarray:
+    if id_col == "ISIN":
+        keys = [df["ISIN"], df["Order ID"]]
+    else:
+        keys = [df["Symbol"], df[date_col], np.sign(df["Quantity"]).rename("Side")]
+    order = df.groupby(keys, sort=False, observed=True, dropna=False).ngroup().to_numpy()
+    if id_col == "ISIN":
+        # Trades without an Order ID are orders of their own.
+        unkeyed = df["Order ID"].isna().to_numpy()
+        order[unkeyed] = order.max(initial=-1) + 1 + np.arange(unkeyed.sum())
+    return order
+
+
+def aggregate_fills(df: DataFrame) -> (DataFrame, DataFrame):
+    """One row per order of *df*, and the fills merged into orders of several fills."""
+    id_col, date_col, _ = detect_columns(df)
+    price_col, fee_col = ("Price", FEE_COLUMN) if id_col == "ISIN" else ("T. Price", "Comm/Fee")
+    order = _order_ids(df, id_col, date_col)
+
+    quantity = df["Quantity"].to_numpy()
+    by_order = pd.DataFrame({
+        "quantity": quantity,
+        "value": quantity * df[price_col].to_numpy(),
+        "fee": df[fee_col].to_numpy(),
+        "time": df[date_col].to_numpy(),
+    }).groupby(order, sort=False)
+    totals = by_order.agg(fills=("quantity", "size"), quantity=("quantity", "sum"), value=("value", "sum"),
+                          time=("time", "min"))
+    totals["fee"] = by_order["fee"].sum(min_count=1)
+
+    # An order keeps the other columns of its first fill, in the row order of the input.
+    by_time = np.lexsort((df[date_col].to_numpy(), order))
+    first = np.sort(by_time[np.r_[True, order[by_time][1:] != order[by_time][:-1]]]) if len(df) else by_time
+    orders = df.iloc[first].copy()
+    merged = totals.loc[order[first]]
+    orders["Quantity"] = merged["quantity"].to_numpy().astype(df["Quantity"].dtype)
+    orders[price_col] = np.where(merged["fills"] > 1, merged["value"] / merged["quantity"], orders[price_col])
+    orders[fee_col] = merged["fee"].to_numpy()
+    orders["Fills"] = merged["fills"].to_numpy()
+
+    in_merged = totals["fills"].loc[order].to_numpy() > 1
+    fills = df[in_merged].copy()
+    of_fill = totals.loc[order[in_merged]]
+    fills["OrderTime"] = of_fill["time"].to_numpy()
+    fills["OrderQuantity"] = of_fill["quantity"].to_numpy()
+    fills["OrderPrice"] = (of_fill["value"] / of_fill["quantity"]).to_numpy()
+    return orders, fills
@@ -0,0 +1,154 @@
+"""
+Resolution of changed and aliased product identifiers to one canonical product id.
+
+Symbols and ISINs that name the same product are joined in a union-find forest: every "CUSIP/ISIN Change"
+corporate action joins the old symbol and ISIN with the new ones, and every row of an alias file
+(``Identifier,Alias``) joins the alias with the identifier. Each set keeps its newest symbol and ISIN, the
+alias file's identifiers taking precedence over the corporate actions. ``canonical`` maps a symbol to the
+set's symbol and an ISIN to its ISIN, so trades keyed by either id continue as one product across the
+change; identifiers never joined resolve to themselves. Listings of one ISIN under different symbols (TSLA
+in USD and TL0 in EUR) stay separate products unless an alias joins them.
+"""
+from __future__ import annotations
+
+import csv
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+import pandas as pd
+from pandas import DataFrame
+
+from import_utils import detect_columns
+
+ISIN_CHANGE = "CUSIP/ISIN Change"
+
+_ISIN_RE = re.compile(r"^[A-Z]{2}[A-Z0-9]{9}[0-9]$")
+# OLD(OLDISIN) CUSIP/ISIN Change to (NEWISIN) (NEW, NAME, NEWISIN)
+_CHANGE_RE = re.compile(r"^\s*([^(]+?)\s*\(\s*([A-Z0-9]{12})\s*\).*\(([^,()]+),.*,\s*([A-Z0-9]{12})\s*\)\s*$")
+
+
+def id_kind(identifier: str) -> str:
+    return "ISIN" if _ISIN_RE.match(identifier) else "Symbol"
+
+
+def parse_identifier_change(description: str) -> Tuple[str, str, str, str]:
+    """(old symbol, old ISIN, new symbol, new ISIN) of an IBKR "CUSIP/ISIN Change" description."""
+    m = _CHANGE_RE.match(description or "")
+    if not m:
+        raise ValueError(f"No identifier change found in: {description!r}")
+    old_symbol, old_isin, new_symbol, new_isin = (g.strip() for g in m.groups())
+    return old_symbol, old_isin, new_symbol, new_isin
+
+
+class IdentifierIndex:
+    def __init__(self):
+        self._parent: Dict[str, str] = {}
+        self._size: Dict[str, int] = {}
+        self._newest: Dict[str, Dict[str, str]] = {}  # root -> kind -> identifier
+
+    def __len__(self) -> int:
+        return len(self._parent)
+
+    def __contains__(self, identifier: str) -> bool:
+        return identifier in self._parent
+
+    def _add(self, identifier: str) -> None:
+        if identifier not in self._parent:
+            self._parent[identifier] = identifier
+            self._size[identifier] = 1
+            self._newest[identifier] = {id_kind(identifier): identifier}
+
+    def find(self, identifier: str) -> str:
+        """Root of the set of *identifier*, halving the path to it."""
+        parent = self._parent
+        while parent[identifier] != identifier:
+            parent[identifier] = parent[parent[identifier]]
+            identifier = parent[identifier]
+        return identifier
+
+    def _union(self, preferred: str, other: str) -> None:
+        """Join the sets of *preferred* and *other*, keeping the newest ids of *preferred*'s set over others."""
+        root, child = self.find(preferred), self.find(other)
+        if root == child:
+            return
+        newest = {**self._newest.pop(child), **self._newest.pop(root)}
+        if self._size[root] < self._size[child]:
+            root, child = child, root
+        self._parent[child] = root
+        self._size[root] += self._size.pop(child)
+        self._newest[root] = newest
+
+    def join(self, old: Iterable[str], new: Iterable[str]) -> None:
+        """Join the identifiers *old* and *new* of one product; *new* become the set's identifiers."""
+        identifiers = [i for i in new if i] + [i for i in old if i]
+        for identifier in identifiers:
+            self._add(identifier)
+        for identifier in identifiers[1:]:
+            self._union(identifiers[0], identifier)
+        newest = self._newest[self.find(identifiers[0])]
+        for identifier in new:
+            if identifier:
+                newest[id_kind(identifier)] = identifier
+
+    def canonical(self, identifier: str) -> str:
+        """The product id of *identifier*: its set's symbol or ISIN, like *identifier* is one."""
+        if identifier not in self._parent:
+            return identifier
+        return self._newest[self.find(identifier)].get(id_kind(identifier), identifier)
+
+    def members(self, identifier: str) -> List[str]:
+        """All identifiers joined with *identifier*, itself included."""
+        if identifier not in self._parent:
+            return [identifier]
+        root = self.find(identifier)
+        return [i for i in self._parent if self.find(i) == root]
+
+    def resolve_ids(self, df: DataFrame, columns: Iterable[str] = None) -> DataFrame:
+        """*df* with the product id column (or *columns*) mapped to canonical ids."""
+        columns = [detect_columns(df)[0]] if columns is None else columns
+        resolved = {}
+        for col in columns:
+            values = df[col]
+            mapping = {v: self.canonical(v) for v in pd.unique(values.astype(object)) if v in self._parent}
+            mapping = {v: c for v, c in mapping.items() if v != c}
+            if not mapping:
+                continue
+            mapped = values.astype(object).replace(mapping)
+            resolved[col] = mapped.astype("category") if isinstance(values.dtype, pd.CategoricalDtype) else mapped
+        return df.assign(**resolved) if resolved else df
+
+
+def load_aliases(path: str | Path) -> List[Tuple[str, str]]:
+    """(identifier, alias) rows of an alias CSV file with Identifier and Alias columns."""
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    if rows and not {"Identifier", "Alias"} <= set(rows[0]):
+        raise ValueError(f"{path}: alias file needs Identifier and Alias columns")
+    return [(row["Identifier"].strip(), row["Alias"].strip()) for row in rows]
+
+
+def build_identifier_index(corporate_actions: DataFrame = None,
+                           aliases: Iterable[Tuple[str, str]] = ()) -> IdentifierIndex:
+    """
+    Index of the identifier changes in *corporate_actions* (with Date/Time and Description columns, as
+    import_ibkr.import_corporate_actions returns them), in time order, and of the (identifier, alias) pairs.
+    """
+    index = IdentifierIndex()
+    if corporate_actions is not None and not corporate_actions.empty:
+        changes = corporate_actions[corporate_actions["Description"].str.contains(ISIN_CHANGE, na=False, regex=False)]
+        for description in changes.sort_values("Date/Time", kind="stable")["Description"]:
+            old_symbol, old_isin, new_symbol, new_isin = parse_identifier_change(description)
+            index.join([old_symbol, old_isin], [new_symbol, new_isin])
+    for identifier, alias in aliases:
+        index.join([alias], [identifier])
+    return index
+
+
+def load_identifier_index(corporate_actions_path: str | Path = None,
+                          aliases_path: str | Path = None) -> IdentifierIndex:
+    """build_identifier_index of the corporate actions CSV (see load_stock_splits) and the alias file."""
+    corporate_actions = None
+    if corporate_actions_path and Path(corporate_actions_path).exists():
+        corporate_actions = pd.read_csv(corporate_actions_path, usecols=["Date/Time", "Description"])
+    return build_identifier_index(corporate_actions, load_aliases(aliases_path) if aliases_path else ())
@@ -1,15 +1,35 @@
-import math
-import numbers
 from datetime import datetime
-from typing import List
+from typing import Collection, Iterator, List
 
 import pandas as pd
 from pandas import DataFrame
 
+from import_utils import compact_frame
+from timeline import time_order
 from transaction import Transaction
 
 
 FEE_CURRENCY = 'EUR'
+FEE_COLUMN = 'Transaction and/or third'
+
+# Columns read from the exports; the price and fee currencies are the unnamed columns right after them.
+KEEP_COLS = ['Date', 'Time', 'Product', 'ISIN', 'Quantity', 'Price', FEE_COLUMN, 'Order ID']
+DTYPES = {'Date': str, 'Time': str, 'Product': 'category', 'ISIN': 'category', 'Price': 'float64',
+          FEE_COLUMN: 'float64', 'Order ID': str}
+
+CZECH_COLUMNS = {
+    'Datum': 'Date',
+    'Čas': 'Time',
+    'Produkt': 'Product',
+    'Venue': 'Venue',
+    'Počet': 'Quantity',
+    'Cena': 'Price',
+    'Hodnota v domácí měně': 'Local value',
+    'Hodnota': 'Value',
+    'Směnný kurz': 'Exchange rate',
+    'Celkem': 'Total',
+    'ID objednávky': 'Order ID'
+}
 
 
 def eu_str_to_date(date_string: str) -> datetime:
@@ -28,32 +48,51 @@ def rename_columns_to_english(df: DataFrame):
     # Detect language, rename all columns to English
     if 'Datum' in df.columns:
         print("Renaming Czech columns to English.")
-        df.rename(columns={
-            'Datum': 'Date',
-            'Čas': 'Time',
-            'Produkt': 'Product',
-            'Venue': 'Venue',
-            'Počet': 'Quantity',
-            'Cena': 'Price',
-            'Hodnota v domácí měně': 'Local value',
-            'Hodnota': 'Value',
-            'Směnný kurz': 'Exchange rate',
-            'Celkem': 'Total',
-            'ID objednávky': 'Order ID'
-        }, inplace=True)
-
-
-def import_transactions(file_name: str):
-    df = pd.read_csv(file_name, encoding="utf8")
+        df.rename(columns=CZECH_COLUMNS, inplace=True)
+
+
+def read_degiro_csv(file_name: str, chunk_rows: int = None):
+    """
+    The KEEP_COLS and the two currency columns of the export, with English names and compact dtypes.
+    With *chunk_rows*, a reader of frames of that many rows is returned instead.
+    """
+    names = list(pd.read_csv(file_name, encoding="utf8", nrows=0).columns)
+    if 'Datum' in names:
+        print("Renaming Czech columns to English.")
+        names = [CZECH_COLUMNS.get(name, name) for name in names]
+    currency_cols = [names[names.index('Price') + 1], names[names.index(FEE_COLUMN) + 1]]
+    return pd.read_csv(file_name, encoding="utf8", header=0, names=names,
+                       usecols=[name for name in names if name in KEEP_COLS or name in currency_cols],
+                       dtype={**DTYPES, **{col: 'category' for col in currency_cols}}, chunksize=chunk_rows)
+
+
+def import_transactions(file_name: str, *, products: Collection[str] = None, until_year: int = None):
+    """Trades of the Degiro export; with *products* (ISINs) and *until_year* only those up to that year."""
+    df = read_degiro_csv(file_name)
     print(df.columns)
     print(df.shape[0])
-    # print(df.dtypes)
-    # print(df.head())
 
     pd.set_option('display.max_columns', 12)
     pd.set_option('display.width', 200)
 
-    rename_columns_to_english(df)
+    return normalize_transactions(df, products, until_year)
+
+
+def iter_transactions(file_name: str, chunk_rows: int, *, products: Collection[str] = None,
+                      until_year: int = None) -> Iterator[DataFrame]:
+    """The trades of import_transactions, read and normalized *chunk_rows* rows at a time."""
+    with read_degiro_csv(file_name, chunk_rows) as reader:
+        for chunk in reader:
+            yield normalize_transactions(chunk, products, until_year)
+
+
+def normalize_transactions(df: DataFrame, products: Collection[str] = None, until_year: int = None) -> DataFrame:
+    """Requested trades of freshly read rows, without stock splits and with their DateTime."""
+    # Requested rows only, before any per-row work; rows with unreadable dates are kept for validation.
+    if products is not None:
+        df = df[df['ISIN'].isin(products)]
+    if until_year is not None:
+        df = df[~(pd.to_numeric(df['Date'].str[-4:], errors='coerce') > until_year)]
 
     print(f"Imported transactions before filtering: {df.shape[0]}")
 
@@ -66,41 +105,31 @@ def import_transactions(file_name: str):
         print(f"Transactions after dropping null Date: {df.shape[0]}\n")
 
     # Drop also stock split transactions
-    df_split = df[(df['Order ID'].isnull() & df['Transaction and/or third'].isnull())]
+    df_split = df[(df['Order ID'].isnull() & df[FEE_COLUMN].isnull())]
     if df_split.shape[0] > 0:
         print(f"*** Dropping {df_split.shape[0]} transactions without Order ID & Fee (stock splits). ***")
         df = df.drop(df_split.index)  # Drop the exact same rows that were identified in df_split
         print(f"Transactions after filtering stock splits: {df.shape[0]}\n")
         print("Dropped transactions:")
         df_to_print = df_split.copy()
-        df_to_print['Product'] = df_to_print['Product'].apply(lambda x: (x[:30] + '~') if len(str(x)) > 30 else x)
-        columns_to_show = ['Date', 'Time', 'Product', 'ISIN', 'Quantity', 'Price', 'Value', 'Exchange rate', 'Total']
-        print(df_to_print[columns_to_show], "\n")
-
-    df['DateTime'] = df.apply(lambda row: merge_date_time(row['Date'], row['Time']), axis=1)
+        df_to_print['Product'] = df_to_print['Product'].astype(str).apply(lambda x: (x[:30] + '~') if len(x) > 30 else x)
+        print(df_to_print[['Date', 'Time', 'Product', 'ISIN', 'Quantity', 'Price']], "\n")
 
-    return df
+    # Unparseable dates become NaT and are reported by validation.validate_trades
+    df = df.assign(DateTime=pd.to_datetime(df['Date'] + ' ' + df['Time'], format='%d-%m-%Y %H:%M', errors='coerce'))
 
+    return compact_frame(df, ['Product', 'ISIN'] + currency_columns(df))
 
-def do_skip_transaction(row: object) -> bool:
-    if row['DateTime'].year != 2021:  # These exceptions are intended just for the tax year 2021 (check them otherwise)
-        return False
 
-    # Empty order ID usually means some SPAC merger, acquisition, or a move to another exchange
-    order_id = row['Order ID']
-    if isinstance(order_id, numbers.Real) and math.isnan(order_id):  # Empty values represented as NaN in Pandas
-        product = row['Product']
-        if product.startswith('NANOXPLORE') \
-                or product.startswith('VOYAGER DIGITAL') \
-                or product.startswith('VIRTUOSO ACQUISITION') or product.startswith('WEJO') \
-                or product.startswith('PEAK FINTECH GROUP') or product.startswith('TENET FINTECH GROUP'):
-            return True
-
-    return False
+def currency_columns(df: DataFrame) -> List[str]:
+    """The unnamed price and fee currency columns."""
+    return [df.columns[df.columns.get_loc('Price') + 1], df.columns[df.columns.get_loc(FEE_COLUMN) + 1]]
 
 
 def convert_to_transactions_deg(df_trans: DataFrame, product_isin: str, tax_year: int) -> List[Transaction]:
-    df_product = df_trans[df_trans['ISIN'] == product_isin].sort_values('DateTime')
+    """Transactions of one product up to *tax_year*; the rows are expected to pass validation.validate_trades."""
+    df_product = df_trans[df_trans['ISIN'] == product_isin]
+    df_product = df_product.iloc[time_order(df_product['DateTime'])]
     product_names = df_product['Product'].unique()
     if product_names.size == 0:
         raise ValueError(f"Could not find ISIN: {product_isin}")
@@ -112,23 +141,11 @@ def convert_to_transactions_deg(df_trans: DataFrame, product_isin: str, tax_year
     print(f"Filtered {df_product.shape[0]} transaction(s) of product {product_names[0]}, based on ISIN: {product_isin}")
 
     currency_idx = df_product.columns.get_loc('Price') + 2  # row has one more column ("index") at the beginning
-    fee_curr_idx = df_product.columns.get_loc('Transaction and/or third') + 2
     transactions = []
     for _, row in df_product.reset_index().iterrows():
         if row['DateTime'].year > tax_year:
             break
 
-        if do_skip_transaction(row):
-            print(f"!! Skipping transaction: {row['DateTime']}, {row['Product']}, {row['ISIN']}")
-            continue
-
-        if row.iloc[fee_curr_idx] != FEE_CURRENCY and not math.isnan(row.iloc[fee_curr_idx]):
-            raise ValueError("Unexpected fee currency!")
-        
-        fee = -row['Transaction and/or third']  # Fee is negative in Degiro exports
-        if fee < 0:
-            raise ValueError("Unexpected negative fee!")
-
         transactions.append(Transaction(
             time=row['DateTime'],
             product_name=row['Product'],
@@ -136,7 +153,7 @@ def convert_to_transactions_deg(df_trans: DataFrame, product_isin: str, tax_year
             count=row['Quantity'],
             share_price=row['Price'],  # Local currency
             currency=row.iloc[currency_idx],
-            fee=fee,
+            fee=-row[FEE_COLUMN],  # Fee is negative in Degiro exports
             fee_currency=FEE_CURRENCY
         ))
 
@@ -12,10 +12,12 @@ import csv
 import io
 import logging
 from pathlib import Path
-from typing import Iterable, Final
+from typing import Collection, Iterable, Iterator, Final
 import pandas as pd
 import re
 
+from identifiers import ISIN_CHANGE
+
 # === constants ===
 HEADER_PREFIX: Final[str] = "Trades,Header,"
 IMPORT_PREFIX: Final[str] = "Trades,Data,Order,"
@@ -29,13 +31,29 @@ KEEP_COLS: Final[list[str]] = [
     "T. Price",
     "Comm/Fee",
 ]
+CATEGORY_COLS: Final[list[str]] = ["Currency", "Symbol"]
 
 # === helper functions ===
-def _scan_csv(path: Path, asset_category: str) -> tuple[list[str], list[str]]:
-    """Return (header, data_rows) from *path* or raise ValueError."""
+def _scan_csv(path: Path, asset_category: str, symbols: Collection[str] | None = None,
+              until_year: int | None = None) -> tuple[list[str], list[str]]:
+    """
+    Return (header, data_rows) from *path* or raise ValueError. Rows of symbols not in *symbols* or traded
+    after *until_year* are skipped while scanning.
+    """
+    header, data_rows = None, []
+    for header, rows in _scan_csv_chunks(path, asset_category, None, symbols, until_year):
+        data_rows += rows
+    return header, data_rows
+
+
+def _scan_csv_chunks(path: Path, asset_category: str, chunk_rows: int | None, symbols: Collection[str] | None = None,
+                     until_year: int | None = None) -> Iterator[tuple[list[str], list[str]]]:
+    """(header, data_rows) of _scan_csv, *chunk_rows* rows at a time (all at once for None)."""
     current_header: list[str] | None = None
     header_locked = False
     data_rows: list[str] = []
+    symbol_idx = date_idx = -1
+    chunks = 0
 
     with path.open(encoding="utf-8") as fh:
         for line in fh:
@@ -57,20 +75,34 @@ def _scan_csv(path: Path, asset_category: str) -> tuple[list[str], list[str]]:
                     else:
                         continue
 
+                if not header_locked:
+                    symbol_idx, date_idx = current_header.index("Symbol"), current_header.index("Date/Time")
                 header_locked = True
+                if symbols is not None and fields[symbol_idx] not in symbols:
+                    continue
+                if until_year is not None and fields[date_idx][:4].isdigit() and int(fields[date_idx][:4]) > until_year:
+                    continue
                 data_rows.append(line)
+                if len(data_rows) == chunk_rows:
+                    yield current_header, data_rows
+                    data_rows, chunks = [], chunks + 1
 
     if current_header is None:
         raise ValueError(f"{path.name}: no header found")
-    return current_header, data_rows
+    if data_rows or not chunks:
+        yield current_header, data_rows
 
 
-def _parse_one_csv(path: Path, asset_category: str) -> pd.DataFrame:
-    header, rows = _scan_csv(path, asset_category)
+def _parse_one_csv(path: Path, asset_category: str, symbols: Collection[str] | None = None,
+                   until_year: int | None = None) -> pd.DataFrame:
+    header, rows = _scan_csv(path, asset_category, symbols, until_year)
     if not rows:
         logging.info("%s: no %s trades", path.name, asset_category)
         return pd.DataFrame(columns=KEEP_COLS)
+    return _rows_to_frame(header, rows)
+
 
+def _rows_to_frame(header: list[str], rows: list[str]) -> pd.DataFrame:
     buf = io.StringIO()
     buf.write(",".join(header) + "\n")
     buf.writelines(rows)
@@ -82,6 +114,8 @@ def _parse_one_csv(path: Path, asset_category: str) -> pd.DataFrame:
         usecols=KEEP_COLS,
         thousands=",",
         dtype={
+            "Currency": "category",
+            "Symbol": "category",
             "Quantity": "float64",  # Could be Int64, but floats would handle fractional shares.
             "T. Price": "float64",
             "Comm/Fee": "float64"},
@@ -92,21 +126,43 @@ def _parse_one_csv(path: Path, asset_category: str) -> pd.DataFrame:
     return df
 
 
-def import_ibkr_transactions(paths: Iterable[str | Path], asset_category: str) -> pd.DataFrame:
+def import_ibkr_transactions(paths: Iterable[str | Path], asset_category: str, *,
+                             symbols: Collection[str] | None = None, until_year: int | None = None) -> pd.DataFrame:
+    """
+    Trades of all *paths*; trades repeated in overlapping statements are imported once. With *symbols*
+    and *until_year*, only those symbols' trades up to the end of that year are read.
+    """
+    from dedup import drop_duplicate_trades
+    from import_utils import compact_frame
+
     frames: list[pd.DataFrame] = []
+    names: list[str] = []
     for p in paths:
         path = Path(p).expanduser()
         logging.info("Importing %s", path)
-        frames.append(_parse_one_csv(path, asset_category))
-    return pd.concat(frames, ignore_index=True)[KEEP_COLS]
+        frames.append(_parse_one_csv(path, asset_category, symbols, until_year))
+        names.append(path.name)
+    # Statements with different symbols concatenate to plain strings, categories are restored here.
+    return compact_frame(drop_duplicate_trades(frames, names)[KEEP_COLS], CATEGORY_COLS)
+
 
+def iter_ibkr_transactions(path: str | Path, asset_category: str, chunk_rows: int, *,
+                           symbols: Collection[str] | None = None, until_year: int | None = None
+                           ) -> Iterator[pd.DataFrame]:
+    """The trades of one statement, *chunk_rows* at a time; overlaps with other statements are kept."""
+    from import_utils import compact_frame
 
-def import_ibkr_stock_transactions(paths: Iterable[str | Path]) -> pd.DataFrame:
-    return import_ibkr_transactions(paths, asset_category=ASSET_STOCKS)
+    for header, rows in _scan_csv_chunks(Path(path).expanduser(), asset_category, chunk_rows, symbols, until_year):
+        if rows:
+            yield compact_frame(_rows_to_frame(header, rows)[KEEP_COLS], CATEGORY_COLS)
 
 
-def import_ibkr_option_transactions(paths: Iterable[str | Path]) -> pd.DataFrame:
-    return import_ibkr_transactions(paths, asset_category=ASSET_OPTIONS)
+def import_ibkr_stock_transactions(paths: Iterable[str | Path], **filters) -> pd.DataFrame:
+    return import_ibkr_transactions(paths, asset_category=ASSET_STOCKS, **filters)
+
+
+def import_ibkr_option_transactions(paths: Iterable[str | Path], **filters) -> pd.DataFrame:
+    return import_ibkr_transactions(paths, asset_category=ASSET_OPTIONS, **filters)
 
 
 def filter_by_symbol(df: pd.DataFrame, symbol: str) -> pd.DataFrame:
@@ -188,11 +244,8 @@ def _parse_ca_csv(path: Path) -> pd.DataFrame:
     df["Symbol"] = df["Description"].str.split("(", n=1).str[0].str.strip()
     df["ISIN"]   = df["Description"].str.extract(_ISIN_RE, expand=False)
 
-    # Override ISIN for TL0 (Tesla) to prevent creating duplicates for degiro
-    df.loc[df["Symbol"] == "TL0", "ISIN"] = "XX00000R0000"
-
-    # -- skip CUSIP/ISIN Change records --
-    df = df[~df["Description"].str.contains("CUSIP/ISIN Change", na=False)]
+    # CUSIP/ISIN Change records stay in, identifiers.build_identifier_index joins their old and new ids.
+    # Listings sharing an ISIN (TSLA, TL0) keep their symbols, load_stock_splits users drop the repeated splits.
 
     # -- HARD FAIL if any ISIN is missing --
     if df["ISIN"].isna().any():
@@ -234,9 +287,12 @@ def process_corporate_actions(csv_paths: Iterable[str | Path]) -> pd.DataFrame:
         df["Numerator"] = []
         df["Denominator"] = []
         return df
+    # Identifier changes have no ratio, every other action must be a split.
+    splits = ~df["Description"].str.contains(ISIN_CHANGE, na=False, regex=False)
     df[["Numerator", "Denominator"]] = (
-        df["Description"]
+        df.loc[splits, "Description"]
           .apply(lambda s: pd.Series(extract_split_ratio(s), index=["Numerator", "Denominator"]))
+          .astype("Int64")
     )
     return df
 
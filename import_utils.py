@@ -1,5 +1,6 @@
 import pandas as pd
 from pandas import DataFrame
+from typing import Iterable
 
 
 def get_product_id_by_prefix(
@@ -15,6 +16,23 @@ def get_product_id_by_prefix(
     return df.iloc[0][id_col]
 
 
+def compact_frame(df: DataFrame, categorical: Iterable[str]) -> DataFrame:
+    """
+    Store the *categorical* columns (product ids, names, currencies) as categories of the values present
+    and whole-share quantities as int32, in place. Smaller integers could overflow in sums of positions;
+    prices and fees stay float64, as they are quantized to Decimal on conversion.
+    """
+    for col in categorical:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].cat.remove_unused_categories()
+        else:
+            df[col] = df[col].astype("category")
+    quantity = df["Quantity"]
+    if quantity.notna().all() and (quantity % 1 == 0).all() and (quantity.abs() < 2**31).all():
+        df["Quantity"] = quantity.astype("int32")
+    return df
+
+
 def detect_columns(df: DataFrame) -> tuple[str, str, str]:
     if "ISIN" in df.columns:
         return "ISIN", "DateTime", "Product"
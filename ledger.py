@@ -0,0 +1,197 @@
+"""
+Optional SQLite ledger of pairing runs.
+
+Every run stores its normalized (converted, split-adjusted) trades, the split events, the pairs and the
+final lot state, so questions like "open lots of X as of a date" or "all pairings touching lot Y" are
+answered by indexed queries instead of rerunning the pipeline. Trades get ledger-wide ids; lots are the
+buy trades. Decimals are stored as text to stay exact, times as ISO strings.
+
+    python ledger.py ledger.db runs
+    python ledger.py ledger.db open-lots TSLA 2022-06-30
+    python ledger.py ledger.db lot-pairings 1234
+"""
+import argparse
+import json
+import sqlite3
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pairing_result import PairingResult
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    created TEXT NOT NULL,
+    account TEXT,
+    tax_year INTEGER,
+    strategies TEXT,
+    options TEXT
+);
+CREATE TABLE IF NOT EXISTS trades (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+    product_id TEXT NOT NULL,
+    product_name TEXT,
+    time TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    share_price TEXT NOT NULL,
+    currency TEXT NOT NULL,
+    fee TEXT NOT NULL,
+    fee_currency TEXT NOT NULL,
+    split_ratio TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS splits (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+    product_id TEXT NOT NULL,
+    report_date TEXT NOT NULL,
+    numerator INTEGER NOT NULL,
+    denominator INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pairings (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+    product_id TEXT NOT NULL,
+    record INTEGER NOT NULL,
+    sale_id INTEGER NOT NULL REFERENCES trades(id),
+    buy_id INTEGER NOT NULL REFERENCES trades(id),
+    quantity INTEGER NOT NULL,
+    fee_consumed INTEGER NOT NULL,
+    short_cover INTEGER NOT NULL,
+    pair_time TEXT NOT NULL  -- when the lot was consumed: the sale, or the covering buy of a short
+);
+CREATE TABLE IF NOT EXISTS lots (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+    buy_id INTEGER PRIMARY KEY REFERENCES trades(id),
+    remaining INTEGER NOT NULL,
+    fee_available INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS trades_product ON trades (run_id, product_id, time);
+CREATE INDEX IF NOT EXISTS trades_time ON trades (time);
+CREATE INDEX IF NOT EXISTS splits_product ON splits (run_id, product_id);
+CREATE INDEX IF NOT EXISTS pairings_buy ON pairings (buy_id, pair_time);
+CREATE INDEX IF NOT EXISTS pairings_sale ON pairings (sale_id);
+CREATE INDEX IF NOT EXISTS pairings_product ON pairings (run_id, product_id, pair_time);
+"""
+
+
+class Ledger:
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> 'Ledger':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def start_run(self, account: str, tax_year: int, strategies: Dict[int, str], **options) -> int:
+        with self.conn:
+            cur = self.conn.execute(
+                "INSERT INTO runs (created, account, tax_year, strategies, options) VALUES (?, ?, ?, ?, ?)",
+                (datetime.now().isoformat(timespec='seconds'), account, tax_year,
+                 json.dumps({str(y): s for y, s in strategies.items()}), json.dumps(options)))
+        return cur.lastrowid
+
+    def add_splits(self, run_id: int, splits: Iterable[Tuple[str, str, int, int]]) -> None:
+        """(product id, report date, numerator, denominator) per split event."""
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO splits (run_id, product_id, report_date, numerator, denominator) VALUES (?, ?, ?, ?, ?)",
+                ((run_id, pid, str(date), int(num), int(den)) for pid, date, num, den in splits))
+
+    def add_product(self, run_id: int, product_id: str, result: PairingResult) -> None:
+        """Trades, pairs and (if the run finished) the lot state of one product's pairing result."""
+        trans = result.trans
+        with self.conn:
+            first_id = self.conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM trades").fetchone()[0]
+            self.conn.executemany(
+                "INSERT INTO trades (id, run_id, product_id, product_name, time, count, share_price, currency,"
+                " fee, fee_currency, split_ratio) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                ((first_id + i, run_id, product_id, t.product_name, t.time.isoformat(), t.count,
+                  str(t.share_price), t.currency, str(t.fee), t.fee_currency, str(t.split_ratio))
+                 for i, t in enumerate(trans)))
+
+            sale_trans = result.sale_trans
+            self.conn.executemany(
+                "INSERT INTO pairings (run_id, product_id, record, sale_id, buy_id, quantity, fee_consumed,"
+                " short_cover, pair_time) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                ((run_id, product_id, record, first_id + sale_trans[record], first_id + buy, count, fee, short,
+                  trans[buy if short else sale_trans[record]].time.isoformat())
+                 for record, buy, count, fee, short in zip(result.pair_record, result.pair_buy, result.pair_count,
+                                                           result.pair_fee_consumed, result.pair_short_cover)))
+
+            if result.lots is not None:
+                self.conn.executemany(
+                    "INSERT INTO lots (run_id, buy_id, remaining, fee_available) VALUES (?, ?, ?, ?)",
+                    ((run_id, first_id + i, remaining, fee)
+                     for i, (t, remaining, fee) in enumerate(zip(trans, result.lots.remaining,
+                                                                  result.lots.fee_available))
+                     if not t.is_sale))
+
+    def latest_run(self) -> Optional[int]:
+        return self.conn.execute("SELECT MAX(run_id) FROM runs").fetchone()[0]
+
+    def runs(self) -> List[sqlite3.Row]:
+        return self.conn.execute("SELECT * FROM runs ORDER BY run_id").fetchall()
+
+    def open_lots(self, product_id: str, as_of: str, run_id: int = None) -> List[sqlite3.Row]:
+        """Buys of *product_id* up to *as_of* (ISO date or time) with shares left, in the latest run by default."""
+        if run_id is None:
+            run_id = self.latest_run()
+        if len(as_of) == 10:  # A date includes the whole day.
+            as_of += "T23:59:59.999999"
+        return self.conn.execute("""
+            SELECT t.id, t.time, t.count, t.share_price, t.currency,
+                   t.count - COALESCE(SUM(p.quantity), 0) AS remaining
+            FROM trades t
+            LEFT JOIN pairings p ON p.buy_id = t.id AND p.pair_time <= :as_of
+            WHERE t.run_id = :run_id AND t.product_id = :product_id AND t.count > 0 AND t.time <= :as_of
+            GROUP BY t.id
+            HAVING remaining > 0
+            ORDER BY t.time
+            """, {"run_id": run_id, "product_id": product_id, "as_of": as_of}).fetchall()
+
+    def lot_pairings(self, lot_id: int) -> List[sqlite3.Row]:
+        """All pairs consuming the lot (buy trade) *lot_id*, with the sale they belong to."""
+        return self.conn.execute("""
+            SELECT p.record, p.quantity, p.fee_consumed, p.short_cover, p.pair_time,
+                   s.id AS sale_id, s.time AS sale_time, s.count AS sale_count, s.share_price AS sale_price
+            FROM pairings p JOIN trades s ON s.id = p.sale_id
+            WHERE p.buy_id = ?
+            ORDER BY p.pair_time
+            """, (lot_id,)).fetchall()
+
+
+def print_rows(rows: List[sqlite3.Row]) -> None:
+    from tabulate import tabulate
+    print(tabulate([tuple(r) for r in rows], headers=rows[0].keys() if rows else ()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Query the pairing ledger')
+    parser.add_argument('db', help='Ledger database written by main.py --ledger')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('runs', help='List the stored runs')
+    open_lots = sub.add_parser('open-lots', help='Open lots of a product as of a date')
+    open_lots.add_argument('product_id')
+    open_lots.add_argument('as_of', help='ISO date or time')
+    open_lots.add_argument('--run', type=int, help='Run id, default: the latest run')
+    lot_pairings = sub.add_parser('lot-pairings', help='Pairings consuming a lot')
+    lot_pairings.add_argument('lot_id', type=int)
+    args = parser.parse_args()
+
+    with Ledger(args.db) as ledger:
+        if args.command == 'runs':
+            print_rows(ledger.runs())
+        elif args.command == 'open-lots':
+            print_rows(ledger.open_lots(args.product_id, args.as_of, args.run))
+        else:
+            print_rows(ledger.lot_pairings(args.lot_id))
+
+
+if __name__ == '__main__':
+    main()
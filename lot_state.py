@@ -0,0 +1,95 @@
+"""
+Per-run lot state.
+
+Transactions are immutable trade records; what a pairing run changes about them lives here instead:
+the remaining share count and the fee flag of every buy, kept as parallel arrays indexed like the run's
+transaction list. Concurrent runs over the same (converted and split-adjusted) transactions each get their
+own ``LotOverlay`` and do not interfere.
+
+Strategies see the buys through ``Lot`` views, which answer ``remaining_count`` / ``consume_shares`` from
+the overlay and delegate everything else to the transaction, so ``find_buys`` functions are unchanged.
+Sales are passed to strategies as plain transactions.
+"""
+from array import array
+from typing import Dict, List, Tuple
+
+from transaction import Transaction
+
+
+class LotOverlay:
+    def __init__(self, trans: List[Transaction]):
+        self.trans = trans
+        self._index: Dict[int, int] = {id(t): i for i, t in enumerate(trans)}
+        self.remaining = array('q', (0 if t.is_sale else t.count for t in trans))
+        self.fee_available = array('b', [1]) * len(trans)
+        # The run's view of the transaction list: buys as lots, sales as they are.
+        self.lots = [t if t.is_sale else Lot(t, self, i) for i, t in enumerate(trans)]
+
+    def index(self, t: Transaction) -> int:
+        return self._index[id(t)]
+
+    def lot(self, t: Transaction) -> 'Lot':
+        if t.is_sale:
+            raise ValueError("Sell transactions are not lots.")
+        return self.lots[self.index(t)]
+
+    def remaining_count(self, t: Transaction) -> int:
+        if t.is_sale:
+            raise ValueError("Remaining count not applicable to sell transactions.")
+        return self.remaining[self.index(t)]
+
+    def state(self, i: int) -> Tuple[int, bool]:
+        """(remaining count, fee available) of the buy at index *i*."""
+        return self.remaining[i], bool(self.fee_available[i])
+
+    def restore(self, i: int, remaining_count: int, fee_available: bool) -> None:
+        self.remaining[i] = remaining_count
+        self.fee_available[i] = fee_available
+
+    def consume(self, i: int, number_sold: int) -> bool:
+        """Mark *number_sold* shares of the buy at index *i* as sold, return whether its fee was consumed."""
+        remaining = self.remaining[i]
+        if number_sold < 1:
+            raise ValueError(f"Number sold < 1: {number_sold}")
+
+        if remaining < 1:
+            raise ValueError(f"Remaining count is 0 (or less): {remaining}")
+
+        if number_sold > remaining:
+            raise ValueError(f"Cannot mark {number_sold} shares as sold, only {remaining} remaining!")
+
+        self.remaining[i] = remaining - number_sold
+
+        if self.fee_available[i]:
+            self.fee_available[i] = 0
+            return True
+        else:
+            return False
+
+
+class Lot:
+    """A buy transaction as seen by one pairing run."""
+    __slots__ = ('transaction', '_overlay', '_i')
+
+    def __init__(self, transaction: Transaction, overlay: LotOverlay, i: int):
+        self.transaction = transaction
+        self._overlay = overlay
+        self._i = i
+
+    def __getattr__(self, name):
+        return getattr(self.transaction, name)
+
+    def __str__(self):
+        return str(self.transaction)
+
+    @property
+    def remaining_count(self) -> int:
+        return self._overlay.remaining[self._i]
+
+    @property
+    def fee_available(self) -> bool:
+        """Whether the buy fee is still to be consumed, by the next sale using this lot."""
+        return bool(self._overlay.fee_available[self._i])
+
+    def consume_shares(self, number_sold: int) -> bool:
+        return self._overlay.consume(self._i, number_sold)
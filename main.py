@@ -1,22 +1,25 @@
+from __future__ import annotations
+
 from decimal import Decimal
 import argparse
+import importlib
 import os
 import json
+import time
 from pathlib import Path
-import datetime
-import pandas as pd
-from pandas import DataFrame, Series, read_csv, read_excel, concat as pd_concat
 from datetime import datetime
-from typing import Dict, List
-
-from import_deg import convert_to_transactions_deg, import_transactions
-from import_ibkr import import_ibkr_stock_transactions, import_ibkr_option_transactions
-from import_utils import detect_columns
-from transaction_ibkr import convert_to_transactions_ibkr
-from corporate_action import load_stock_splits, apply_stock_splits_for_product
-from optimizer import optimize_product, print_report, calculate_totals, calculate_untaxed_totals, get_product_name, list_strategies
+from typing import Dict, List, TYPE_CHECKING
+
+# Only the pandas-free core is imported eagerly. Importers, corporate actions and pandas itself are
+# imported inside the phases that need them, so --help and argument errors stay fast.
+from optimizer import optimize_product, pair_product, print_report, calculate_totals, calculate_untaxed_totals, get_product_name
+from strategy_registry import list_strategies, is_strategy
 from transaction import SaleRecord, Transaction
 
+if TYPE_CHECKING:
+    import pandas as pd
+    from pandas import DataFrame
+
 
 def get_unique_product_ids(
     df_trans: DataFrame,
@@ -25,12 +28,23 @@ def get_unique_product_ids(
     id_col: str,
     date_col: str,
     product_col: str,
+    since_year: int = None,
 ) -> pd.Series:
-    """Return the unique product identifiers (ISIN or Symbol) for *tax_year*, sorted by *product_col*."""
-    df = df_trans.copy()
-    df["TaxYear"] = df[date_col].dt.year
-    df_tax_year = df[df["TaxYear"] == tax_year]
-    return df_tax_year.sort_values(product_col)[id_col].unique()
+    """
+    Return the unique product identifiers (ISIN or Symbol) for *tax_year*, sorted by *product_col*.
+    With *since_year*, products traded in any year from *since_year* to *tax_year* are returned.
+    """
+    years = df_trans[date_col].dt.year
+    columns = list(dict.fromkeys([id_col, product_col]))
+    df_tax_year = df_trans.loc[years.between(since_year or tax_year, tax_year).to_numpy(), columns]
+    return df_tax_year.sort_values(product_col)[id_col].drop_duplicates().to_numpy()
+
+
+def product_name(df_trans: DataFrame, pid: str, id_col: str) -> str:
+    """Display name of the product (Degiro has product names, IBKR only symbols)."""
+    if id_col != "ISIN":
+        return pid
+    return df_trans.loc[df_trans["ISIN"] == pid, "Product"].iloc[0]
 
 
 def build_transactions(
@@ -41,93 +55,174 @@ def build_transactions(
     *,
     id_col: str,
     options: bool,
+    invalid: dict[str, str] = None,
 ) -> list[Transaction]:
-    """Convert one product's rows to Transaction objects and apply splits."""
+    """
+    Convert one product's rows to Transaction objects and apply splits. Products listed in *invalid*
+    (see validate_import) fail with their validation errors instead.
+    """
+    from corporate_action import apply_stock_splits_for_product
 
+    if invalid and product_id in invalid:
+        raise ValueError(invalid[product_id])
     if id_col == "ISIN":
+        from import_deg import convert_to_transactions_deg
         txs = convert_to_transactions_deg(df_trans, product_id, tax_year)
     else:
+        from transaction_ibkr import convert_to_transactions_ibkr
         txs = convert_to_transactions_ibkr(df_trans, product_id, tax_year, options=options)
 
     apply_stock_splits_for_product(txs, splits_df, product_id, id_col=id_col)
     return txs
 
 
-def calculate_current_count(transactions: DataFrame, product_prefix: str) -> int:
-    df_product = transactions[transactions['Product'].str.startswith(product_prefix)]
+def validate_import(df_trans: DataFrame, tax_year: int) -> dict[str, str]:
+    """Print the validation report of all trades up to *tax_year*; returns the products with errors."""
+    from validation import validate_trades
 
-    print(product_prefix)
-    print(df_product.shape[0])
+    report = validate_trades(df_trans, tax_year)
+    report.print()
+    return report.product_errors()
 
-    df_sorted = df_product.sort_values('DateTime').reset_index()
-    print(df_sorted.head(5))
 
-    count = 0
-    for i, row in df_sorted.iterrows():
-        count += row['Quantity']
+def calculate_current_count(transactions: DataFrame, product_prefix: str, splits_df: DataFrame = None) -> int:
+    """Current split-adjusted holding of the product starting with *product_prefix*."""
+    from import_utils import detect_columns, get_product_id_by_prefix
+    from positions import positions_as_of
 
-    return count
+    id_col, _, _ = detect_columns(transactions)
+    product_id = get_product_id_by_prefix(transactions, product_prefix, id_col=id_col)
+    held = positions_as_of(transactions, datetime.now(), splits_df)
+    return held.loc[held[id_col] == product_id, "Quantity"].sum()
 
 
 def filter_and_optimize_product(df_trans: DataFrame, product_isin: str, tax_year: int,
                                 strategies: dict[int,str] = None) -> list[SaleRecord]:
+    from import_deg import convert_to_transactions_deg
 
     return optimize_product(convert_to_transactions_deg(df_trans, product_isin, tax_year), tax_year, strategies)
 
 
-def build_pairing_rows(report: List[SaleRecord], id_col: str) -> list[dict]:
-    """
-    Flatten SaleRecord objects into dictionaries suitable for a CSV export.
+def select_products(products, symbols_filter_str: str = None) -> list[str]:
+    if not symbols_filter_str:
+        return list(products)
+    selected_symbols = [s.strip() for s in symbols_filter_str.split(',')]
+    products = [p for p in products if p in selected_symbols]
+    print(f"Processing only specified symbols: {', '.join(selected_symbols)}")
+    print(f"Selected {len(products)} products to process.")
+    return products
+
+
+def output_suffix(enable_bep: bool, enable_ttest: bool, options: bool) -> str:
+    bep_suffix = "-bep" if enable_bep else ""
+    ttest_suffix = "-ttest" if enable_ttest else ""
+    options_suffix = "-opt" if options else ""
+    return f"{bep_suffix}{ttest_suffix}{options_suffix}"
+
 
-    Each pairing is identified by a *PairID* and split into two logical sides:
-    an **open** transaction (position opening) and a **close** transaction
-    (position closing).  Using this neutral terminology future‑proofs the
-    export for short selling, where a close might be a *buy*.
+def result_columns(id_col: str) -> tuple[str, ...]:
+    return "Product", id_col, "Status", "Income", "Cost", "Profit", "Fees"
+
+
+def process_product(
+    df_trans: DataFrame,
+    pid: str,
+    pname: str,
+    tax_year: int,
+    strategies: dict[int, str],
+    splits_df: DataFrame,
+    *,
+    id_col: str,
+    enable_bep: bool,
+    enable_ttest: bool,
+    options: bool,
+    batch_tax: bool = False,
+    ledger=None,
+    run_id: int = None,
+    invalid: dict[str, str] = None,
+    open_lots: list[DataFrame] = None,
+    bep_engine: str = "decimal",
+) -> (tuple, DataFrame | None):
+    """
+    Pair and tax one product; returns its results row (see result_columns) and its pairings, if any.
+    With *open_lots*, the product's open lots (see time_test.open_lots_frame) are appended to it.
     """
-    rows: list[dict] = []
-
-    def _id_value(t: Transaction) -> str:
-        return t.isin if id_col == "ISIN" else t.product_name
-
-    for idx, sale in enumerate(report):
-        close_t = sale.sale_t
-        pair_id = f"{close_t.time.isoformat()}_{idx}"
-
-        # Closing side
-        rows.append({
-            "PairID": pair_id,
-            "Side": "close",
-            "DateTime": close_t.time,
-            "CloseTime" : sale.close_time if sale.close_time != close_t.time else "",
-            "Product": close_t.product_name,
-            id_col: _id_value(close_t),
-            "Quantity": close_t.count,
-            "SplitRatio": close_t.split_ratio,
-            "SharePrice": close_t.share_price,
-            "Currency": close_t.currency,
-            "TimeTestPassed": "--",
-            "ProfitPerShare (ignores FX!)": "",
-        })
-
-        # Opening side(s)
-        for br in sale.buys:
-            open_t = br.buy_t
-            rows.append({
-                "PairID": pair_id,
-                "Side": "open",
-                "DateTime": open_t.time,
-                "CloseTime": "",
-                "Product": open_t.product_name,
-                id_col: _id_value(open_t),
-                "Quantity": br._count_consumed,
-                "SplitRatio": open_t.split_ratio,
-                "SharePrice": open_t.share_price,
-                "Currency": open_t.currency,
-                "TimeTestPassed": "T" if br.time_test_passed else "",
-                # Note: FX can make substantial difference!
-                "ProfitPerShare (ignores FX!)": close_t.share_price - open_t.share_price,
-            })
-    return rows
+    print(f"Processing product {pname}")
+
+    # Initialize variables for current product processing
+    report: List[SaleRecord] = []
+    pairings = None
+    income = Decimal(0)
+    cost = Decimal(0)
+    fees = Decimal(0)
+    error_occurred_for_product = False
+
+    try:
+        txs = build_transactions(df_trans, pid, tax_year, splits_df, id_col=id_col, options=options,
+                                 invalid=invalid)
+        pairing = pair_product(txs, tax_year, strategies, enable_bep, enable_ttest, batch_tax=batch_tax,
+                               bep_engine=bep_engine)
+        report = pairing.sale_records()
+
+        if len(pairing):
+            pairings = pairing.pairings_frame(id_col)
+        if ledger:
+            ledger.add_product(run_id, pid, pairing)
+        if open_lots is not None:
+            from time_test import open_lots_frame
+            open_lots.append(open_lots_frame(pairing, id_col))
+        income, cost, fees = calculate_totals(report, tax_year)
+        untaxed_count = calculate_untaxed_totals(report, tax_year)
+
+        print(f"  Income: {income}, Cost: {cost}, Profit: {income - cost}, Fees: {fees}"
+              f", Untaxed count: {untaxed_count}\n")
+
+    except Exception as e:
+        print(f"ERROR processing product {pname}: {e}")
+        print(f"  Recording zero income/cost for this product and continuing with others.\n")
+        error_occurred_for_product = True
+
+    # Construct row for the results DataFrame
+    status = "ERROR"
+    if not error_occurred_for_product:
+        status = "OK" if report else "No sales"
+
+    return (pname, pid, status, income, cost, income - cost, fees), pairings
+
+
+def results_filename(account_code: str, tax_year: int, strategies: dict[int, str], enable_bep: bool,
+                     enable_ttest: bool, options: bool) -> str:
+    return f"{account_code}-{tax_year}-{strategies[tax_year-1]}-{strategies[tax_year]}" \
+           f"{output_suffix(enable_bep, enable_ttest, options)}.csv"
+
+
+def export_results(results: dict[str, list], pairing_frames: list[DataFrame], filename_base: str) -> DataFrame:
+    """Print the results table and export it with the detailed pairings to CSV."""
+    import pandas as pd
+    from pandas import DataFrame
+
+    df_results = DataFrame(results)
+    print()
+    pd.set_option('display.max_rows', None)
+    print(df_results)
+
+    # Export aggregated results and detailed pairings to CSV
+    output_path = "outputs/"
+    os.makedirs(output_path, exist_ok=True)
+    date_prefix = datetime.today().date().strftime('%Y-%m-%d')
+
+    df_results.to_csv(
+        f"{output_path}{date_prefix}-results-{filename_base}",
+        index=False)
+
+    pairings_df = pd.concat(pairing_frames, ignore_index=True) if pairing_frames else DataFrame()
+    if not pairings_df.empty:
+        pairings_df["DateTime"] = pairings_df["DateTime"].astype(str)
+        pairings_df.to_csv(
+            f"{output_path}{date_prefix}-pairings-{filename_base}",
+            index=False)
+        print(f"Exported {len(pairings_df)} pairing rows.")
+    return df_results
 
 
 def optimize_all(
@@ -141,114 +236,133 @@ def optimize_all(
     enable_ttest: bool = True,
     options: bool = False,
     symbols_filter_str: str = None,
+    batch_tax: bool = False,
+    ledger_path: str = None,
+    ttest_calendar: bool = False,
+    bep_engine: str = "decimal",
 ) -> None:
+    from import_utils import detect_columns
+
     id_col, date_col, product_col = detect_columns(df_trans)
+    invalid = validate_import(df_trans, tax_year)
 
     products = get_unique_product_ids(
         df_trans, tax_year, id_col=id_col, date_col=date_col, product_col=product_col
     )
     print(f"Found {len(products)} products with some transactions in {tax_year} to process.")
 
-    if symbols_filter_str:
-        selected_symbols = [s.strip() for s in symbols_filter_str.split(',')]
-        products = [p for p in products if p in selected_symbols]
-        print(f"Processing only specified symbols: {', '.join(selected_symbols)}")
-        print(f"Selected {len(products)} products to process.")
+    products = select_products(products, symbols_filter_str)
+    optimize_products(
+        ((pid, df_trans, invalid) for pid in products), id_col, tax_year, strategies, account_code, splits_df,
+        enable_bep=enable_bep, enable_ttest=enable_ttest, options=options, batch_tax=batch_tax,
+        ledger_path=ledger_path, ttest_calendar=ttest_calendar, bep_engine=bep_engine)
 
-    df_results = DataFrame(columns=["Product", id_col, "Status", "Income", "Cost", "Profit", "Fees"])
-    total_income = total_cost = total_fees = Decimal(0)
-    error_count = 0
-
-    # Collect detailed pairing rows for audit purposes.
-    pairing_rows: list[dict] = []
-
-    for pid in products:
-        pname = pid
-        if id_col == "ISIN":
-            pname = df_trans.query(f"ISIN == '{pid}'").iloc[0]["Product"]
-            if pid in ("CA88035N1033",):  # skip-list for Degiro ('CA88035N1033' is TENET FINTECH)
-                # IE: ('IE00B53SZB19', 'US9344231041'):
-                # CZ: ('IE00B53SZB19', 'US9344231041', 'BMG9525W1091', 'CA88035N1033', 'CA92919V4055', 'KYG851581069', 'US37611X1000'):
-                print(f"Skipping product {pid}: {pname}")
-                continue
-
-        print(f"Processing product {pname}")
 
-        # Initialize variables for current product processing
-        report: List[SaleRecord] = []
-        current_pairing_rows: list[dict] = []
-        income = Decimal(0)
-        cost = Decimal(0)
-        fees = Decimal(0)
-        error_occurred_for_product = False
-
-        try:
-            txs = build_transactions(df_trans, pid, tax_year, splits_df, id_col=id_col, options=options)
-            report = optimize_product(txs, tax_year, strategies, enable_bep, enable_ttest)
-
-            current_pairing_rows = build_pairing_rows(report, id_col)
-            income, cost, fees = calculate_totals(report, tax_year)
-            untaxed_count = calculate_untaxed_totals(report, tax_year)
-
-            print(f"  Income: {income}, Cost: {cost}, Profit: {income - cost}, Fees: {fees}"
-                  f", Untaxed count: {untaxed_count}\n")
+def optimize_partitioned(
+    store,
+    tax_year: int,
+    strategies: dict[int, str],
+    account_code: str,
+    splits_df: DataFrame,
+    *,
+    symbols_filter_str: str = None,
+    skip_rules: list = None,
+    aggregate_fills: bool = False,
+    **options,
+) -> None:
+    """
+    optimize_all of the products of a partitions.PartitionStore or trade_store.AccountStore, loading,
+    filtering by *skip_rules*, aggregating fills into orders and validating one product at a time.
+    """
+    from fills import aggregate_fills as aggregate
+    from skip_rules import apply_skip_rules
 
-        except Exception as e:
-            print(f"ERROR processing product {pname}: {e}")
-            print(f"  Recording zero income/cost for this product and continuing with others.\n")
-            error_occurred_for_product = True
-            error_count += 1
-
-        # Accumulate pairing details (will be empty if an error occurred)
-        pairing_rows.extend(current_pairing_rows)
-
-        # Construct row for the results DataFrame
-        status = "ERROR" 
-        if not error_occurred_for_product:
-            status = "OK" if report else "No sales"
-
-        row = {
-            "Product": pname,
-            id_col: pid,
-            "Status": status,
-            "Income": income,
-            "Cost": cost,
-            "Profit": income - cost,
-            "Fees": fees,
-        }
-        
-        new_row_df = DataFrame([row]) 
-        df_results = pd_concat([df_results, new_row_df], ignore_index=True) 
+    products = store.products(tax_year)
+    print(f"Found {len(products)} products with some transactions in {tax_year} to process.")
+    products = select_products(products, symbols_filter_str)
+    fill_rows, order_rows, fills = 0, 0, []
+
+    def product_frames():
+        nonlocal fill_rows, order_rows
+        for pid in products:
+            df_product = store.load(pid)
+            if skip_rules:
+                df_product = apply_skip_rules(df_product, skip_rules)
+            if aggregate_fills:
+                fill_rows += len(df_product)
+                df_product, product_fills = aggregate(df_product)
+                order_rows += len(df_product)
+                fills.append(product_fills)
+            yield pid, df_product, validate_import(df_product, tax_year)
+
+    optimize_products(product_frames(), store.id_col, tax_year, strategies, account_code, splits_df, **options)
+    if aggregate_fills:
+        export_fills(fill_rows, order_rows, fills, account_code, tax_year)
+
+
+def optimize_products(
+    product_frames,
+    id_col: str,
+    tax_year: int,
+    strategies: dict[int, str],
+    account_code: str,
+    splits_df: DataFrame,
+    *,
+    enable_bep: bool = False,
+    enable_ttest: bool = True,
+    options: bool = False,
+    batch_tax: bool = False,
+    ledger_path: str = None,
+    ttest_calendar: bool = False,
+    bep_engine: str = "decimal",
+) -> None:
+    """
+    Process, export and summarize the products of *product_frames*: (product id, frame with its trades,
+    validation errors of the frame) triples.
+    """
+    ledger = run_id = None
+    if ledger_path:
+        from ledger import Ledger
+        ledger = Ledger(ledger_path)
+        run_id = ledger.start_run(account_code, tax_year, strategies, enable_bep=enable_bep,
+                                  enable_ttest=enable_ttest, options=options)
+        if splits_df is not None and not splits_df.empty:
+            ledger.add_splits(run_id, zip(splits_df[id_col], splits_df["Report Date"].dt.date,
+                                          splits_df["Numerator"], splits_df["Denominator"]))
+        print(f"Recording run {run_id} in ledger {ledger_path}")
+
+    results: dict[str, list] = {col: [] for col in result_columns(id_col)}
+    total_income = total_cost = total_fees = Decimal(0)
+    error_count = 0
 
+    # Collect detailed pairings for audit purposes.
+    pairing_frames: list[DataFrame] = []
+    open_lots: list[DataFrame] | None = [] if ttest_calendar else None
+
+    for pid, df_trans, invalid in product_frames:
+        pname = product_name(df_trans, pid, id_col)
+        row, pairings = process_product(
+            df_trans, pid, pname, tax_year, strategies, splits_df, id_col=id_col, enable_bep=enable_bep,
+            enable_ttest=enable_ttest, options=options, batch_tax=batch_tax,
+            ledger=ledger, run_id=run_id, invalid=invalid, open_lots=open_lots, bep_engine=bep_engine)
+        if pairings is not None:
+            pairing_frames.append(pairings)
+        for col, value in zip(results, row):
+            results[col].append(value)
+
+        _, _, status, income, cost, _, fees = row
+        error_count += status == "ERROR"
         total_income += income
         total_cost += cost
         total_fees += fees
 
-    print()
-    pd.set_option('display.max_rows', None)
-    print(df_results)
+    if ledger:
+        ledger.close()
 
-    # Export aggregated results and detailed pairings to CSV
-    output_path = "outputs/"
-    os.makedirs(output_path, exist_ok=True)
-    bep_suffix = "-bep" if enable_bep else ""
-    ttest_suffix = "-ttest" if enable_ttest else ""
-    options_suffix = "-opt" if options else ""
-    date_prefix = datetime.today().date().strftime('%Y-%m-%d')
-    filename_base = f"{account_code}-{tax_year}-{strategies[tax_year-1]}-{strategies[tax_year]}" \
-                    f"{bep_suffix}{ttest_suffix}{options_suffix}.csv"
-
-    df_results.to_csv(
-        f"{output_path}{date_prefix}-results-{filename_base}",
-        index=False)
-
-    pairings_df = pd.DataFrame(pairing_rows)
-    if not pairings_df.empty:
-        pairings_df["DateTime"] = pairings_df["DateTime"].astype(str)
-        pairings_df.to_csv(
-            f"{output_path}{date_prefix}-pairings-{filename_base}",
-            index=False)
-        print(f"Exported {len(pairings_df)} pairing rows.")
+    filename_base = results_filename(account_code, tax_year, strategies, enable_bep, enable_ttest, options)
+    export_results(results, pairing_frames, filename_base)
+    if ttest_calendar:
+        export_ttest_calendar(open_lots, filename_base)
 
     # Round to 2 decimal places
     total_income = Decimal(total_income).quantize(Decimal('0.01'))
@@ -273,6 +387,347 @@ def optimize_all(
     print(f"(tax est.)  : {(total_profit * Decimal('0.15')):,.2f}")
 
 
+def export_fills(rows: int, orders: int, fills: list[DataFrame], account_code: str, tax_year: int) -> None:
+    """Report the fills aggregated into orders, export the merged fills to CSV."""
+    import pandas as pd
+
+    print(f"Aggregated {rows} fills into {orders} orders ({1 - orders / rows:.1%} fewer transactions)" if rows else
+          "No fills to aggregate")
+    fills = [f for f in fills if not f.empty]
+    if fills:
+        output_path = "outputs/"
+        os.makedirs(output_path, exist_ok=True)
+        date_prefix = datetime.today().date().strftime('%Y-%m-%d')
+        pd.concat(fills, ignore_index=True).to_csv(
+            f"{output_path}{date_prefix}-fills-{account_code}-{tax_year}.csv", index=False)
+
+
+def export_ttest_calendar(open_lots: list[DataFrame], filename_base: str) -> None:
+    """Print the monthly time-test calendar of the open lots, export it and the lots to CSV."""
+    import pandas as pd
+    from time_test import eligibility_calendar
+
+    calendar = eligibility_calendar(open_lots)
+    print()
+    print("Open lots becoming tax-free (time test) by month:")
+    print(calendar.to_string(index=False))
+
+    output_path = "outputs/"
+    date_prefix = datetime.today().date().strftime('%Y-%m-%d')
+    calendar.to_csv(f"{output_path}{date_prefix}-ttest-calendar-{filename_base}", index=False)
+    lots = [f for f in open_lots if not f.empty]
+    if lots:
+        pd.concat(lots, ignore_index=True).sort_values("TaxFreeFrom").to_csv(
+            f"{output_path}{date_prefix}-ttest-lots-{filename_base}", index=False)
+
+
+def watch_all(
+    dirs: list[str],
+    tax_year: int,
+    strategies: dict[int, str],
+    account_code: str,
+    splits_df: DataFrame,
+    *,
+    deg: bool,
+    enable_bep: bool = False,
+    enable_ttest: bool = True,
+    options: bool = False,
+    symbols_filter_str: str = None,
+    batch_tax: bool = False,
+    interval: float = 60.0,
+    max_polls: int = None,
+    skip_rules: list = None,
+    bep_engine: str = "decimal",
+    identifiers=None,
+    ttest_calendar: bool = False,
+) -> None:
+    """
+    Keep the results and pairings outputs (and with *ttest_calendar* the time-test calendar) up to date with
+    the statements in *dirs*. Only products with new statement rows are paired again, the others keep their
+    previous results. Product ids are resolved with *identifiers*.
+    """
+    from import_utils import detect_columns
+    from skip_rules import apply_skip_rules
+    from watch import StatementWatcher
+
+    watcher = StatementWatcher(dirs, deg=deg, options=options)
+    processed: dict[str, tuple] = {}  # product -> (results row, pairings, open lots or None)
+    polls = 0
+    print(f"Watching {', '.join(dirs)} every {interval:g} s, stop with Ctrl+C.")
+    try:
+        while max_polls is None or polls < max_polls:
+            if polls:
+                time.sleep(interval)
+            polls += 1
+
+            changed = watcher.poll()
+            if not changed:
+                continue
+            new_rows = watcher.ingest(changed)
+            if new_rows.empty:
+                continue
+
+            df_trans = watcher.df
+            if identifiers is not None:
+                df_trans, new_rows = identifiers.resolve_ids(df_trans), identifiers.resolve_ids(new_rows)
+            df_trans = apply_skip_rules(df_trans, skip_rules) if skip_rules else df_trans
+            id_col, date_col, product_col = detect_columns(df_trans)
+            invalid = validate_import(df_trans, tax_year)
+            products = select_products(get_unique_product_ids(
+                df_trans, tax_year, id_col=id_col, date_col=date_col, product_col=product_col
+            ), symbols_filter_str)
+            affected = set(new_rows[id_col]) | (set(products) - set(processed))
+            print(f"{len(new_rows)} new rows, processing {len(affected & set(products))} products.")
+
+            for pid in products:
+                if pid not in affected:
+                    continue
+                lots = [] if ttest_calendar else None
+                processed[pid] = (*process_product(
+                    df_trans, pid, product_name(df_trans, pid, id_col), tax_year, strategies, splits_df, id_col=id_col, enable_bep=enable_bep,
+                    enable_ttest=enable_ttest, options=options, batch_tax=batch_tax, invalid=invalid,
+                    open_lots=lots, bep_engine=bep_engine), lots)
+
+            results: dict[str, list] = {col: [] for col in result_columns(id_col)}
+            pairing_frames = []
+            open_lots = []
+            for pid in (p for p in products if p in processed):
+                row, pairings, lots = processed[pid]
+                for col, value in zip(results, row):
+                    results[col].append(value)
+                if pairings is not None:
+                    pairing_frames.append(pairings)
+                open_lots.extend(lots or [])
+            filename_base = results_filename(account_code, tax_year, strategies, enable_bep, enable_ttest, options)
+            export_results(results, pairing_frames, filename_base)
+            if ttest_calendar:
+                export_ttest_calendar(open_lots, filename_base)
+    except KeyboardInterrupt:
+        print("Stopped watching.")
+
+
+def positions_all(
+    df_trans: DataFrame,
+    tax_year: int,
+    account_code: str,
+    splits_df: DataFrame,
+    *,
+    as_of: str = None,
+    timeline: str = None,
+    symbols_filter_str: str = None,
+) -> None:
+    """
+    Export the split-adjusted holdings as of a date (default: the end of *tax_year*) and optionally
+    their daily or monthly timeline up to it, for reconciling against broker position statements.
+    """
+    from import_utils import detect_columns
+    from positions import positions_as_of, holdings_timeline
+
+    id_col, _, _ = detect_columns(df_trans)
+    if symbols_filter_str:
+        df_trans = df_trans[df_trans[id_col].isin(select_products(df_trans[id_col].unique(), symbols_filter_str))]
+    as_of = as_of or f"{tax_year}-12-31"
+
+    output_path = "outputs/"
+    os.makedirs(output_path, exist_ok=True)
+    date_prefix = datetime.today().date().strftime('%Y-%m-%d')
+
+    held = positions_as_of(df_trans, as_of, splits_df)
+    print(f"Positions as of {as_of}:")
+    print(held.to_string(index=False))
+    held.to_csv(f"{output_path}{date_prefix}-positions-{account_code}-{as_of}.csv", index=False)
+
+    if timeline:
+        freq = {"daily": "D", "monthly": "M"}[timeline]
+        df_timeline = holdings_timeline(df_trans, splits_df, freq, end=as_of)
+        df_timeline.to_csv(f"{output_path}{date_prefix}-positions-{timeline}-{account_code}-{as_of}.csv")
+        print(f"Exported {timeline} holdings of {df_timeline.shape[1]} products over {len(df_timeline)} dates.")
+
+
+def prepare_products(
+    df_trans: DataFrame,
+    products: list[str],
+    tax_year: int,
+    splits_df: DataFrame,
+    *,
+    id_col: str,
+    options: bool,
+) -> (dict[str, str], dict[str, list[Transaction]], dict[str, Exception]):
+    """
+    Convert and split-adjust every product once, for runs evaluating many strategies on the same
+    transactions. Returns product names, the transactions and the products that failed to convert.
+    """
+    invalid = validate_import(df_trans, tax_year)
+    names: dict[str, str] = {}
+    prepared: dict[str, list[Transaction]] = {}
+    failed: dict[str, Exception] = {}
+    for pid in products:
+        names[pid] = product_name(df_trans, pid, id_col)
+        try:
+            prepared[pid] = build_transactions(df_trans, pid, tax_year, splits_df, id_col=id_col, options=options,
+                                               invalid=invalid)
+        except Exception as e:
+            failed[pid] = e
+    return names, prepared, failed
+
+
+def compare_all(
+    df_trans: DataFrame,
+    tax_year: int,
+    strategies: dict[int, str],
+    candidates: list[str],
+    account_code: str,
+    splits_df: DataFrame,
+    *,
+    enable_bep: bool = False,
+    enable_ttest: bool = True,
+    options: bool = False,
+    symbols_filter_str: str = None,
+    workers: int = 1,
+) -> None:
+    """
+    Evaluate every candidate strategy in each configured year up to *tax_year*, the other years paired
+    by *strategies*. Exports the product x strategy totals and the best strategy per year.
+    """
+    import pandas as pd
+    from pandas import DataFrame
+    from compare import compare_products, best_by_year
+    from import_utils import detect_columns
+
+    id_col, date_col, product_col = detect_columns(df_trans)
+    years = sorted(y for y in strategies if y <= tax_year)
+
+    products = get_unique_product_ids(
+        df_trans, tax_year, id_col=id_col, date_col=date_col, product_col=product_col, since_year=years[0]
+    )
+    print(f"Found {len(products)} products with some transactions in {years[0]}-{tax_year} to compare.")
+    products = select_products(products, symbols_filter_str)
+
+    names, prepared, failed = prepare_products(df_trans, products, tax_year, splits_df,
+                                               id_col=id_col, options=options)
+    print(f"Comparing strategies {', '.join(candidates)} in {', '.join(map(str, years))}"
+          f" over {len(prepared)} products ({workers} worker(s)).")
+    comparisons = compare_products(prepared, years, strategies, candidates, enable_bep, enable_ttest,
+                                   workers=workers)
+    comparisons.update(failed)
+
+    columns = ("Product", id_col, "Year", "Strategy", "Status", "Income", "Cost", "Profit", "Fees", "UntaxedCount")
+    rows: dict[str, list] = {col: [] for col in columns}
+    for pid, pname in names.items():
+        comparison = comparisons[pid]
+        if isinstance(comparison, Exception):
+            print(f"ERROR processing product {pname}: {comparison}")
+            for col, value in zip(columns, (pname, pid, tax_year, "", "ERROR", 0, 0, 0, 0, 0)):
+                rows[col].append(value)
+            continue
+        for year, by_strategy in comparison.items():
+            for name, totals in by_strategy.items():
+                for col, value in zip(columns, (pname, pid, year, name, "OK", totals.income, totals.cost,
+                                                totals.profit, totals.fees, totals.untaxed_count)):
+                    rows[col].append(value)
+    df_matrix = DataFrame(rows)
+
+    best = best_by_year([c for c in comparisons.values() if not isinstance(c, Exception)])
+    best_rows: dict[str, list] = {col: [] for col in ("Year", "Strategy", "Income", "Cost", "Profit", "Fees",
+                                                      "UntaxedCount", "Best")}
+    for year, (best_name, by_strategy) in best.items():
+        for name, totals in by_strategy.items():
+            for col, value in zip(best_rows, (year, name, totals.income, totals.cost, totals.profit, totals.fees,
+                                              totals.untaxed_count, name == best_name)):
+                best_rows[col].append(value)
+    df_best = DataFrame(best_rows)
+
+    print()
+    pd.set_option('display.max_rows', None)
+    df_tax_year = df_matrix[(df_matrix["Year"] == tax_year) & (df_matrix["Status"] == "OK")]
+    if not df_tax_year.empty:
+        print(df_tax_year.pivot(index="Product", columns="Strategy", values="Profit")[candidates])
+    print()
+    print(df_best)
+
+    output_path = "outputs/"
+    os.makedirs(output_path, exist_ok=True)
+    date_prefix = datetime.today().date().strftime('%Y-%m-%d')
+    filename_base = f"{account_code}-{tax_year}{output_suffix(enable_bep, enable_ttest, options)}.csv"
+    df_matrix.to_csv(f"{output_path}{date_prefix}-compare-{filename_base}", index=False)
+    df_best.to_csv(f"{output_path}{date_prefix}-compare-best-{filename_base}", index=False)
+
+    print()
+    for year, (best_name, by_strategy) in best.items():
+        print(f"Best strategy for {year}: {best_name}, profit after fees: {by_strategy[best_name].taxable:,.2f}")
+    if failed or any(isinstance(c, Exception) for c in comparisons.values()):
+        print("!! Some products have ERROR status (see above for details)")
+
+
+def sweep_all(
+    df_trans: DataFrame,
+    tax_year: int,
+    strategies: dict[int, str],
+    family: str,
+    grid_specs: list[str],
+    account_code: str,
+    splits_df: DataFrame,
+    *,
+    enable_bep: bool = False,
+    enable_ttest: bool = True,
+    options: bool = False,
+    symbols_filter_str: str = None,
+    workers: int = 1,
+) -> None:
+    """Evaluate a grid of *family* thresholds in *tax_year*, export the ranked settings and their sensitivity."""
+    from pandas import DataFrame
+    from import_utils import detect_columns
+    from sweep import parse_grid, sweep, sensitivity, PARAMETERS
+
+    grid = parse_grid(grid_specs)
+    id_col, date_col, product_col = detect_columns(df_trans)
+    products = get_unique_product_ids(
+        df_trans, tax_year, id_col=id_col, date_col=date_col, product_col=product_col
+    )
+    products = select_products(products, symbols_filter_str)
+    names, prepared, failed = prepare_products(df_trans, products, tax_year, splits_df,
+                                               id_col=id_col, options=options)
+
+    print(f"Sweeping {family} thresholds {grid} over {len(prepared)} products ({workers} worker(s)).")
+    points, sweep_failed = sweep(prepared, tax_year, strategies, family, grid, enable_bep, enable_ttest,
+                                 workers=workers)
+    failed.update(sweep_failed)
+    for pid, e in failed.items():
+        print(f"ERROR processing product {names[pid]}: {e}")
+
+    columns = ("Strategy", *PARAMETERS, "Income", "Cost", "Profit", "Fees", "UntaxedCount", "ProfitAfterFees")
+    rows: dict[str, list] = {col: [] for col in columns}
+    for point in points:
+        th, totals = point.thresholds, point.totals
+        for col, value in zip(columns, (f"{family}:{th}", *(getattr(th, p) for p in PARAMETERS),
+                                        totals.income, totals.cost, totals.profit, totals.fees,
+                                        totals.untaxed_count, totals.taxable)):
+            rows[col].append(value)
+    df_points = DataFrame(rows)
+    df_sensitivity = DataFrame(sensitivity(points),
+                               columns=["Parameter", "Value", "MinProfitAfterFees", "MeanProfitAfterFees",
+                                        "MaxProfitAfterFees"])
+
+    print()
+    print(df_points.head(10))
+    print()
+    print(df_sensitivity)
+
+    output_path = "outputs/"
+    os.makedirs(output_path, exist_ok=True)
+    date_prefix = datetime.today().date().strftime('%Y-%m-%d')
+    filename_base = f"{account_code}-{tax_year}-{family}{output_suffix(enable_bep, enable_ttest, options)}.csv"
+    df_points.to_csv(f"{output_path}{date_prefix}-sweep-{filename_base}", index=False)
+    df_sensitivity.to_csv(f"{output_path}{date_prefix}-sweep-sensitivity-{filename_base}", index=False)
+
+    print()
+    if failed:
+        print(f"!! Number of products with ERROR status: {len(failed)} (excluded from the totals)\n")
+    if points:
+        print(f"Best thresholds: {family}:{points[0].thresholds}"
+              f", profit after fees: {points[0].totals.taxable:,.2f}")
+
+
 def manual_debug(df_transactions: DataFrame):
     product = "SEA"
     count = calculate_current_count(df_transactions, product)
@@ -291,7 +746,9 @@ def manual_debug(df_transactions: DataFrame):
 
 def detect_account_code(args) -> str:
     # Determine account code based on flags and filename
-    if args.ibkr:
+    if args.account:
+        code = args.account
+    elif args.ibkr:
         code = "ibkr"
     else:
         file_name = os.path.basename(args.files[0]).lower()
@@ -313,13 +770,46 @@ def load_strategies(path: Path) -> Dict[int, str]:
     return {int(year): strategy for year, strategy in data.items()}
 
 
+def load_rules(args) -> list:
+    """Skip rules from --skip-rules, or config/skip_rules.json if it exists."""
+    from skip_rules import load_skip_rules
+
+    if args.skip_rules:
+        return load_skip_rules(args.skip_rules)
+    default = Path("config/skip_rules.json")
+    return load_skip_rules(default) if default.exists() else []
+
+
+def load_identifiers(args, corporate_actions_path: str):
+    """
+    Identifier index of the corporate actions and of --aliases, or config/identifier_aliases.csv if it
+    exists; None without any identifiers to join.
+    """
+    from identifiers import load_identifier_index
+
+    aliases = args.aliases
+    if not aliases and Path("config/identifier_aliases.csv").exists():
+        aliases = "config/identifier_aliases.csv"
+    index = load_identifier_index(corporate_actions_path, aliases)
+    return index if len(index) else None
+
+
+def load_plugins(module_names: List[str]) -> None:
+    # Plugin modules register their strategies (strategy_registry.register_strategy) on import.
+    for name in module_names or []:
+        print(f"Loading strategy plugin {name}")
+        importlib.import_module(name)
+
+
 def setup_strategies(args) -> Dict[int, str]:
+    load_plugins(args.plugin)
+
     # Check that only one of the options was selected.
     if sum([bool(args.fifo), bool(args.strategy), bool(args.config)]) > 1:
         raise ValueError("Only one of --fifo, --strategy or --config can be specified")
 
     if args.fifo or args.strategy:
-        if args.strategy and args.strategy not in list_strategies():
+        if args.strategy and not is_strategy(args.strategy):
             print(f"Available strategies: {list_strategies()}")
             raise ValueError(f"Unknown strategy: {args.strategy}")
 
@@ -328,9 +818,86 @@ def setup_strategies(args) -> Dict[int, str]:
         return strategies
     elif args.config:
         print(f"Loading strategies from {args.config}")
-        return load_strategies(Path(args.config))
+        strategies = load_strategies(Path(args.config))
     else:
-        return load_strategies(Path("config/strategies.json"))
+        strategies = load_strategies(Path("config/strategies.json"))
+
+    unknown = sorted(name for name in set(strategies.values()) if not is_strategy(name))
+    if unknown:
+        print(f"Available strategies: {list_strategies()}")
+        raise ValueError(f"Unknown strategy in config: {', '.join(unknown)}")
+    return strategies
+
+
+def import_until_year(args) -> int:
+    """Last year any report needs: the tax year, or a later --as-of date of --positions."""
+    if args.positions and args.as_of:
+        return max(args.year, int(args.as_of[:4]))
+    return args.year
+
+
+def import_filters(args, identifiers=None) -> (set[str] | None, int):
+    """
+    The --symbols to import (None for all), with all ids joined to them in *identifiers*, and the last
+    year to import.
+    """
+    symbols = {s.strip() for s in args.symbols.split(',')} if args.symbols else None
+    if symbols and identifiers is not None:
+        symbols = {member for s in symbols for member in identifiers.members(s)}
+    return symbols, import_until_year(args)
+
+
+def import_all(args, pushdown: bool = True, identifiers=None) -> DataFrame:
+    """
+    Import phase: the first place where pandas and the broker importers are loaded. With *pushdown*,
+    only the --symbols products and the years up to the tax year are read. With *identifiers* (see
+    identifiers.IdentifierIndex), the product ids are resolved to canonical ones.
+    """
+    symbols, until_year = import_filters(args, identifiers) if pushdown else (None, None)
+    if args.deg:
+        from dedup import drop_duplicate_trades
+        from import_deg import import_transactions, currency_columns
+        from import_utils import compact_frame
+        # Import from one or more Degiro CSV files, overlapping exports contribute their trades once
+        df_list = [import_transactions(f, products=symbols, until_year=until_year) for f in args.files]
+        df = drop_duplicate_trades(df_list, [os.path.basename(f) for f in args.files])
+        df = compact_frame(df, ['Product', 'ISIN'] + currency_columns(df))
+    else:
+        from import_ibkr import import_ibkr_stock_transactions, import_ibkr_option_transactions
+        if args.options:
+            # Import options from one or more IBKR CSV files
+            df = import_ibkr_option_transactions(args.files, symbols=symbols, until_year=until_year)
+        else:
+            # Import stocks from one or more IBKR CSV files
+            df = import_ibkr_stock_transactions(args.files, symbols=symbols, until_year=until_year)
+    return identifiers.resolve_ids(df) if identifiers is not None else df
+
+
+def partition_all(args, directory: str, skip_rules: list = None, identifiers=None):
+    """
+    Out-of-core import: stream the files in chunks of --chunk-rows rows into per-product partitions in
+    *directory*, keyed by the ids resolved with *identifiers*, leaving out the trades matched by *skip_rules*.
+    """
+    from partitions import PartitionStore
+    from skip_rules import apply_skip_rules
+
+    symbols, until_year = import_filters(args, identifiers)
+    store = PartitionStore(directory, id_col="ISIN" if args.deg else "Symbol")
+    for f in args.files:
+        source = store.add_source(os.path.basename(f))
+        if args.deg:
+            from import_deg import iter_transactions
+            chunks = iter_transactions(f, args.chunk_rows, products=symbols, until_year=until_year)
+        else:
+            from import_ibkr import iter_ibkr_transactions, ASSET_OPTIONS, ASSET_STOCKS
+            chunks = iter_ibkr_transactions(f, ASSET_OPTIONS if args.options else ASSET_STOCKS, args.chunk_rows,
+                                            symbols=symbols, until_year=until_year)
+        for chunk in chunks:
+            if identifiers is not None:
+                chunk = identifiers.resolve_ids(chunk)
+            store.add(apply_skip_rules(chunk, skip_rules) if skip_rules else chunk, source)
+    print(f"Partitioned {store.rows} rows of {len(store)} products into {directory}")
+    return store
 
 
 def main():
@@ -341,12 +908,35 @@ def main():
     parser.add_argument('--strategy', type=str, help='Pairing strategy for target year (' + ', '.join(list_strategies()) + '), uses fifo for previous years. Defaults to config/strategies.json if not specified.')
     parser.add_argument('--fifo', action='store_true', help='Shortcut for --strategy fifo')
     parser.add_argument('--config', type=str, help='Path to strategies JSON file, default: config/strategies.json')
+    parser.add_argument('--plugin', type=str, action='append', help='Import a module registering custom strategies (repeatable)')
+    parser.add_argument('--skip-rules', type=str, help='Rules of trades to leave out, default: config/skip_rules.json')
+    parser.add_argument('--aliases', type=str, help='CSV of product ids (Identifier) and other ids of the same product (Alias), default: config/identifier_aliases.csv')
     parser.add_argument('--no-split', action='store_true', help='Disable loading and applying stock splits')
+    parser.add_argument('--aggregate-fills', action='store_true', help='Merge the partial fills of an order into one trade at the volume-weighted price, exporting the merged fills')
     parser.add_argument('--bep', action='store_true', help='Enable break-even prices calculation')
+    parser.add_argument('--bep-engine', type=str, choices=['decimal', 'vectorized', 'yearly'], default='decimal', help='Break-even prices of --bep: exact Decimal (default), vectorized, or vectorized and restarted every year from the rounded year-end price')
     parser.add_argument('--no-ttest', action='store_true', dest='disable_ttest', help='Disable time test (it is ON by default; skipping P&L from sales after 3 years)')
+    parser.add_argument('--batch-tax', action='store_true', help='Compute taxes in one vectorized pass over all pairings')
+    parser.add_argument('--compare', action='store_true', help='Compare strategies in every configured year up to the tax year instead of a single run')
+    parser.add_argument('--candidates', type=str, help='Comma-separated strategies for --compare, default: all registered')
+    parser.add_argument('--sweep', type=str, choices=['max_cost', 'min_cost', 'micol'], help='Sweep the price thresholds of a cost strategy family in the tax year')
+    parser.add_argument('--grid', type=str, action='append', help='Sweep axis, e.g. far=0.05,0.085,0.12 (repeatable; near_days, far_days, near, mid, far)')
+    parser.add_argument('--jobs', type=int, default=1, help='Worker processes for --compare and --sweep')
+    parser.add_argument('--ttest-calendar', action='store_true', help='Also report when the open lots pass the time test, by month')
+    parser.add_argument('--ledger', type=str, help='Also record trades, splits, lots and pairings in this SQLite file (query with ledger.py)')
+    parser.add_argument('--watch', action='store_true', help='Treat the files as directories to watch for new or changed statements')
+    parser.add_argument('--interval', type=float, default=60.0, help='Seconds between --watch polls')
+    parser.add_argument('--positions', action='store_true', help='Report split-adjusted holdings instead of taxes')
+    parser.add_argument('--as-of', type=str, help='Date of the --positions snapshot, default: end of the tax year')
+    parser.add_argument('--timeline', type=str, choices=['daily', 'monthly'], help='Also export the holdings timeline with --positions')
+    parser.add_argument('--out-of-core', action='store_true', help='Stream the files into per-product partitions on disk and process one product at a time')
+    parser.add_argument('--spill-dir', type=str, help='Directory to create the --out-of-core partitions in, default: the system temporary directory')
+    parser.add_argument('--chunk-rows', type=int, default=100_000, help='Rows read at a time with --out-of-core')
+    parser.add_argument('--store', type=str, help='Columnar trade archive: store the imported files of the account in it, then process the account from it (the files can be omitted)')
+    parser.add_argument('--account', type=str, help='Account code of the outputs and of --store, default: detected from the flags and file name')
     parser.add_argument('-o', '--options', action='store_true', help='Import options trades')
     parser.add_argument('--symbols', type=str, help='Comma-separated list of symbols to process')
-    parser.add_argument('files', nargs='+', help='Files to process')
+    parser.add_argument('files', nargs='*', help='Files to process')
     args = parser.parse_args()
 
     if not (args.deg or args.ibkr or args.options):
@@ -355,6 +945,19 @@ def main():
         parser.error('Only one of --deg or --ibkr can be specified')
     if args.deg and args.options:
         parser.error('Only --ibkr can be used with --options')
+    if args.out_of_core and args.store:
+        parser.error('Only one of --out-of-core or --store can be specified')
+    if (args.out_of_core or args.store) and (args.watch or args.positions or args.sweep or args.compare):
+        parser.error('--out-of-core and --store cannot be used with --watch, --positions, --sweep or --compare')
+    if args.aggregate_fills and args.watch:
+        parser.error('--aggregate-fills cannot be used with --watch')
+    if args.ledger and args.watch:
+        # A ledger run holds a whole account, --watch pairs again only the changed products.
+        parser.error('--ledger cannot be used with --watch')
+    if not args.files and not args.store:
+        parser.error('Files to process are required, unless the account is read from --store')
+    if not args.files and args.deg and not args.account:
+        parser.error('--account is required to read a Degiro account from --store')
 
     if not args.year:
         args.year = datetime.now().year - 1
@@ -362,30 +965,133 @@ def main():
 
     os.chdir(os.path.dirname(__file__))
     account_code = detect_account_code(args)  # Used in output file names.
-    if args.deg:
-        # Import from one or more Degiro CSV files
-        df_list = [import_transactions(f) for f in args.files]
-        df_transactions = pd.concat(df_list, ignore_index=True)
-    elif args.options:
-        # Import options from one or more IBKR CSV files
-        df_transactions = import_ibkr_option_transactions(args.files)
-    else:
-        # Import stocks from one or more IBKR CSV files
-        df_transactions = import_ibkr_stock_transactions(args.files)
 
-    # pairing strategies for each tax year
+    # pairing strategies for each tax year (validated before the slow import phase)
     strategies = setup_strategies(args)
-
-    # load corporate actions (stock splits)
-    splits_df = load_stock_splits("config/corporate_actions.csv") if not args.no_split else None
+    if args.compare and not any(year <= args.year for year in strategies):
+        parser.error(f'--compare needs a strategy configured for {args.year} or an earlier year')
+
+    # load corporate actions (stock splits) and the changed or aliased product ids
+    splits_df = None
+    if not args.no_split:
+        from corporate_action import load_stock_splits
+        splits_df = load_stock_splits("config/corporate_actions.csv")
+    identifiers = load_identifiers(args, "config/corporate_actions.csv")
+    if identifiers is not None:
+        print(f"Resolving {len(identifiers)} changed or aliased product ids")
+        if splits_df is not None:
+            splits_df = identifiers.resolve_ids(splits_df, ["Symbol", "ISIN"])
+        if args.symbols:
+            args.symbols = ','.join(identifiers.canonical(s.strip()) for s in args.symbols.split(','))
+
+    skip_rules = load_rules(args)
+
+    if args.watch:
+        watch_all(
+            args.files, args.year, strategies, account_code, splits_df,
+            deg=args.deg,
+            enable_bep=args.bep,
+            enable_ttest=not args.disable_ttest,
+            options=args.options,
+            symbols_filter_str=args.symbols,
+            batch_tax=args.batch_tax,
+            interval=args.interval,
+            skip_rules=skip_rules,
+            bep_engine=args.bep_engine,
+            identifiers=identifiers,
+            ttest_calendar=args.ttest_calendar)
+        return
+
+    if args.store:
+        from trade_store import TradeStore
+        store = TradeStore(args.store)
+        if args.files:
+            # The archive keeps all trades of the files; --symbols, the tax year and skip rules apply on reading.
+            df_transactions = import_all(args, pushdown=False, identifiers=identifiers)
+            store.write(account_code, df_transactions)
+            print(f"Stored {len(df_transactions)} trades of account {account_code} in {args.store}")
+        optimize_partitioned(
+            store.open(account_code), args.year, strategies, account_code, splits_df,
+            enable_bep=args.bep,
+            enable_ttest=not args.disable_ttest,
+            options=args.options,
+            symbols_filter_str=args.symbols,
+            skip_rules=skip_rules,
+            aggregate_fills=args.aggregate_fills,
+            batch_tax=args.batch_tax,
+            ledger_path=args.ledger,
+            ttest_calendar=args.ttest_calendar,
+            bep_engine=args.bep_engine)
+        print()
+        print("Processed file(s):", args.files or [f"{args.store}/{account_code}"])
+        print("Done.")
+        return
+
+    if args.out_of_core:
+        import tempfile
+        with tempfile.TemporaryDirectory(dir=args.spill_dir) as spill_dir:
+            store = partition_all(args, spill_dir, skip_rules, identifiers)
+            optimize_partitioned(
+                store, args.year, strategies, account_code, splits_df,
+                enable_bep=args.bep,
+                enable_ttest=not args.disable_ttest,
+                options=args.options,
+                symbols_filter_str=args.symbols,
+                aggregate_fills=args.aggregate_fills,
+                batch_tax=args.batch_tax,
+                ledger_path=args.ledger,
+                ttest_calendar=args.ttest_calendar,
+                bep_engine=args.bep_engine)
+        print()
+        print("Processed file(s):", args.files)
+        print("Done.")
+        return
+
+    df_transactions = import_all(args, identifiers=identifiers)
+    if skip_rules:
+        from skip_rules import apply_skip_rules
+        df_transactions = apply_skip_rules(df_transactions, skip_rules)
+    if args.aggregate_fills:
+        from fills import aggregate_fills
+        df_orders, fills = aggregate_fills(df_transactions)
+        export_fills(len(df_transactions), len(df_orders), [fills], account_code, args.year)
+        df_transactions = df_orders
 
     # *** main processing ***
-    optimize_all(
-        df_transactions, args.year, strategies, account_code, splits_df,
-        enable_bep=args.bep,
-        enable_ttest=not args.disable_ttest,
-        options=args.options,
-        symbols_filter_str=args.symbols)
+    if args.positions:
+        positions_all(df_transactions, args.year, account_code, splits_df, as_of=args.as_of,
+                      timeline=args.timeline, symbols_filter_str=args.symbols)
+    elif args.sweep:
+        sweep_all(
+            df_transactions, args.year, strategies, args.sweep, args.grid, account_code, splits_df,
+            enable_bep=args.bep,
+            enable_ttest=not args.disable_ttest,
+            options=args.options,
+            symbols_filter_str=args.symbols,
+            workers=args.jobs)
+    elif args.compare:
+        candidates = [s.strip() for s in args.candidates.split(',')] if args.candidates else list_strategies()
+        unknown = sorted(name for name in set(candidates) if not is_strategy(name))
+        if unknown:
+            raise ValueError(f"Unknown strategy to compare: {', '.join(unknown)}")
+        compare_all(
+            df_transactions, args.year, strategies, candidates, account_code, splits_df,
+            enable_bep=args.bep,
+            enable_ttest=not args.disable_ttest,
+            options=args.options,
+            symbols_filter_str=args.symbols,
+            workers=args.jobs)
+    else:
+        optimize_all(
+            df_transactions, args.year, strategies, account_code, splits_df,
+            enable_bep=args.bep,
+            enable_ttest=not args.disable_ttest,
+            options=args.options,
+            symbols_filter_str=args.symbols,
+            batch_tax=args.batch_tax,
+            ledger_path=args.ledger,
+            ttest_calendar=args.ttest_calendar,
+            bep_engine=args.bep_engine)
 
     print()
     print("Processed file(s):", args.files)
@@ -0,0 +1,242 @@
+"""
+Small min-cost-flow solver: successive shortest paths with Dijkstra and node potentials.
+
+Pure Python and integer-only, callers scale their costs to integers. Supplies are routed one supply node at
+a time (``send``), which keeps every Dijkstra run local to the part of the network that node can reach.
+Negative edge costs are allowed as long as there are no negative cycles. Initial potentials come from a
+Bellman-Ford pass in reverse node order, which is a single pass when every edge points to a higher node id.
+
+A flow found some other way can be loaded edge by edge (``add_flow``) and made optimal by cancelling
+negative cycles (``cancel_negative_cycles``), which is cheap when the loaded flow is close to optimal.
+"""
+import heapq
+from collections import deque
+from typing import List, Optional
+
+INF = float('inf')
+
+
+class MinCostFlow:
+    def __init__(self):
+        self._adj: List[List[int]] = []
+        # Edge e and its reverse e ^ 1 live side by side in these parallel lists.
+        self._to: List[int] = []
+        self._cap: List[int] = []
+        self._cost: List[int] = []
+        self._orig_cap: List[int] = []
+        # Node potentials; Dijkstra runs only update the nodes they finalise.
+        self._potential: Optional[List[int]] = None
+
+    @property
+    def node_count(self) -> int:
+        return len(self._adj)
+
+    def add_node(self) -> int:
+        self._adj.append([])
+        return len(self._adj) - 1
+
+    def add_nodes(self, count: int) -> range:
+        start = len(self._adj)
+        self._adj.extend([] for _ in range(count))
+        return range(start, start + count)
+
+    def add_edge(self, u: int, v: int, cap: int, cost: int) -> int:
+        if self._potential is not None:
+            raise ValueError("Cannot add edges once flow has been sent")
+        e = len(self._to)
+        self._to += [v, u]
+        self._cap += [cap, 0]
+        self._cost += [cost, -cost]
+        self._orig_cap += [cap, 0]
+        self._adj[u].append(e)
+        self._adj[v].append(e + 1)
+        return e
+
+    def add_flow(self, e: int, amount: int) -> None:
+        """Route *amount* more units along edge *e*; the caller keeps the flow balanced."""
+        if amount > self._cap[e]:
+            raise ValueError(f"Edge {e} has only {self._cap[e]} capacity left, cannot add {amount}")
+        self._cap[e] -= amount
+        self._cap[e ^ 1] += amount
+
+    def edge_flow(self, e: int) -> int:
+        return self._orig_cap[e] - self._cap[e]
+
+    def edge_head(self, e: int) -> int:
+        return self._to[e]
+
+    def out_edges(self, u: int) -> List[int]:
+        """Forward (non-reverse) edges leaving *u*."""
+        return [e for e in self._adj[u] if not e & 1]
+
+    def _initial_potentials(self) -> List[int]:
+        # Minus the shortest distance to a virtual sink reachable from every node at zero cost. Edges on a
+        # shortest path to the real sink then have zero reduced cost, so Dijkstra heads straight for it.
+        n = self.node_count
+        dist = [0] * n
+        for _ in range(n):
+            changed = False
+            for u in range(n - 1, -1, -1):
+                du = dist[u]
+                for e in self._adj[u]:
+                    if self._cap[e] > 0 and self._cost[e] + dist[self._to[e]] < du:
+                        du = self._cost[e] + dist[self._to[e]]
+                        changed = True
+                dist[u] = du
+            if not changed:
+                return [-d for d in dist]
+        raise ValueError("Negative cycle in the flow network")
+
+    def send(self, s: int, t: int, amount: int) -> int:
+        """Route up to *amount* units from *s* to *t* at minimum cost; return the amount routed."""
+        if self._potential is None:
+            self._potential = self._initial_potentials()
+        adj, to, cap, cost, potential = self._adj, self._to, self._cap, self._cost, self._potential
+
+        sent = 0
+        while sent < amount:
+            dist = {s: 0}
+            prev_edge = {}
+            done = set()
+            heap = [(0, -s)]
+            while heap:
+                d, u = heapq.heappop(heap)
+                u = -u
+                if u in done:
+                    continue
+                done.add(u)
+                if u == t:
+                    break
+                pu = potential[u]
+                for e in adj[u]:
+                    if cap[e] == 0:
+                        continue
+                    v = to[e]
+                    nd = d + cost[e] + pu - potential[v]
+                    if nd < dist.get(v, INF):
+                        dist[v] = nd
+                        prev_edge[v] = e
+                        heapq.heappush(heap, (nd, -v))
+
+            if t not in done:
+                break
+
+            # Every node implicitly gains dist(t); finalised nodes gain their own (smaller) distance.
+            dt = dist[t]
+            for v in done:
+                potential[v] += dist[v] - dt
+
+            push = amount - sent
+            v = t
+            while v != s:
+                e = prev_edge[v]
+                push = min(push, cap[e])
+                v = to[e ^ 1]
+            v = t
+            while v != s:
+                e = prev_edge[v]
+                cap[e] -= push
+                cap[e ^ 1] += push
+                v = to[e ^ 1]
+            sent += push
+
+        return sent
+
+    def cancel_negative_cycles(self) -> int:
+        """
+        Push flow around negative-cost cycles of the residual network until there are none, which makes the
+        current flow a minimum-cost one for its supplies. Returns the number of cycles cancelled.
+
+        Queue-based Bellman-Ford from all nodes at once with Tarjan's subtree disassembly: the parent edges
+        form a tree kept in preorder, a node whose label drops takes its subtree out of the tree (those labels
+        drop too once it is scanned), and finding the scanned node in that subtree closes a negative cycle.
+        Labels stay valid across cancellations, only the cycle's nodes are scanned again.
+        """
+        adj, to, cap, cost = self._adj, self._to, self._cap, self._cost
+        n = self.node_count
+        dist = [0] * n
+        parent = [-1] * n
+        depth = [0] * n
+        # Preorder thread of the tree, a ring through the sentinel n; a subtree is its root and the deeper
+        # nodes following it. Nodes out of the thread (in_tree False) wait for a new parent.
+        nxt = list(range(1, n + 1)) + [0]
+        prv = [n] + list(range(n))
+        in_tree = [True] * n
+        queued = [True] * n
+        queue = deque(range(n))
+        cancelled = 0
+
+        def unlink(first: int, last: int) -> None:
+            nxt[prv[first]], prv[nxt[last]] = nxt[last], prv[first]
+
+        def insert_after(u: int, v: int) -> None:
+            nxt[v], prv[v] = nxt[u], u
+            prv[nxt[u]] = v
+            nxt[u] = v
+
+        def cut_off(v: int) -> None:
+            # A saturated parent edge: nodes waiting for a scan become roots, the others leave the tree
+            # until a label drop brings them back (their own edges were satisfied when they were scanned).
+            members, w = [v], nxt[v]
+            while w != n and depth[w] > depth[v]:
+                members.append(w)
+                w = nxt[w]
+            unlink(v, members[-1])
+            for w in members:
+                parent[w], depth[w], in_tree[w] = -1, 0, queued[w]
+                if queued[w]:
+                    insert_after(n, w)
+
+        while queue:
+            u = queue.popleft()
+            queued[u] = False
+            if not in_tree[u]:
+                continue
+            du = dist[u]
+            for e in adj[u]:
+                if cap[e] == 0:
+                    continue
+                v = to[e]
+                if du + cost[e] >= dist[v]:
+                    continue
+                subtree, last, closes_cycle = [], v, False
+                if in_tree[v]:
+                    w = nxt[v]
+                    while w != n and depth[w] > depth[v]:
+                        closes_cycle |= w == u
+                        subtree.append(w)
+                        last = w
+                        w = nxt[w]
+                if closes_cycle:
+                    cycle, w = [e], u
+                    while w != v:
+                        cycle.append(parent[w])
+                        w = to[parent[w] ^ 1]
+                    amount = min(cap[c] for c in cycle)
+                    for c in cycle:
+                        cap[c] -= amount
+                        cap[c ^ 1] += amount
+                    cancelled += 1
+                    for c in cycle:
+                        if cap[c] == 0 and parent[to[c]] == c:
+                            cut_off(to[c])
+                    # New reverse edges leave the cycle's nodes.
+                    for c in cycle:
+                        w = to[c]
+                        if not in_tree[w]:
+                            parent[w], depth[w], in_tree[w] = -1, 0, True
+                            insert_after(n, w)
+                        if not queued[w]:
+                            queued[w] = True
+                            queue.append(w)
+                    break
+                if in_tree[v]:
+                    unlink(v, last)
+                for w in subtree:
+                    parent[w], in_tree[w] = -1, False
+                dist[v], parent[v], depth[v], in_tree[v] = du + cost[e], e, depth[u] + 1, True
+                insert_after(u, v)
+                if not queued[v]:
+                    queued[v] = True
+                    queue.append(v)
+        return cancelled
@@ -0,0 +1,440 @@
+"""
+'optimal' pairing strategy.
+
+All sales of a tax year are paired against all eligible open lots at once, as a min-cost-flow
+(transportation) problem minimising the taxable profit in CZK:
+
+* a sale can use any lot bought strictly before it,
+* a pair costs ``income - cost`` per share (``unified_fx_rate`` of the respective years), or nothing when
+  the lot passes the 3-year time test for that sale and the time test is enabled,
+* every sale covers as many shares as the chronological pairing covers (the most any pairing covers), the
+  rest opens a short.
+
+A sale's fee is deducted only from a taxed sale, and a lot's fee only from the first sale using the lot
+(when that pair is taxed), so both go with a single share: a lot with its fee still available enters as one
+share costing ``cost + fee`` plus the rest at ``cost``, a sale with a fee as one share whose untaxed income is
+``income - fee`` plus the rest. Pairing the fee share first never loses anything, which keeps this exact.
+
+A year's sales span less than the time-test age, so every lot bought before the first sale passes the test
+for a suffix of the sales and a lot bought during the year is taxed for every later sale. Lots and sales then
+sit on a line: the aged lots pool before the first sale, the other earlier lots at the first sale they pass
+the test for, the year's lots just before the first sale after them. A left-to-right sweep over that line pairs
+(almost) optimally with a few heaps; the sweep's flow is loaded into a compact network of O(lots + sales)
+edges and made exact by cancelling negative cycles. With the time test enabled this plans 10,000 lots and
+1,000 sales in about a second and 30,000 lots and 2,000 sales in about 1.5 s. Without the time test (or
+without lots that could pass it) the greedy solution is optimal and the year is planned in
+O((lots + sales) log lots).
+"""
+import heapq
+import itertools
+from bisect import bisect_left, bisect_right
+from collections import deque
+from datetime import timedelta
+from decimal import Decimal
+from typing import Callable, Dict, List, Tuple
+
+from currency import unified_fx_rate
+from min_cost_flow import MinCostFlow
+from optimizer import add_buy_record
+from strategy_registry import register_strategy, PairingOptions, FindBuys
+from transaction import Transaction, BuyRecord
+
+TTEST_MIN_AGE = timedelta(days=3 * 365 + 1)  # The time test passes when (sale - buy).days > 3 * 365.
+COST_SCALE = Decimal(10) ** 8  # Prices have 6 decimal places, FX rates 2.
+
+Allocation = Dict[Transaction, List[Tuple[Transaction, int]]]
+
+
+def czk_per_share(t: Transaction) -> Decimal:
+    return t.share_price * unified_fx_rate(t.time.year, t.currency) * t._multiplier
+
+
+def _scaled(value: Decimal) -> int:
+    return int(value * COST_SCALE)
+
+
+def _lot_fee(t: Transaction) -> Decimal:
+    """CZK fee of the lot, charged with the next sale using it when that pair is taxed."""
+    return t.fee * unified_fx_rate(t.time.year, t.fee_currency) if t.fee_available else Decimal(0)
+
+
+def _lot_units(t: Transaction) -> List[Tuple[Decimal, int]]:
+    """(CZK cost per share, share count) of the lot, whose fee goes with its first share."""
+    cost, fee = czk_per_share(t), _lot_fee(t)
+    if fee <= 0:
+        return [(cost, t.remaining_count)]
+    return [(cost + fee, 1)] + ([(cost, t.remaining_count - 1)] if t.remaining_count > 1 else [])
+
+
+def _chronological_cover(sales: List[Transaction], lots: List[Transaction]) -> List[int]:
+    """Shares of every sale the chronological pairing covers, as many as any pairing covers at most."""
+    covered, available, k = [], 0, 0
+    for sale_t in sales:
+        while k < len(lots) and lots[k].time < sale_t.time:
+            available += lots[k].remaining_count
+            k += 1
+        count = min(available, -sale_t.count)
+        available -= count
+        covered.append(count)
+    return covered
+
+
+def _solve_greedy(sales: List[Transaction], lots: List[Transaction]) -> Allocation:
+    """
+    Without time-test-passing lots, chronologically pairing every sale with the most expensive lots still
+    available is optimal: any lot a later sale can use, the earlier sale could use too.
+    """
+    allocation: Allocation = {}
+    left: Dict[Tuple[int, int], int] = {}
+    heap: List[Tuple[Decimal, int, int]] = []
+    k = 0
+    for sale_t in sales:
+        while k < len(lots) and lots[k].time < sale_t.time:
+            for unit, (cost, count) in enumerate(_lot_units(lots[k])):
+                left[k, unit] = count
+                heapq.heappush(heap, (-cost, k, unit))
+            k += 1
+        need, pairs = -sale_t.count, {}
+        while need and heap:
+            _, j, unit = heap[0]
+            count = min(need, left[j, unit])
+            pairs[j] = pairs.get(j, 0) + count
+            need -= count
+            left[j, unit] -= count
+            if left[j, unit] == 0:
+                heapq.heappop(heap)
+        if pairs:
+            allocation[sale_t] = [(lots[j], count) for j, count in sorted(pairs.items())]
+    return allocation
+
+
+class _Pairs:
+    """*count* pairs of the line elements *left* and *right*, or *count* unpaired *left* elements."""
+    __slots__ = ('count', 'left', 'right')
+
+    def __init__(self, count: int, left: int, right: int = -1):
+        self.count, self.left, self.right = count, left, right
+
+
+class _Line:
+    """
+    The year's sales and lots on a line (see the module docstring). Elements are sales ('S'), lots bought
+    before the first sale ('C', the aged pool is one of them) and lots bought during the year ('N'), with a
+    value in scaled CZK per share: the income for a sale, the cost for a lot.
+    """
+
+    def __init__(self, sales: List[Transaction], covered: List[int], lots: List[Transaction]):
+        self.sales, self.lots = sales, lots
+        self.m = len(sales)
+        self.kind: List[str] = []
+        self.value: List[int] = []
+        self.count: List[int] = []
+        self.position: List[int] = []
+        self.ref: List[int] = []  # sale index, lot index or -1 for the pool
+
+        times = [t.time for t in sales]
+        for i, (sale_t, count) in enumerate(zip(sales, covered)):
+            income = czk_per_share(sale_t)
+            fee = sale_t.fee * unified_fx_rate(sale_t.time.year, sale_t.fee_currency)
+            # The fee is saved only if all shares pass the time test, so the first share is worth less untaxed.
+            if fee > 0 and count:
+                self._add('S', _scaled(income - fee), 1, i, i)
+                count -= 1
+            if count:
+                self._add('S', _scaled(income), count, i, i)
+
+        total = sum(covered)
+        self.pool: List[Transaction] = []
+        always_taxed: List[Tuple[Decimal, int, int]] = []
+        for k, t in enumerate(lots):
+            if t.time < times[0]:
+                a = bisect_left(times, t.time + TTEST_MIN_AGE)
+                if a == 0:
+                    self.pool.append(t)
+                elif a == self.m:
+                    always_taxed += [(cost, count, k) for cost, count in _lot_units(t)]
+                else:
+                    for cost, count in _lot_units(t):
+                        self._add('C', _scaled(cost), count, a, k)
+            else:
+                for cost, count in _lot_units(t):
+                    self._add('N', _scaled(cost), count, bisect_right(times, t.time), k)
+        if self.pool:
+            self._add('C', 0, sum(t.remaining_count for t in self.pool), 0, -1)
+        # Lots taxed for every sale are interchangeable apart from their cost: the most expensive shares
+        # covering the year are enough.
+        kept = 0
+        for cost, count, k in sorted(always_taxed, key=lambda u: (-u[0], u[2])):
+            if kept >= total:
+                break
+            self._add('C', _scaled(cost), count, self.m, k)
+            kept += count
+
+        # Lots come before the sale at their position.
+        self.order = sorted(range(len(self.kind)), key=lambda x: (self.position[x], self.kind[x] == 'S'))
+
+    def _add(self, kind: str, value: int, count: int, position: int, ref: int) -> None:
+        self.kind.append(kind)
+        self.value.append(value)
+        self.count.append(count)
+        self.position.append(position)
+        self.ref.append(ref)
+
+    def sweep(self) -> List[_Pairs]:
+        """
+        Pair the elements from left to right, each taking the best of its options: an unpaired element, or
+        a pairing undone with the freed element unpaired again, or with its left element paired to the new
+        one instead. Exact without 'N' lots, close otherwise.
+        """
+        kind, value = self.kind, self.value
+        values = value or [0]
+        # Every covered share outweighs any difference in value.
+        big = 1 + 2 * sum(self.count) * (max(values) - min(values) + 1) + max(map(abs, values))
+
+        def left_value(x: int) -> int:
+            return value[x] if kind[x] == 'N' else 0
+
+        def right_value(x: int, partner: str) -> int:
+            if kind[x] == 'S':
+                return (value[x] if partner == 'C' else 0) + big
+            return value[x] + big
+
+        # Options by the kind of left element they offer: (-gain, seq, action, pairs).
+        heaps: Dict[str, list] = {'C': [], 'N': [], 'S': []}
+        seq = itertools.count()
+        pairs: List[_Pairs] = []
+
+        def offer(kind_: str, gain: int, action: str, p: _Pairs) -> None:
+            heapq.heappush(heaps[kind_], (-gain, next(seq), action, p))
+
+        def unpaired(x: int, count: int) -> None:
+            offer(kind[x], left_value(x), 'open', _Pairs(count, x))
+
+        partners = {'S': ('C', 'N'), 'C': ('S',), 'N': ()}
+        for x in self.order:
+            need = self.count[x]
+            while need:
+                best = None
+                for partner in partners[kind[x]]:
+                    heap = heaps[partner]
+                    while heap and heap[0][3].count == 0:
+                        heapq.heappop(heap)
+                    if heap:
+                        gain = right_value(x, partner) - heap[0][0]
+                        if gain > 0 and (best is None or gain > best[0]):
+                            best = (gain, partner, heap[0])
+                if best is None:
+                    break
+                _, partner, (_, _, action, p) = best
+                count = min(need, p.count)
+                p.count -= count
+                need -= count
+                if action == 'open':
+                    y = p.left
+                elif action == 'replace':  # y leaves its right element for x
+                    y = p.left
+                    unpaired(p.right, count)
+                else:  # 'switch': y leaves its left element and becomes the left element of x
+                    y = p.right
+                    unpaired(p.left, count)
+                paired = _Pairs(count, y, x)
+                pairs.append(paired)
+                if partner != 'N':
+                    offer(partner, -right_value(x, partner), 'replace', paired)
+                offer(kind[x], left_value(x) - left_value(y) - right_value(x, partner), 'switch', paired)
+            if need:
+                unpaired(x, need)
+        return [p for p in pairs if p.count]
+
+    def solve(self) -> List[Dict[int, int]]:
+        """Per sale {lot index or -1 for the pool: share count} of an optimal pairing."""
+        kind, value, count, position = self.kind, self.value, self.count, self.position
+        m, n = self.m, len(kind)
+        infinite = sum(c for c, k in zip(count, kind) if k == 'S')
+
+        # Rails along the line: untaxed shares and shares of lots bought during the year flow to later sales,
+        # taxed shares of lots bought before the first sale to earlier ones. The lots of a kind at a position
+        # share a node, with an edge of their own only where their costs differ, on the way to a taxed sale.
+        g = MinCostFlow()
+        aged_rail, new_rail, taxed_rail = g.add_nodes(m), g.add_nodes(m), g.add_nodes(m)
+        source, sink = g.add_node(), g.add_node()
+        rail_edges = [[g.add_edge(rail[i], rail[i + 1], infinite, 0) for i in range(m - 1)]
+                      for rail in (aged_rail, new_rail)]
+        rail_edges.append([g.add_edge(taxed_rail[i + 1], taxed_rail[i], infinite, 0) for i in range(m - 1)])
+        groups: Dict[Tuple[str, int], List[int]] = {}
+        for x in self.order:
+            if kind[x] != 'S':
+                groups.setdefault((kind[x], position[x]), []).append(x)
+        supply: Dict[Tuple[str, int], int] = {}  # source edge of a group
+        group_aged: Dict[Tuple[str, int], int] = {}  # untaxed edge of a group
+        end = [-1] * n  # sale: sink edge
+        aged = [-1] * n  # sale: untaxed edge in
+        taxed = [-1] * n  # sale: edge in from the taxed rail, lot: edge out to the taxed or new-lot rail
+        new = [-1] * n  # sale: edge in from the new-lot rail
+        for (k, i), members in groups.items():
+            node = g.add_node()
+            supply[k, i] = g.add_edge(source, node, sum(count[x] for x in members), 0)
+            if k == 'C' and i < m:
+                group_aged[k, i] = g.add_edge(node, aged_rail[i], infinite, 0)
+            if k == 'N' or i > 0:
+                rail = new_rail[i] if k == 'N' else taxed_rail[i - 1]
+                for x in members:
+                    taxed[x] = g.add_edge(node, rail, count[x], -value[x])
+        for x in self.order:
+            if kind[x] == 'S':
+                i, node = position[x], g.add_node()
+                aged[x] = g.add_edge(aged_rail[i], node, infinite, -value[x])
+                taxed[x] = g.add_edge(taxed_rail[i], node, infinite, 0)
+                new[x] = g.add_edge(new_rail[i], node, infinite, 0)
+                end[x] = g.add_edge(node, sink, count[x], 0)
+
+        # Load the sweep's pairs, then cancel what it missed.
+        rail_flow = [[0] * m for _ in range(3)]
+        for p in self.sweep():
+            y, x, c = p.left, p.right, p.count
+            if kind[y] == 'S':  # taxed, x is a lot bought before the first sale
+                sale, lot, rail, lo, hi = y, x, 2, position[y], position[x] - 1
+                edges = (taxed[lot], taxed[sale])
+            else:
+                sale, lot, rail, lo, hi = x, y, 0 if kind[y] == 'C' else 1, position[y], position[x]
+                edges = (group_aged[kind[y], lo], aged[sale]) if rail == 0 else (taxed[lot], new[sale])
+            for e in (supply[kind[lot], position[lot]], end[sale]) + edges:
+                g.add_flow(e, c)
+            rail_flow[rail][lo] += c
+            rail_flow[rail][hi] -= c
+        for edges, flow in zip(rail_edges, rail_flow):
+            running = 0
+            for e, f in zip(edges, flow):
+                running += f
+                if running:
+                    g.add_flow(e, running)
+        g.cancel_negative_cycles()
+
+        # Shares per lot element and rail: a group's untaxed shares are what its taxed edges leave, oldest first.
+        lot_flow = [[0] * n for _ in range(3)]
+        for (k, i), members in groups.items():
+            untaxed = g.edge_flow(group_aged[k, i]) if (k, i) in group_aged else 0
+            for x in members:
+                if taxed[x] >= 0:
+                    lot_flow[1 if k == 'N' else 2][x] = g.edge_flow(taxed[x])
+                used = min(untaxed, count[x] - lot_flow[2][x])
+                lot_flow[0][x] = used
+                untaxed -= used
+
+        # Hand out every rail's shares in line order: lots join a queue, sales take from its front.
+        pairs: List[Dict[int, int]] = [{} for _ in range(m)]
+        for elements, flow, sale_edge in ((self.order, lot_flow[0], aged), (self.order, lot_flow[1], new),
+                                          (reversed(self.order), lot_flow[2], taxed)):
+            queue = deque()
+            for x in elements:
+                if kind[x] != 'S':
+                    if flow[x]:
+                        queue.append([self.ref[x], flow[x]])
+                    continue
+                need = g.edge_flow(sale_edge[x])
+                sale_pairs = pairs[self.ref[x]]
+                while need:
+                    lot = queue[0]
+                    c = min(need, lot[1])
+                    sale_pairs[lot[0]] = sale_pairs.get(lot[0], 0) + c
+                    need -= c
+                    lot[1] -= c
+                    if lot[1] == 0:
+                        queue.popleft()
+        return pairs
+
+    def allocation(self) -> Allocation:
+        """The optimal pairing with the pool's shares handed out oldest lot first."""
+        pool_left = [t.remaining_count for t in self.pool]
+        k = 0
+        allocation: Allocation = {}
+        for sale_t, p in zip(self.sales, self.solve()):
+            result: List[Tuple[Transaction, int]] = []
+            for j, count in sorted(p.items()):
+                if j >= 0:
+                    result.append((self.lots[j], count))
+                    continue
+                while count:
+                    while pool_left[k] == 0:
+                        k += 1
+                    used = min(count, pool_left[k])
+                    pool_left[k] -= used
+                    count -= used
+                    result.append((self.pool[k], used))
+            if result:
+                allocation[sale_t] = result
+        return allocation
+
+
+def solve_allocation(sales: List[Transaction], lots: List[Transaction], *, enable_ttest: bool) -> Allocation:
+    """
+    Pair *sales* (of one tax year) with the open *lots* at minimum taxable CZK profit.
+
+    Returns, for every sale, the (lot, share count) pairs in chronological order. Shares that cannot be
+    covered by any earlier lot are left out.
+    """
+    sales = sorted(sales, key=lambda t: t.time)
+    if not sales:
+        return {}
+    first_sale, last_sale = sales[0].time, sales[-1].time
+    lots = sorted((t for t in lots if not t.is_sale and t.remaining_count > 0 and t.time < last_sale),
+                  key=lambda t: t.time)
+    if not (enable_ttest and lots and lots[0].time + TTEST_MIN_AGE <= last_sale):
+        return _solve_greedy(sales, lots)
+    if last_sale - first_sale >= TTEST_MIN_AGE:
+        raise ValueError("The optimal strategy plans the sales of one tax year at a time.")
+
+    return _Line(sales, _chronological_cover(sales, lots), lots).allocation()
+
+
+def _add_most_expensive(buy_records: List[BuyRecord], lots: List[Transaction], remaining_sold_count: int,
+                        cost: Callable[[Transaction], Decimal] = czk_per_share) -> int:
+    """Pair the open *lots* (all bought before the sale) by *cost* per share, the highest first."""
+    for buy_t in sorted(lots, key=cost, reverse=True):
+        if remaining_sold_count == 0:
+            break
+        remaining_sold_count = add_buy_record(buy_records, buy_t, remaining_sold_count)
+    return remaining_sold_count
+
+
+def find_buys_czk_max_cost(sale_t: Transaction, trans: List[Transaction]) -> List[BuyRecord]:
+    """Per-sale fallback of the 'optimal' strategy: the lots with the highest CZK cost per share first."""
+    candidates = [t for t in trans if not t.is_sale and t.remaining_count > 0 and t.time < sale_t.time]
+    buy_records = []
+    if _add_most_expensive(buy_records, candidates, -sale_t.count) != 0:
+        raise ValueError("Could not pair transactions!")
+
+    return buy_records
+
+
+def plan_optimal_year(year: int, trans: List[Transaction], options: PairingOptions) -> FindBuys:
+    sales = [t for t in trans if t.is_sale and t.time.year == year]
+    lots = [t for t in trans if not t.is_sale and t.remaining_count > 0 and t.time.year <= year]
+    allocation = solve_allocation(sales, lots, enable_ttest=options.enable_ttest)
+    # Every open lot a sale of the year can see is among the planned lots.
+    costs = {t: czk_per_share(t) for t in lots}
+
+    def find_buys_planned(sale_t: Transaction, lots: List[Transaction]) -> List[BuyRecord]:
+        remaining_sold_count = -sale_t.count
+        buy_records = []
+        for buy_t, count in allocation.get(sale_t, []):
+            # Short covers earlier in the year may have used part of a planned lot.
+            count = min(count, remaining_sold_count, buy_t.remaining_count)
+            if count > 0:
+                add_buy_record(buy_records, buy_t, count)
+                remaining_sold_count -= count
+        if remaining_sold_count == 0:
+            return buy_records
+
+        # Whatever the plan could not cover is paired greedily; a genuine shortfall is reported as usual.
+        if _add_most_expensive(buy_records, lots, remaining_sold_count, costs.__getitem__) != 0:
+            raise ValueError("Could not pair transactions!")
+
+        return buy_records
+
+    return find_buys_planned
+
+
+# The plan needs the whole year's sales and later buys, the per-sale pairing only the open lots.
+register_strategy("optimal", find_buys_czk_max_cost, lot_index='open_lots', plan_year=plan_optimal_year,
+                  plan_index='transactions')
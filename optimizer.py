@@ -4,14 +4,17 @@ from typing import List, Callable, Dict
 from collections import deque
 from dataclasses import dataclass
 
+from checkpoints import CheckpointStore, LotStateSnapshot, LotState
+from lot_state import LotOverlay
+from pairing_result import PairingResult
 from transaction import Transaction, BuyRecord, SaleRecord
-
+from strategy_registry import register_strategy, register_strategy_family, compile_strategies, list_strategies, \
+    PairingOptions, LotPartition  # noqa: F401
 
 # TODO: Rename min_cost to min_cost0, or mark it as deprecated.
-def list_strategies() -> List[str]:
-    return ["fifo", "lifo", "max_cost", "min_cost", "micol"]
 
 
+@register_strategy("fifo")
 def find_buys_fifo(sale_t: Transaction, trans: List[Transaction]) -> List[BuyRecord]:
     remaining_sold_count = -sale_t.count
 
@@ -28,6 +31,7 @@ def find_buys_fifo(sale_t: Transaction, trans: List[Transaction]) -> List[BuyRec
     return buy_records
 
 
+@register_strategy("lifo")
 def find_buys_lifo(sale_t: Transaction, trans: List[Transaction]) -> List[BuyRecord]:
     remaining_sold_count = -sale_t.count
 
@@ -43,41 +47,77 @@ def find_buys_lifo(sale_t: Transaction, trans: List[Transaction]) -> List[BuyRec
     return buy_records
 
 
-def is_better_cost_pair(buy_t: Transaction, t: Transaction) -> bool:
-    if buy_t is None:
-        return True
-    day_diff = abs((buy_t.time - t.time).days)
-    return (day_diff < 20 and t.share_price > buy_t.share_price * Decimal('1.02')) \
-        or (day_diff < 75 and t.share_price > buy_t.share_price * Decimal('1.08')) \
-        or t.share_price > buy_t.share_price * Decimal('1.15')
+@dataclass(frozen=True)
+class CostThresholds:
+    """
+    Price ratios of the cost strategies: a lot beats the current pick when its price compares favourably to
+    the pick's price times *near* (lots less than *near_days* apart), *mid* (less than *far_days* apart)
+    or *far* (at any distance).
+    """
+    near: Decimal
+    mid: Decimal
+    far: Decimal
+    near_days: int = 20
+    far_days: int = 75
+
+    @classmethod
+    def parse(cls, params: str) -> 'CostThresholds':
+        """``near_mid_far`` or ``neardays_fardays_near_mid_far``, e.g. ``0.97_0.75_0.085``."""
+        values = params.split('_')
+        try:
+            if len(values) == 3:
+                return cls(*(Decimal(v) for v in values))
+            if len(values) == 5:
+                return cls(*(Decimal(v) for v in values[2:]), near_days=int(values[0]), far_days=int(values[1]))
+        except (ArithmeticError, ValueError):
+            pass
+        raise ValueError(f"Invalid cost thresholds: {params}")
+
+    def __str__(self):
+        return f"{self.near_days}_{self.far_days}_{self.near}_{self.mid}_{self.far}"
+
+
+MAX_COST_THRESHOLDS = CostThresholds(Decimal('1.02'), Decimal('1.08'), Decimal('1.15'))
+MIN_COST_THRESHOLDS = CostThresholds(Decimal('0.97'), Decimal('0.90'), Decimal('0.75'))
+# This version of min_cost eats much less shares eligible for the time test
+# pairing strategy 'micol' (min cost lifo) is much closer to lifo than min_cost
+MICOL_THRESHOLDS = CostThresholds(Decimal('0.97'), Decimal('0.75'), Decimal('0.085'))
 
 
-def is_lower_cost_pair(buy_t: Transaction, t: Transaction) -> bool:
+def is_higher_cost_pair(buy_t: Transaction, t: Transaction, th: CostThresholds) -> bool:
     if buy_t is None:
         return True
     day_diff = abs((buy_t.time - t.time).days)
-    return (day_diff < 20 and t.share_price < buy_t.share_price * Decimal('0.97')) \
-        or (day_diff < 75 and t.share_price < buy_t.share_price * Decimal('0.90')) \
-        or t.share_price < buy_t.share_price * Decimal('0.75')
+    return (day_diff < th.near_days and t.share_price > buy_t.share_price * th.near) \
+        or (day_diff < th.far_days and t.share_price > buy_t.share_price * th.mid) \
+        or t.share_price > buy_t.share_price * th.far
 
 
-# This version of min_cost eats much less shares eligible for the time test
-# pairing strategy 'micol' (min cost lifo) is much closer to lifo than min_cost
-def is_much_lower_cost_pair(buy_t: Transaction, t: Transaction) -> bool:
+def is_cheaper_cost_pair(buy_t: Transaction, t: Transaction, th: CostThresholds) -> bool:
     if buy_t is None:
         return True
     day_diff = abs((buy_t.time - t.time).days)
-    return (day_diff < 20 and t.share_price < buy_t.share_price * Decimal('0.97')) \
-        or (day_diff < 75 and t.share_price < buy_t.share_price * Decimal('0.75')) \
-        or t.share_price < buy_t.share_price * Decimal('0.085')
+    return (day_diff < th.near_days and t.share_price < buy_t.share_price * th.near) \
+        or (day_diff < th.far_days and t.share_price < buy_t.share_price * th.mid) \
+        or t.share_price < buy_t.share_price * th.far
 
 
-# Takes cost function as a parameter.
-def find_buys_generic_lifo(sale_t: Transaction, trans: List[Transaction],
-                           is_better_pair: Callable[[Transaction, Transaction], bool]) -> List[BuyRecord]:
-    remaining_sold_count = -sale_t.count
+def is_better_cost_pair(buy_t: Transaction, t: Transaction) -> bool:
+    return is_higher_cost_pair(buy_t, t, MAX_COST_THRESHOLDS)
 
-    buy_records = []
+
+def is_lower_cost_pair(buy_t: Transaction, t: Transaction) -> bool:
+    return is_cheaper_cost_pair(buy_t, t, MIN_COST_THRESHOLDS)
+
+
+def is_much_lower_cost_pair(buy_t: Transaction, t: Transaction) -> bool:
+    return is_cheaper_cost_pair(buy_t, t, MICOL_THRESHOLDS)
+
+
+def add_generic_lifo_records(buy_records: List[BuyRecord], sale_t: Transaction, trans: List[Transaction],
+                             is_better_pair: Callable[[Transaction, Transaction], bool],
+                             remaining_sold_count: int) -> int:
+    """Pair up to *remaining_sold_count* shares with the best lots of *trans*; returns the count left."""
     while remaining_sold_count > 0:
         buy_t = None
         for t in reversed([t for t in trans if not t.is_sale and t.remaining_count > 0 and t.time < sale_t.time]):
@@ -85,31 +125,105 @@ def find_buys_generic_lifo(sale_t: Transaction, trans: List[Transaction],
                 buy_t = t
 
         if buy_t is None:
-            print(f"Could not find a buy transaction for {sale_t}")
-            raise ValueError("Could not pair transactions!")
-
-        remaining_sold_count = add_buy_record(buy_records, buy_t, remaining_sold_count)
-        if remaining_sold_count == 0:
             break
+        remaining_sold_count = add_buy_record(buy_records, buy_t, remaining_sold_count)
+    return remaining_sold_count
 
-    if remaining_sold_count != 0:
+
+# Takes cost function as a parameter.
+def find_buys_generic_lifo(sale_t: Transaction, trans: List[Transaction],
+                           is_better_pair: Callable[[Transaction, Transaction], bool]) -> List[BuyRecord]:
+    buy_records = []
+    if add_generic_lifo_records(buy_records, sale_t, trans, is_better_pair, -sale_t.count) != 0:
+        print(f"Could not find a buy transaction for {sale_t}")
         raise ValueError("Could not pair transactions!")
 
     return buy_records
 
 
+@register_strategy("max_cost")
 def find_buys_max_cost(sale_t: Transaction, trans: List[Transaction]) -> List[BuyRecord]:
     return find_buys_generic_lifo(sale_t, trans, is_better_cost_pair)
 
 
+@register_strategy("min_cost")
 def find_buys_min_cost(sale_t: Transaction, trans: List[Transaction]) -> List[BuyRecord]:
     return find_buys_generic_lifo(sale_t, trans, is_lower_cost_pair)
 
 
+@register_strategy("micol")
 def find_buys_micol(sale_t: Transaction, trans: List[Transaction]) -> List[BuyRecord]:
     return find_buys_generic_lifo(sale_t, trans, is_much_lower_cost_pair)
 
 
+def lot_partition(sale_t: Transaction, lots) -> LotPartition:
+    return lots if isinstance(lots, LotPartition) else LotPartition.of(sale_t, lots)
+
+
+@register_strategy("ttest_first", lot_index='ttest_lots')
+def find_buys_ttest_first(sale_t: Transaction, lots) -> List[BuyRecord]:
+    """Lots passing the time test first (oldest first), then the youngest lots, so older ones keep ageing."""
+    partition = lot_partition(sale_t, lots)
+    remaining_sold_count = -sale_t.count
+
+    buy_records = []
+    for buy_t in partition.aged + partition.young[::-1]:
+        if buy_t.remaining_count > 0:
+            remaining_sold_count = add_buy_record(buy_records, buy_t, remaining_sold_count)
+        if remaining_sold_count == 0:
+            break
+
+    if remaining_sold_count != 0:
+        raise ValueError("Could not pair transactions!")
+
+    return buy_records
+
+
+@register_strategy("ttest_max_cost", lot_index='ttest_lots')
+def find_buys_ttest_max_cost(sale_t: Transaction, lots) -> List[BuyRecord]:
+    """
+    max_cost that first shelters gains: aged lots bought below the sale price (cheapest first) become untaxed
+    pairs. The remaining shares go to young lots by max_cost; aged lots at a loss come last, as untaxed pairs
+    would waste their deductible loss.
+    """
+    partition = lot_partition(sale_t, lots)
+    remaining_sold_count = -sale_t.count
+
+    buy_records = []
+    gains = sorted((t for t in partition.aged if t.share_price < sale_t.share_price), key=lambda t: t.share_price)
+    for buy_t in gains:
+        if remaining_sold_count == 0:
+            break
+        remaining_sold_count = add_buy_record(buy_records, buy_t, remaining_sold_count)
+
+    for candidates in (partition.young, partition.aged):
+        remaining_sold_count = add_generic_lifo_records(buy_records, sale_t, candidates, is_better_cost_pair,
+                                                        remaining_sold_count)
+
+    if remaining_sold_count != 0:
+        print(f"Could not find a buy transaction for {sale_t}")
+        raise ValueError("Could not pair transactions!")
+
+    return buy_records
+
+
+def cost_strategy_family(is_pair: Callable[[Transaction, Transaction, CostThresholds], bool]):
+    """Factory of ``family:thresholds`` strategies (see ``CostThresholds.parse``)."""
+    def factory(params: str):
+        thresholds = CostThresholds.parse(params)
+
+        def find_buys_thresholds(sale_t: Transaction, trans: List[Transaction]) -> List[BuyRecord]:
+            return find_buys_generic_lifo(sale_t, trans, lambda buy_t, t: is_pair(buy_t, t, thresholds))
+        return find_buys_thresholds
+    return factory
+
+
+# E.g. 'micol:20_75_0.97_0.75_0.1'; min_cost and micol only differ by their default thresholds.
+register_strategy_family("max_cost", cost_strategy_family(is_higher_cost_pair))
+register_strategy_family("min_cost", cost_strategy_family(is_cheaper_cost_pair))
+register_strategy_family("micol", cost_strategy_family(is_cheaper_cost_pair))
+
+
 def add_buy_record(buy_records, buy_t, remaining_sold_count):
     if buy_t is None:
         raise ValueError("No buy transaction found!")
@@ -127,33 +241,44 @@ def add_buy_record(buy_records, buy_t, remaining_sold_count):
 
 
 def find_buys(sale_t: Transaction, trans: List[Transaction], strategies: dict[int, str]) -> List[BuyRecord]:
-    # The strategy must be specified for every year since the first year is specified
-    if sale_t.time.year > max(strategies.keys()):
-        raise ValueError("No strategy specified for this year!")
-
-    method_suffix = 'fifo' if sale_t.time.year < min(strategies.keys()) else \
-                    strategies[sale_t.time.year]
-
-    # use reflection to call the correct method
-    method = globals()['find_buys_' + method_suffix]
-    return method(sale_t, trans)
+    # One-off lookup; the pairing loop compiles the strategy table once per run instead.
+    return compile_strategies(strategies).for_year(sale_t.time.year).find_buys(sale_t, trans)
 
 
-def calculate_break_even_prices(txs: List[Transaction]):
+def calculate_break_even_prices(txs: List[Transaction]) -> List[Transaction]:
+    """Copies of *txs* carrying the break-even price after each transaction."""
     quantity = 0
     total_cost = Decimal(0)
 
+    result = []
     for tx in txs:
         if not tx.is_sale:
             total_cost += tx.count * tx.share_price
             quantity += tx.count
-            tx.set_bep(total_cost / quantity)
+            result.append(tx.with_bep(total_cost / quantity))
         else:
             bep = total_cost / quantity
-            tx.set_bep(bep)
+            result.append(tx.with_bep(bep))
             total_cost += tx.count * bep  # Count is negative for sales
             quantity += tx.count
-        
+    return result
+
+
+BEP_ENGINES = ("decimal", "vectorized", "yearly")
+
+
+def add_break_even_prices(txs: List[Transaction], engine: str = "decimal") -> List[Transaction]:
+    """
+    Copies of *txs* with break-even prices of *engine*: the exact Decimal recurrence, its vectorized
+    version (see break_even) or the vectorized one restarting every year from the rounded year-end BEP.
+    """
+    if engine == "decimal":
+        return calculate_break_even_prices(txs)
+    if engine not in BEP_ENGINES:
+        raise ValueError(f"Unknown BEP engine: {engine}")
+    from break_even import calculate_break_even_prices_vectorized  # numpy is only needed for this engine
+    return calculate_break_even_prices_vectorized(txs, reset_yearly=engine == "yearly")
+
 
 def warn_about_default_strategy(trans: List[Transaction], strategies: dict[int,str]) -> None:
     for sale_t in [t for t in trans if t.is_sale]:
@@ -172,33 +297,49 @@ class _OpenShort:
 def optimize_transaction_pairing(
     trans: List[Transaction],
     strategies: Dict[int, str],
+    *,
+    enable_ttest: bool = False,
 ) -> List[SaleRecord]:
-    """
-    • When a SELL closes an existing long, use the legacy find_buys logic.
-      Any excess quantity becomes a new short lot.
-
-    • When a BUY covers a short, consume open shorts in strict FIFO order.
-      Any excess quantity opens (or enlarges) a long lot and will later be
-      matched by find_buys when a SELL occurs.
-
-    Long-only results remain byte-for-byte identical to the historical
-    implementation; short selling now works deterministically.
-
-    Initially written by GPT o3.
-    """
-    warn_about_default_strategy(trans, strategies)
-
-    sale_records: List[SaleRecord] = []
-    sale_map: Dict[Transaction, SaleRecord] = {}
-    open_shorts: deque[_OpenShort] = deque()        # FIFO queue of short lots
-
-    # Process chronologically
-    for t in sorted(trans, key=lambda x: x.time):
-
+    return pair_transactions(trans, strategies, enable_ttest=enable_ttest).sale_records()
+
+
+class _PairingRun:
+    """State of one pairing run; can be checkpointed at year boundaries and resumed from a checkpoint."""
+    def __init__(self, trans: List[Transaction], strategy_table, result: PairingResult):
+        self.trans = trans
+        self.order = sorted(trans, key=lambda x: x.time)
+        self.position = 0
+        self.strategy_table = strategy_table
+        self.lots = LotOverlay(trans)
+        self.lot_indexes = strategy_table.create_lot_indexes(self.lots.lots)
+        self.result = result
+        result.lots = self.lots
+        self.sale_map: Dict[Transaction, int] = {}          # sale -> record number
+        self.open_shorts: deque[_OpenShort] = deque()       # FIFO queue of short lots
+        self._saved_state: Dict[int, LotState] = {}         # lot state as of the last checkpoint
+
+    def run(self, checkpoints: CheckpointStore = None) -> PairingResult:
+        # Process chronologically
+        year = self.order[self.position - 1].time.year if self.position else None
+        while self.position < len(self.order):
+            t = self.order[self.position]
+            if checkpoints is not None and t.time.year != year:
+                year = t.time.year
+                self.checkpoint(checkpoints, year)
+            self.process(t)
+            self.position += 1
+
+        if self.open_shorts:
+            print("Warning: Unmatched open short positions remain after pairing.")
+            # TODO: Add some status reporting.
+
+        return self.result
+
+    def process(self, t: Transaction) -> None:
         # SELL: first close longs with the original machinery
         if t.is_sale:
             try:
-                buy_records = find_buys(t, trans, strategies)   # unchanged call
+                buy_records = self.strategy_table.find_buys(t, self.lot_indexes)
             except ValueError:
                 # TODO: Resolve this HACK. Add some status reporting.
                 print(f"Could not find a buy transaction for {t}, openning short.")
@@ -209,45 +350,157 @@ def optimize_transaction_pairing(
             excess_qty  = total_qty - matched_qty  # may be zero
 
             # Record the long close (even if partially matched)
-            sale_rec = SaleRecord(t, buy_records)
-            sale_records.append(sale_rec)
-            sale_map[t] = sale_rec
+            record = self.result.add_sale(t)
+            self.sale_map[t] = record
+            for br in buy_records:
+                self.result.add_pair(record, br.buy_t, br._count_consumed, br._fee_consumed)
 
             # Any excess opens / enlarges a short position
             if excess_qty:
-                open_shorts.append(_OpenShort(t, excess_qty))
+                self.open_shorts.append(_OpenShort(t, excess_qty))
 
         # BUY: cover outstanding shorts FIFO, then leave the rest as a long
         else:
             remaining = t.count
 
-            while remaining and open_shorts:
-                short_lot = open_shorts[0]  # Always FIFO for short covers.
+            while remaining and self.open_shorts:
+                short_lot = self.open_shorts[0]  # Always FIFO for short covers.
                 qty = min(remaining, short_lot.remaining)
 
-                fee_used = t.consume_shares(qty)
-                buy_rec = BuyRecord(t, qty, fee_used, is_short_cover=True)
+                fee_used = self.lots.consume(self.lots.index(t), qty)
 
-                sale_rec = sale_map.get(short_lot.tx)
-                if sale_rec is None:  # should not generally happen
-                    sale_rec = SaleRecord(short_lot.tx, [])
-                    sale_records.append(sale_rec)
-                    sale_map[short_lot.tx] = sale_rec
-                sale_rec.append_buy_record(buy_rec)
+                record = self.sale_map.get(short_lot.tx)
+                if record is None:  # should not generally happen
+                    record = self.result.add_sale(short_lot.tx)
+                    self.sale_map[short_lot.tx] = record
+                self.result.add_pair(record, t, qty, fee_used, is_short_cover=True)
 
                 short_lot.remaining -= qty
                 remaining -= qty
                 if short_lot.remaining == 0:
-                    open_shorts.popleft()
+                    self.open_shorts.popleft()
+
+            # Any *remaining* shares now form / enlarge a long position,
+            # paired by find_buys later.
+            if remaining:
+                lot = self.lots.lot(t)
+                for lot_index in self.lot_indexes.values():
+                    lot_index.add(lot)
+
+    def checkpoint(self, checkpoints: CheckpointStore, year: int) -> None:
+        # Strategies may consume lots without returning them (a failed find_buys), so the lots written
+        # since the last checkpoint are found by comparing states rather than by tracking pairs.
+        state = {i: self.lots.state(i) for i, t in enumerate(self.trans) if not t.is_sale}
+        changed = {i: s for i, s in state.items() if self._saved_state.get(i) != s}
+        self._saved_state = state
+
+        index = self.result.trans_index
+        checkpoints.save(year, LotStateSnapshot(
+            position=self.position,
+            lots=changed,
+            parent=checkpoints.years[-1] if checkpoints.years else None,
+            open_shorts=[(index(s.tx), s.remaining) for s in self.open_shorts],
+            sale_count=len(self.result),
+            pair_count=len(self.result.pair_record),
+        ))
+
+    @classmethod
+    def resume(cls, trans: List[Transaction], strategy_table, base: PairingResult,
+               checkpoints: CheckpointStore, year: int) -> '_PairingRun':
+        snapshot = checkpoints.load(year)
+        run = cls(trans, strategy_table, base.truncated(snapshot.sale_count, snapshot.pair_count))
+        for i, (remaining, fee_available) in checkpoints.lot_state(year).items():
+            run.lots.restore(i, remaining, fee_available)
+
+        run.position = snapshot.position
+        run.sale_map = {trans[i]: record for record, i in enumerate(run.result.sale_trans)}
+        run.open_shorts = deque(_OpenShort(trans[i], remaining) for i, remaining in snapshot.open_shorts)
+        for t in run.order[:run.position]:
+            if not t.is_sale and run.lots.remaining_count(t) > 0:
+                lot = run.lots.lot(t)
+                for lot_index in run.lot_indexes.values():
+                    lot_index.add(lot)
+        return run
+
+
+def pair_transactions(
+    trans: List[Transaction],
+    strategies: Dict[int, str],
+    *,
+    enable_ttest: bool = False,
+    checkpoints: CheckpointStore = None,
+) -> PairingResult:
+    """
+    • When a SELL closes an existing long, use the legacy find_buys logic.
+      Any excess quantity becomes a new short lot.
+
+    • When a BUY covers a short, consume open shorts in strict FIFO order.
+      Any excess quantity opens (or enlarges) a long lot and will later be
+      matched by find_buys when a SELL occurs.
+
+    Long-only results remain byte-for-byte identical to the historical
+    implementation; short selling now works deterministically.
+
+    With *checkpoints*, the lot state is saved at every year boundary (see ``rerun_year``).
+
+    Initially written by GPT o3.
+    """
+    warn_about_default_strategy(trans, strategies)
+    strategy_table = compile_strategies(strategies, PairingOptions(enable_ttest=enable_ttest))
+    return _PairingRun(trans, strategy_table, PairingResult(trans)).run(checkpoints)
+
+
+def rerun_year(
+    trans: List[Transaction],
+    base: PairingResult,
+    checkpoints: CheckpointStore,
+    year: int,
+    alternatives: Dict[str, Dict[int, str]],
+    *,
+    enable_ttest: bool = False,
+) -> Dict[str, PairingResult]:
+    """
+    Pair *year* and later again from the checkpoint taken by the run that produced *base*, once per
+    alternative year -> strategy map (keyed by a label). The maps must agree with the base run before *year*.
+    Every alternative pairs on its own lot overlay, the transactions are not modified.
+    """
+    # Without trades in *year* the state carries over to the next checkpoint.
+    start_year = min((y for y in checkpoints.years if y >= year), default=None)
+    results = {}
+    for label, strategies in alternatives.items():
+        if start_year is None:  # Nothing was traded in or after *year*.
+            results[label] = base.truncated(len(base), len(base.pair_record))
+            continue
+        strategy_table = compile_strategies(strategies, PairingOptions(enable_ttest=enable_ttest))
+        results[label] = _PairingRun.resume(trans, strategy_table, base, checkpoints, start_year).run()
+    return results
 
-            # Any *remaining* shares now form / enlarge a long position.
-            # No extra action needed: they will be paired by find_buys later.
 
-    if open_shorts:
-        print("Warning: Unmatched open short positions remain after pairing.")
-        # TODO: Add some status reporting.
+def pair_product_alternatives(txs: List[Transaction], tax_year: int, strategies: dict[int, str],
+                              alternatives: List[str], enable_bep: bool = False, enable_ttest: bool = False,
+                              *, batch_tax: bool = False, spill_dir: str = None) -> Dict[str, PairingResult]:
+    """
+    Pair the product once with *strategies*, then only *tax_year* again for every alternative tax-year
+    strategy, starting from the checkpoint at the start of the year. Returns the taxed results by strategy.
+    """
+    if enable_bep:
+        txs = calculate_break_even_prices(txs)
+    checkpoints = CheckpointStore(spill_dir)
+    base = pair_transactions(txs, strategies, enable_ttest=enable_ttest, checkpoints=checkpoints)
+    results = {strategies[tax_year]: base}
+    results.update(rerun_year(
+        txs, base, checkpoints, tax_year,
+        {name: {**strategies, tax_year: name} for name in alternatives if name not in results},
+        enable_ttest=enable_ttest))
+
+    for result in results.values():
+        if batch_tax:
+            from tax_batch import calculate_tax_batched
+            calculate_tax_batched(result.sale_records(), tax_year, enable_bep, enable_ttest)
+        else:
+            calculate_tax(result.sale_records(), tax_year, enable_bep, enable_ttest)
+    return results
 
-    return sale_records
 
 # Tax calculation: use the true closing year of each position
 def calculate_tax(
@@ -260,12 +513,23 @@ def calculate_tax(
         sale.calculate_income_and_cost(tax_year, enable_bep, enable_ttest)
 
 
-def optimize_product(txs: List[Transaction], tax_year: int, strategies: dict[int,str] = None, enable_bep: bool = False, enable_ttest: bool = False) -> List[SaleRecord]:
+def optimize_product(txs: List[Transaction], tax_year: int, strategies: dict[int,str] = None, enable_bep: bool = False, enable_ttest: bool = False,
+                     *, batch_tax: bool = False) -> List[SaleRecord]:
+    return pair_product(txs, tax_year, strategies, enable_bep, enable_ttest, batch_tax=batch_tax).sale_records()
+
+
+def pair_product(txs: List[Transaction], tax_year: int, strategies: dict[int,str] = None, enable_bep: bool = False, enable_ttest: bool = False,
+                 *, batch_tax: bool = False, bep_engine: str = "decimal") -> PairingResult:
+    """Like optimize_product, but returns the columnar result (its sale records carry the taxes)."""
     if enable_bep:
-        calculate_break_even_prices(txs)
-    sale_records = optimize_transaction_pairing(txs, strategies)
-    calculate_tax(sale_records, tax_year, enable_bep, enable_ttest)
-    return sale_records
+        txs = add_break_even_prices(txs, bep_engine)
+    result = pair_transactions(txs, strategies, enable_ttest=enable_ttest)
+    if batch_tax:
+        from tax_batch import calculate_tax_batched  # numpy is only needed for the batched stage
+        calculate_tax_batched(result.sale_records(), tax_year, enable_bep, enable_ttest)
+    else:
+        calculate_tax(result.sale_records(), tax_year, enable_bep, enable_ttest)
+    return result
 
 
 def calculate_totals(sale_records: List[SaleRecord], tax_year: int) -> (decimal, decimal, decimal):
@@ -0,0 +1,191 @@
+"""
+Columnar pairing result.
+
+The pairing loop writes every (sale, lot) pair as a row of flat ``array.array`` columns: integer indices into
+the run's transaction table, the consumed quantity and the fee / short-cover flags. ``SaleRecord`` and
+``BuyRecord`` objects are materialised from the columns on demand for the existing callers (tax calculation,
+reports), and ``to_frame`` / ``pairings_frame`` export the columns to pandas without per-row dicts.
+
+numpy and pandas are imported by the export methods only, pairing itself stays dependency-free.
+"""
+from __future__ import annotations
+
+from array import array
+from typing import Dict, List, Optional, TYPE_CHECKING
+
+from transaction import Transaction, BuyRecord, SaleRecord
+
+if TYPE_CHECKING:
+    from pandas import DataFrame
+    from lot_state import LotOverlay
+
+
+class PairingResult:
+    def __init__(self, trans: List[Transaction]):
+        self.trans = trans
+        self._trans_index: Dict[int, int] = {id(t): i for i, t in enumerate(trans)}
+
+        # One row per sale record, in the order the records were opened.
+        self.sale_trans = array('q')
+        # One row per pair; rows of a record are in pairing order, short covers come after the record's
+        # other pairs.
+        self.pair_record = array('q')
+        self.pair_buy = array('q')
+        self.pair_count = array('q')
+        self.pair_fee_consumed = array('b')
+        self.pair_short_cover = array('b')
+
+        self._sale_records: Optional[List[SaleRecord]] = None
+        self.lots: Optional[LotOverlay] = None  # Lot state of the run that produced the result.
+
+    def __len__(self) -> int:
+        return len(self.sale_trans)
+
+    def trans_index(self, t: Transaction) -> int:
+        return self._trans_index[id(t)]
+
+    def add_sale(self, sale_t: Transaction) -> int:
+        """Open a sale record, return its record number."""
+        self.sale_trans.append(self.trans_index(sale_t))
+        return len(self.sale_trans) - 1
+
+    def add_pair(self, record: int, buy_t: Transaction, count: int, fee_consumed: bool,
+                 is_short_cover: bool = False) -> None:
+        self.pair_record.append(record)
+        self.pair_buy.append(self.trans_index(buy_t))
+        self.pair_count.append(count)
+        self.pair_fee_consumed.append(fee_consumed)
+        self.pair_short_cover.append(is_short_cover)
+
+    def truncated(self, sale_count: int, pair_count: int) -> 'PairingResult':
+        """Copy of the first *sale_count* records and *pair_count* pairs, to continue pairing from."""
+        result = PairingResult.__new__(PairingResult)
+        result.trans, result._trans_index = self.trans, self._trans_index
+        result.sale_trans = self.sale_trans[:sale_count]
+        result.pair_record = self.pair_record[:pair_count]
+        result.pair_buy = self.pair_buy[:pair_count]
+        result.pair_count = self.pair_count[:pair_count]
+        result.pair_fee_consumed = self.pair_fee_consumed[:pair_count]
+        result.pair_short_cover = self.pair_short_cover[:pair_count]
+        result._sale_records = None
+        result.lots = None
+        return result
+
+    def sale_records(self) -> List[SaleRecord]:
+        """SaleRecord / BuyRecord view of the result, created once and shared by all callers."""
+        if self._sale_records is None:
+            records = [SaleRecord(self.trans[i], []) for i in self.sale_trans]
+            for rec, buy, count, fee, short in zip(self.pair_record, self.pair_buy, self.pair_count,
+                                                   self.pair_fee_consumed, self.pair_short_cover):
+                buy_rec = BuyRecord(self.trans[buy], count, bool(fee), is_short_cover=bool(short))
+                if short:
+                    records[rec].append_buy_record(buy_rec)  # Moves the close time to the last cover.
+                else:
+                    records[rec].buys.append(buy_rec)
+            self._sale_records = records
+        return self._sale_records
+
+    def to_frame(self) -> DataFrame:
+        """Pair columns as a DataFrame sharing memory with the arrays; append no more pairs afterwards."""
+        import numpy as np
+        import pandas as pd
+
+        pair_record = np.frombuffer(self.pair_record, dtype=np.int64)
+        return pd.DataFrame({
+            "Record": pair_record,
+            "Sale": np.frombuffer(self.sale_trans, dtype=np.int64)[pair_record],
+            "Buy": np.frombuffer(self.pair_buy, dtype=np.int64),
+            "Quantity": np.frombuffer(self.pair_count, dtype=np.int64),
+            "FeeConsumed": np.frombuffer(self.pair_fee_consumed, dtype=np.int8).view(bool),
+            "ShortCover": np.frombuffer(self.pair_short_cover, dtype=np.int8).view(bool),
+        }, copy=False)
+
+    def pairings_frame(self, id_col: str) -> DataFrame:
+        """
+        Audit export: per record a *close* row followed by its *open* rows, sharing a *PairID*.
+
+        The close/open naming stays neutral for short selling, where the close might be a buy. Transaction
+        attributes are gathered from per-transaction columns by index.
+        """
+        import numpy as np
+        import pandas as pd
+
+        sale_trans = np.frombuffer(self.sale_trans, dtype=np.int64)
+        pair_record = np.frombuffer(self.pair_record, dtype=np.int64)
+        pair_buy = np.frombuffer(self.pair_buy, dtype=np.int64)
+        pair_count = np.frombuffer(self.pair_count, dtype=np.int64)
+        short_cover = np.frombuffer(self.pair_short_cover, dtype=np.int8).view(bool)
+        n_records, n_pairs = len(sale_trans), len(pair_record)
+
+        def column(values) -> np.ndarray:
+            arr = np.empty(len(self.trans), dtype=object)
+            arr[:] = list(values)
+            return arr
+
+        times = column(t.time for t in self.trans)
+        products = column(t.product_name for t in self.trans)
+        ids = column((t.isin if id_col == "ISIN" else t.product_name) for t in self.trans)
+        split_ratios = column(t.split_ratio for t in self.trans)
+        prices = column(t.share_price for t in self.trans)
+        currencies = column(t.currency for t in self.trans)
+        counts = np.array([t.count for t in self.trans], dtype=np.int64)
+
+        # Record r takes the close row first[r], followed by its pairs in pairing order.
+        order = np.argsort(pair_record, kind='stable')
+        sorted_record = pair_record[order]
+        per_record = np.bincount(pair_record, minlength=n_records)
+        pair_start = np.cumsum(per_record) - per_record
+        first = np.arange(n_records) + pair_start
+        open_rows = first[sorted_record] + 1 + np.arange(n_pairs) - pair_start[sorted_record]
+
+        n_rows = n_records + n_pairs
+        row_trans = np.empty(n_rows, dtype=np.int64)
+        row_trans[first] = sale_trans
+        row_trans[open_rows] = pair_buy[order]
+        row_record = np.empty(n_rows, dtype=np.int64)
+        row_record[first] = np.arange(n_records)
+        row_record[open_rows] = sorted_record
+        is_close = np.zeros(n_rows, dtype=bool)
+        is_close[first] = True
+
+        quantity = np.empty(n_rows, dtype=np.int64)
+        quantity[first] = counts[sale_trans]
+        quantity[open_rows] = pair_count[order]
+
+        # Shorts close when the last covering buy executes.
+        sale_times = times[sale_trans]
+        close_times = sale_times.copy()
+        for rec, buy in zip(pair_record[short_cover], pair_buy[short_cover]):
+            close_times[rec] = max(close_times[rec], times[buy])
+        close_col = np.full(n_rows, "", dtype=object)
+        changed = close_times != sale_times
+        close_col[first[changed]] = close_times[changed]
+
+        pair_ids = np.array([f"{t.isoformat()}_{i}" for i, t in enumerate(sale_times)], dtype=object)
+
+        ttest = np.full(n_rows, "", dtype=object)
+        ttest[first] = "--"
+        if self._sale_records is not None:
+            # The tax calculation flags the materialised buys, which are grouped by record in pairing order.
+            passed = np.fromiter((br.time_test_passed for sale in self._sale_records for br in sale.buys),
+                                 dtype=bool, count=n_pairs)
+            ttest[open_rows[passed]] = "T"
+
+        profit = np.full(n_rows, "", dtype=object)
+        profit[open_rows] = prices[sale_trans[sorted_record]] - prices[pair_buy[order]]
+
+        return pd.DataFrame({
+            "PairID": pair_ids[row_record],
+            "Side": np.where(is_close, "close", "open").astype(object),
+            "DateTime": times[row_trans],
+            "CloseTime": close_col,
+            "Product": products[row_trans],
+            id_col: ids[row_trans],
+            "Quantity": quantity,
+            "SplitRatio": split_ratios[row_trans],
+            "SharePrice": prices[row_trans],
+            "Currency": currencies[row_trans],
+            "TimeTestPassed": ttest,
+            # Note: FX can make substantial difference!
+            "ProfitPerShare (ignores FX!)": profit,
+        })
@@ -0,0 +1,79 @@
+"""
+Per-product partitions of imported trades on disk, for histories too large to keep in one frame.
+
+Broker files are read in chunks (``import_deg.iter_transactions``, ``import_ibkr.iter_ibkr_transactions``),
+and ``PartitionStore.add`` appends every chunk's rows of each product to that product's partition file
+as pickled frames, together with the index of the statement they came from. ``load`` reads one product
+back and drops the trades repeated across statements like ``dedup.drop_duplicate_trades`` (the natural
+keys include the product, so deduplicating per product is the same). Only one product's rows are in
+memory at a time; the store itself keeps the product names and trade years for selecting products.
+"""
+from __future__ import annotations
+
+import pickle
+from pathlib import Path
+from typing import Dict, List, Set
+
+import pandas as pd
+from pandas import DataFrame
+
+from dedup import drop_duplicate_trades
+from import_utils import compact_frame, detect_columns
+
+
+class PartitionStore:
+    def __init__(self, directory: str | Path, id_col: str):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.id_col = id_col
+        self.sources: List[str] = []       # Statement names, indexed by the source of added chunks.
+        self.rows = 0
+        self._paths: Dict[str, Path] = {}  # product -> partition file
+        self._names: Dict[str, str] = {}   # product -> product name of its first row
+        self._years: Dict[str, Set[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+    def add_source(self, name: str) -> int:
+        """Register a statement; returns the source index of its chunks."""
+        self.sources.append(name)
+        return len(self.sources) - 1
+
+    def add(self, df: DataFrame, source: int) -> None:
+        """Append the rows of *df*, read from statement *source*, to their products' partitions."""
+        if df.empty:
+            return
+        _, date_col, product_col = detect_columns(df)
+        for pid, rows in df.groupby(self.id_col, observed=True, sort=False):
+            if pid not in self._paths:
+                self._paths[pid] = self.directory / f"part-{len(self._paths):05d}.pkl"
+                self._names[pid] = rows[product_col].iloc[0]
+                self._years[pid] = set()
+            with self._paths[pid].open("ab") as f:
+                pickle.dump((source, rows), f, protocol=pickle.HIGHEST_PROTOCOL)
+            self._years[pid].update(rows[date_col].dt.year.dropna().astype(int))
+        self.rows += len(df)
+
+    def products(self, tax_year: int, since_year: int = None) -> List[str]:
+        """Products traded from *since_year* (default: *tax_year*) to *tax_year*, sorted by name."""
+        years = range(since_year or tax_year, tax_year + 1)
+        selected = [pid for pid, traded in self._years.items() if any(y in traded for y in years)]
+        return sorted(selected, key=lambda pid: self._names[pid])
+
+    def load(self, pid: str) -> DataFrame:
+        """All trades of *pid*, each trade repeated in several statements once."""
+        chunks = []
+        with self._paths[pid].open("rb") as f:
+            while True:
+                try:
+                    chunks.append(pickle.load(f))
+                except EOFError:
+                    break
+
+        # Chunks with different categories concatenate to plain columns, categories are restored at the end.
+        categorical = [col for col, dtype in chunks[0][1].dtypes.items() if isinstance(dtype, pd.CategoricalDtype)]
+        sources = sorted({source for source, _ in chunks})
+        frames = [pd.concat([rows for s, rows in chunks if s == source]) for source in sources]
+        df = drop_duplicate_trades(frames, [self.sources[s] for s in sources])
+        return compact_frame(df, categorical)
@@ -0,0 +1,93 @@
+"""
+Split-adjusted holdings of every product, as of a date or as a daily / monthly timeline.
+
+Quantities are first scaled to the share basis after all known splits (``config/corporate_actions.csv``),
+so that the positions are plain grouped cumulative sums; a position at date D is then divided back by the
+splits after D. A split reported on day D applies to trades before D and to positions from D on, like
+``corporate_action.apply_stock_splits_for_product``.
+"""
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from import_utils import detect_columns
+
+ROUNDING = 6  # Decimal places kept from the float split factors.
+
+
+def _splits(splits_df: DataFrame | None, id_col: str) -> DataFrame:
+    """Split events as (product, day, factor), one per product and report date."""
+    if splits_df is None or splits_df.empty:
+        return DataFrame({"product": [], "day": pd.to_datetime([]), "factor": []})
+    s = splits_df.drop_duplicates(subset=[id_col, "Report Date"])
+    return DataFrame({"product": s[id_col].to_numpy(),
+                      "day": pd.to_datetime(s["Report Date"]).dt.normalize().to_numpy(),
+                      "factor": (s["Numerator"] / s["Denominator"]).to_numpy()})
+
+
+def split_factors(products: pd.Series, days: pd.Series, splits: DataFrame) -> np.ndarray:
+    """Product of the factors of the splits of each product reported after each day."""
+    factors = np.ones(len(products))
+    for product, day, factor in zip(splits["product"], splits["day"], splits["factor"]):
+        factors[((products == product) & (days < day)).to_numpy()] *= factor
+    return factors
+
+
+def _adjusted(df_trans: DataFrame, splits_df: DataFrame | None) -> (DataFrame, str, str, DataFrame):
+    id_col, date_col, product_col = detect_columns(df_trans)
+    splits = _splits(splits_df, id_col)
+    days = df_trans[date_col].dt.normalize()
+    quantity = df_trans["Quantity"] * split_factors(df_trans[id_col], days, splits)
+    trades = DataFrame({"day": days.to_numpy(), id_col: df_trans[id_col].to_numpy(), "Quantity": quantity.to_numpy()})
+    return trades, id_col, product_col, splits
+
+
+def _product_names(df_trans: DataFrame, id_col: str, product_col: str) -> pd.Series:
+    return df_trans.groupby(id_col, observed=True)[product_col].first()
+
+
+def positions_as_of(df_trans: DataFrame, as_of, splits_df: DataFrame = None) -> DataFrame:
+    """Non-zero holdings at the end of the day *as_of*, in that day's share basis."""
+    trades, id_col, product_col, splits = _adjusted(df_trans, splits_df)
+    as_of = pd.Timestamp(as_of).normalize()
+    held = trades[trades["day"] <= as_of].groupby(id_col)["Quantity"].sum()
+    held = held / split_factors(pd.Series(held.index), pd.Series(as_of, index=range(len(held))), splits)
+    held = held.round(ROUNDING)
+    held = held[held != 0]
+
+    result = DataFrame({id_col: held.index, "Quantity": held.to_numpy()})
+    if product_col != id_col:
+        result.insert(0, product_col, _product_names(df_trans, id_col, product_col).loc[held.index].to_numpy())
+        result = result.sort_values(product_col, ignore_index=True)
+    return result
+
+
+def holdings_timeline(df_trans: DataFrame, splits_df: DataFrame = None, freq: str = "M",
+                      start=None, end=None) -> DataFrame:
+    """
+    Holdings at the end of every day (*freq* "D") or month ("M") from *start* to *end* (default: the first
+    and last trade), one column per product, each in the share basis of its row's date.
+    """
+    trades, id_col, _, splits = _adjusted(df_trans, splits_df)
+    periods = trades["day"].dt.to_period(freq)
+    flows = trades.groupby([periods, trades[id_col]])["Quantity"].sum().unstack(fill_value=0)
+    if flows.empty:
+        return DataFrame(index=pd.Index([], name="Date"))
+
+    index = pd.period_range(start or flows.index.min(), end or flows.index.max(), freq=freq)
+    # Positions before *start* carry over into its first period.
+    flows = flows.groupby(np.clip(flows.index, index[0], None)).sum()
+    held = flows.reindex(index, fill_value=0).cumsum()
+
+    period_end = index.to_timestamp(how="end").normalize()
+    basis = DataFrame(1.0, index=index, columns=held.columns)
+    for product, day, factor in zip(splits["product"], splits["day"], splits["factor"]):
+        if product in basis.columns:
+            basis.loc[period_end < day, product] *= factor
+
+    held = (held / basis).round(ROUNDING)
+    held.index = period_end.date
+    held.index.name = "Date"
+    return held
@@ -0,0 +1,73 @@
+"""
+Configurable rules for trades left out of the tax calculation (``config/skip_rules.json``).
+
+A rule matches the rows meeting all of its conditions: the product name starts with one of
+``product_prefixes``, the product id (ISIN or symbol) is one of ``ids``, the trade year is one of ``years``,
+and the ``missing`` columns are empty. Every rule is compiled into a vectorized mask over the imported
+frame; the matched rows are dropped once, right after the import, and counted per rule. Rules that test
+a column the frame does not have (e.g. Degiro's Order ID in an IBKR import) match nothing.
+"""
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+from pandas import DataFrame
+
+from import_utils import detect_columns
+
+
+@dataclass(frozen=True)
+class SkipRule:
+    name: str
+    product_prefixes: Tuple[str, ...] = ()
+    ids: Tuple[str, ...] = ()
+    years: Tuple[int, ...] = ()
+    missing: Tuple[str, ...] = ()
+
+    @classmethod
+    def from_dict(cls, rule: dict) -> 'SkipRule':
+        unknown = set(rule) - {"name", "product_prefixes", "ids", "years", "missing"}
+        if unknown:
+            raise ValueError(f"Unknown skip rule field(s): {', '.join(sorted(unknown))}")
+        skip_rule = cls(rule["name"], tuple(rule.get("product_prefixes", ())), tuple(rule.get("ids", ())),
+                        tuple(int(y) for y in rule.get("years", ())), tuple(rule.get("missing", ())))
+        if not (skip_rule.product_prefixes or skip_rule.ids or skip_rule.years or skip_rule.missing):
+            raise ValueError(f"Skip rule without conditions: {skip_rule.name}")
+        return skip_rule
+
+    def mask(self, df: DataFrame) -> np.ndarray:
+        if any(col not in df.columns for col in self.missing):
+            return np.zeros(len(df), dtype=bool)
+        id_col, date_col, product_col = detect_columns(df)
+        mask = np.ones(len(df), dtype=bool)
+        if self.product_prefixes:
+            mask &= df[product_col].astype(str).str.startswith(self.product_prefixes).to_numpy()
+        if self.ids:
+            mask &= df[id_col].isin(self.ids).to_numpy()
+        if self.years:
+            mask &= df[date_col].dt.year.isin(self.years).to_numpy()
+        for col in self.missing:
+            mask &= df[col].isna().to_numpy()
+        return mask
+
+
+def load_skip_rules(path: str | Path) -> List[SkipRule]:
+    with open(path, 'r', encoding='utf-8') as f:
+        return [SkipRule.from_dict(rule) for rule in json.load(f)]
+
+
+def apply_skip_rules(df: DataFrame, rules: List[SkipRule]) -> DataFrame:
+    """*df* without the rows matched by any rule; prints how many rows every rule matched."""
+    skipped = np.zeros(len(df), dtype=bool)
+    for rule in rules:
+        mask = rule.mask(df)
+        if mask.any():
+            print(f"Skipping {int(mask.sum())} transaction(s) by rule: {rule.name}")
+        skipped |= mask
+    if not skipped.any():
+        return df
+    return df[~skipped]
@@ -0,0 +1,246 @@
+"""
+Registry of pairing strategies.
+
+A strategy is a ``find_buys(sale_t, lots) -> List[BuyRecord]`` function plus the name of the lot index
+it wants to receive as ``lots``. The built-in strategies are registered by ``optimizer``; plugins add their
+own with ``register_strategy`` (usable as a decorator) and, if they need a different view of the open lots,
+``register_lot_index``.
+
+Strategies that optimise a whole year at once also register a ``plan_year`` hook. It is called at the
+year's first sale with the candidates of the ``plan_index`` (by default the strategy's lot index) and returns
+the ``find_buys`` used for that year's sales, which still receives the lot-index candidates.
+
+Parameterized families (``register_strategy_family``) create strategies named ``family:params`` on first
+use, so e.g. threshold sweeps can name any setting of a family without registering it up front.
+
+Time-test-aware strategies use the ``ttest_lots`` index, whose candidates are a ``LotPartition`` of the open
+lots into those passing the 3-year time test at the sale and the younger ones.
+
+For a pairing run, ``compile_strategies`` turns the year -> strategy-name map into a ``StrategyTable``
+once, so the per-sale dispatch is a dict lookup.
+"""
+from bisect import bisect_right
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Protocol, Tuple
+
+from transaction import Transaction, BuyRecord, time_test_cutoff
+
+FindBuys = Callable[[Transaction, List[Transaction]], List[BuyRecord]]
+
+
+@dataclass(frozen=True)
+class PairingOptions:
+    """Run-wide settings that year planners may take into account."""
+    enable_ttest: bool = False
+
+
+PlanYear = Callable[[int, List[Transaction], PairingOptions], FindBuys]
+
+DEFAULT_STRATEGY = 'fifo'  # Used for years before the first configured year.
+
+
+class LotIndex(Protocol):
+    def add(self, buy_t: Transaction) -> None:
+        """Called by the pairing loop for every buy that leaves an open long lot."""
+
+    def candidates(self, sale_t: Transaction) -> List[Transaction]:
+        """Transactions passed to the strategy's find_buys as ``lots``."""
+
+
+class TransactionListIndex:
+    """Legacy view: the strategy gets the complete transaction list and filters it itself."""
+    def __init__(self, trans: List[Transaction]):
+        self._trans = trans
+
+    def add(self, buy_t: Transaction) -> None:
+        pass
+
+    def candidates(self, sale_t: Transaction) -> List[Transaction]:
+        return self._trans
+
+
+class OpenLotIndex:
+    """Open long lots in chronological order, maintained incrementally while pairing."""
+    def __init__(self, trans: List[Transaction]):
+        self._lots: List[Transaction] = []
+
+    def add(self, buy_t: Transaction) -> None:
+        self._lots.append(buy_t)
+
+    def candidates(self, sale_t: Transaction) -> List[Transaction]:
+        lots = self._lots = [t for t in self._lots if t.remaining_count > 0]
+        # Only buys at the sale's own time can be too late, and they are the last ones added.
+        end = len(lots)
+        while end and lots[end - 1].time >= sale_t.time:
+            end -= 1
+        return lots[:end]
+
+
+@dataclass
+class LotPartition:
+    """Open lots before a sale, chronologically, split by the time test at the sale."""
+    aged: List[Transaction]   # Pass the time test when sold now.
+    young: List[Transaction]
+
+    @classmethod
+    def of(cls, sale_t: Transaction, lots: List[Transaction]) -> 'LotPartition':
+        """Partition of a plain candidate list (e.g. a one-off ``optimizer.find_buys`` call)."""
+        open_lots = sorted((t for t in lots if not t.is_sale and t.remaining_count > 0 and t.time < sale_t.time),
+                           key=lambda t: t.time)
+        boundary = bisect_right([t.time for t in open_lots], time_test_cutoff(sale_t.time))
+        return cls(open_lots[:boundary], open_lots[boundary:])
+
+
+class AgePartitionedLotIndex:
+    """
+    Open long lots kept in two parts, aged and young, at the time-test boundary of the latest sale. Sales come
+    in chronological order, so the boundary only moves forward and every lot crosses it at most once.
+    """
+    def __init__(self, trans: List[Transaction]):
+        self._aged: List[Transaction] = []
+        self._young: deque[Transaction] = deque()  # Chronological, lots are added in time order.
+
+    def add(self, buy_t: Transaction) -> None:
+        self._young.append(buy_t)
+
+    def candidates(self, sale_t: Transaction) -> LotPartition:
+        cutoff = time_test_cutoff(sale_t.time)
+        while self._young and self._young[0].time <= cutoff:
+            self._aged.append(self._young.popleft())
+        self._aged = [t for t in self._aged if t.remaining_count > 0]
+        self._young = deque(t for t in self._young if t.remaining_count > 0)
+        return LotPartition(list(self._aged), [t for t in self._young if t.time < sale_t.time])
+
+
+@dataclass(frozen=True)
+class Strategy:
+    name: str
+    find_buys: FindBuys
+    lot_index: str = 'open_lots'
+    plan_year: Optional[PlanYear] = None
+    plan_index: Optional[str] = None  # Lot index passed to plan_year; lot_index when None.
+
+
+_LOT_INDEXES: Dict[str, Callable[[List[Transaction]], LotIndex]] = {
+    'transactions': TransactionListIndex,
+    'open_lots': OpenLotIndex,
+    'ttest_lots': AgePartitionedLotIndex,
+}
+_STRATEGIES: Dict[str, Strategy] = {}
+_FAMILIES: Dict[str, Tuple[Callable[[str], FindBuys], str]] = {}
+
+
+def register_lot_index(name: str, factory: Callable[[List[Transaction]], LotIndex], *,
+                       replace: bool = False) -> None:
+    """Make a lot index available to strategies. *factory* receives the run's transaction list."""
+    if name in _LOT_INDEXES and not replace:
+        raise ValueError(f"Lot index already registered: {name}")
+    _LOT_INDEXES[name] = factory
+
+
+def register_strategy(name: str, find_buys: Optional[FindBuys] = None, *, lot_index: str = 'open_lots',
+                      plan_year: Optional[PlanYear] = None, plan_index: Optional[str] = None,
+                      replace: bool = False):
+    """
+    Register a pairing strategy under *name*; without *find_buys* this returns a decorator.
+
+    *lot_index* names the lot index whose candidates the strategy receives (see ``register_lot_index``).
+    With *plan_year*, *find_buys* is only used outside of a pairing run (``optimizer.find_buys``);
+    *plan_index* names the lot index whose candidates *plan_year* receives, if not *lot_index*.
+    """
+    def decorator(func: FindBuys) -> FindBuys:
+        for index in (lot_index, plan_index or lot_index):
+            if index not in _LOT_INDEXES:
+                raise ValueError(f"Unknown lot index: {index}")
+        if name in _STRATEGIES and not replace:
+            raise ValueError(f"Strategy already registered: {name}")
+        _STRATEGIES[name] = Strategy(name, func, lot_index, plan_year, plan_index)
+        return func
+
+    return decorator if find_buys is None else decorator(find_buys)
+
+
+def register_strategy_family(family: str, factory: Callable[[str], FindBuys], *, lot_index: str = 'open_lots',
+                             replace: bool = False) -> None:
+    """
+    Register a parameterized strategy family: ``get_strategy("family:params")`` registers ``factory(params)``
+    under that name on first use. *factory* raises ValueError for parameters it does not understand.
+    """
+    if lot_index not in _LOT_INDEXES:
+        raise ValueError(f"Unknown lot index: {lot_index}")
+    if family in _FAMILIES and not replace:
+        raise ValueError(f"Strategy family already registered: {family}")
+    _FAMILIES[family] = (factory, lot_index)
+
+
+def _ensure_builtins() -> None:
+    import optimizer, optimal  # noqa: F401, E401  (register the built-in strategies on import)
+
+
+def get_strategy(name: str) -> Strategy:
+    _ensure_builtins()
+    family, sep, params = name.partition(':')
+    if sep and name not in _STRATEGIES and family in _FAMILIES:
+        factory, lot_index = _FAMILIES[family]
+        register_strategy(name, factory(params), lot_index=lot_index)
+    try:
+        return _STRATEGIES[name]
+    except KeyError:
+        raise ValueError(f"Unknown strategy: {name}") from None
+
+
+def is_strategy(name: str) -> bool:
+    """Registered strategy, or a valid member of a registered family."""
+    try:
+        get_strategy(name)
+        return True
+    except ValueError:
+        return False
+
+
+def list_strategies() -> List[str]:
+    _ensure_builtins()
+    return list(_STRATEGIES)
+
+
+class StrategyTable:
+    """Year -> strategy dispatch table, compiled once per pairing run."""
+    def __init__(self, strategies: Dict[int, str], options: PairingOptions = None):
+        self.options = options or PairingOptions()
+        self._year_plans: Dict[int, FindBuys] = {}
+        self.first_year = min(strategies.keys())
+        self.last_year = max(strategies.keys())
+        self._by_year = {year: get_strategy(name) for year, name in strategies.items()}
+        self._default = get_strategy(DEFAULT_STRATEGY)
+
+    @property
+    def lot_indexes(self) -> List[str]:
+        """Names of the lot indexes the pairing loop has to maintain for this table."""
+        strategies = [*self._by_year.values(), self._default]
+        return sorted({s.lot_index for s in strategies} | {s.plan_index for s in strategies if s.plan_index})
+
+    def create_lot_indexes(self, trans: List[Transaction]) -> Dict[str, LotIndex]:
+        return {name: _LOT_INDEXES[name](trans) for name in self.lot_indexes}
+
+    def for_year(self, year: int) -> Strategy:
+        # The strategy must be specified for every year since the first year is specified
+        if year > self.last_year:
+            raise ValueError("No strategy specified for this year!")
+        return self._default if year < self.first_year else self._by_year[year]
+
+    def find_buys(self, sale_t: Transaction, indexes: Dict[str, LotIndex]) -> List[BuyRecord]:
+        year = sale_t.time.year
+        strategy = self.for_year(year)
+        lots = indexes[strategy.lot_index].candidates(sale_t)
+        if strategy.plan_year is None:
+            return strategy.find_buys(sale_t, lots)
+
+        if year not in self._year_plans:
+            plan_lots = indexes[strategy.plan_index].candidates(sale_t) if strategy.plan_index else lots
+            self._year_plans[year] = strategy.plan_year(year, plan_lots, self.options)
+        return self._year_plans[year](sale_t, lots)
+
+
+def compile_strategies(strategies: Dict[int, str], options: PairingOptions = None) -> StrategyTable:
+    return StrategyTable(strategies, options)
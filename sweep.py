@@ -0,0 +1,83 @@
+"""
+Threshold sweeps of the cost strategy families (max_cost, min_cost, micol).
+
+A grid of ``CostThresholds`` settings is turned into ``family:thresholds`` strategy names and evaluated
+in the tax year across all products by ``compare.compare_products``, in worker processes if requested.
+The settings are ranked by the summed profit after fees; ``sensitivity`` shows how far the totals move
+with each swept parameter.
+"""
+import itertools
+from dataclasses import dataclass, replace
+from decimal import Decimal
+from typing import Dict, List, Sequence, Tuple
+
+from compare import Totals, compare_products
+from optimizer import CostThresholds, MAX_COST_THRESHOLDS, MIN_COST_THRESHOLDS, MICOL_THRESHOLDS
+from transaction import Transaction
+
+FAMILY_DEFAULTS = {
+    'max_cost': MAX_COST_THRESHOLDS,
+    'min_cost': MIN_COST_THRESHOLDS,
+    'micol': MICOL_THRESHOLDS,
+}
+PARAMETERS = ('near_days', 'far_days', 'near', 'mid', 'far')
+
+
+@dataclass(frozen=True)
+class SweepPoint:
+    thresholds: CostThresholds
+    totals: Totals
+
+
+def parse_grid(specs: Sequence[str]) -> Dict[str, list]:
+    """``name=v1,v2,...`` per swept parameter, e.g. ``far=0.05,0.085,0.12``."""
+    grid = {}
+    for spec in specs or []:
+        name, _, values = spec.partition('=')
+        if name not in PARAMETERS or not values:
+            raise ValueError(f"Invalid grid axis {spec!r}, expected one of {', '.join(PARAMETERS)}=v1,v2,...")
+        convert = int if name.endswith('_days') else Decimal
+        grid[name] = [convert(v) for v in values.split(',')]
+    return grid
+
+
+def threshold_grid(base: CostThresholds, grid: Dict[str, list]) -> List[CostThresholds]:
+    """Every combination of the *grid* values, parameters without an axis are taken from *base*."""
+    axes = [grid.get(name, [getattr(base, name)]) for name in PARAMETERS]
+    return [replace(base, **dict(zip(PARAMETERS, values))) for values in itertools.product(*axes)]
+
+
+def sweep(products: Dict[str, List[Transaction]], tax_year: int, strategies: Dict[int, str], family: str,
+          grid: Dict[str, list], enable_bep: bool = False, enable_ttest: bool = False, *,
+          workers: int = 1) -> Tuple[List[SweepPoint], Dict[str, Exception]]:
+    """Totals over all products per grid point, best (lowest profit after fees) first, and failed products."""
+    if family not in FAMILY_DEFAULTS:
+        raise ValueError(f"Unknown strategy family: {family}")
+    points = threshold_grid(FAMILY_DEFAULTS[family], grid)
+    names = [f"{family}:{th}" for th in points]
+
+    comparisons = compare_products(products, [tax_year], strategies, names, enable_bep, enable_ttest,
+                                   workers=workers)
+    failed = {pid: c for pid, c in comparisons.items() if isinstance(c, Exception)}
+    totals = {name: Totals() for name in names}
+    for comparison in comparisons.values():
+        if not isinstance(comparison, Exception):
+            for name in names:
+                totals[name] += comparison[tax_year][name]
+
+    result = [SweepPoint(th, totals[name]) for th, name in zip(points, names)]
+    return sorted(result, key=lambda p: p.totals.taxable), failed
+
+
+def sensitivity(points: List[SweepPoint]) -> List[Tuple[str, object, Decimal, Decimal, Decimal]]:
+    """(parameter, value, min, mean, max of profit after fees) for every value of the swept parameters."""
+    rows = []
+    for name in PARAMETERS:
+        by_value: Dict[object, List[Decimal]] = {}
+        for point in points:
+            by_value.setdefault(getattr(point.thresholds, name), []).append(point.totals.taxable)
+        if len(by_value) < 2:
+            continue
+        for value, taxable in sorted(by_value.items()):
+            rows.append((name, value, min(taxable), sum(taxable) / len(taxable), max(taxable)))
+    return rows
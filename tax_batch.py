@@ -0,0 +1,189 @@
+"""
+Batched tax stage.
+
+All pairings of a run are flattened into one table, one row per (sale, buy record) pair, and FX rates, the
+time test, income, cost and fees are computed column by column with numpy. Amounts stay Decimal (object
+columns) and are multiplied and summed in the same order as ``SaleRecord.calculate_income_and_cost``, so
+per-sale and per-product totals are identical to the per-record path.
+"""
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import List, Tuple
+
+import numpy as np
+
+from currency import unified_fx_rate
+from transaction import SaleRecord, TTEST_DAYS
+
+
+def object_array(values) -> np.ndarray:
+    """1-d object array of *values*, e.g. Decimals; also of object dtype when empty."""
+    arr = np.empty(len(values), dtype=object)
+    arr[:] = values
+    return arr
+
+
+@dataclass
+class PairingTable:
+    """Flat pairing table. Pair columns are indexed by pair row, sale columns by ``sale_row``."""
+    # Per pair
+    sale_row: np.ndarray        # int, index of the pair's sale; rows are grouped by sale
+    count: np.ndarray           # object (int), shares consumed
+    buy_time: np.ndarray        # datetime64[us]
+    buy_price: np.ndarray       # object (Decimal)
+    buy_currency: np.ndarray    # str
+    buy_multiplier: np.ndarray  # object (Decimal)
+    buy_fee: np.ndarray         # object (Decimal)
+    buy_fee_currency: np.ndarray  # str
+    fee_consumed: np.ndarray    # bool
+    short_cover: np.ndarray     # bool
+    # Per sale
+    sale_time: np.ndarray       # datetime64[us]
+    sale_price: np.ndarray      # object (Decimal)
+    sale_bep: np.ndarray        # object (Decimal or None)
+    sale_currency: np.ndarray   # str
+    sale_multiplier: np.ndarray  # object (Decimal)
+    sale_fee: np.ndarray        # object (Decimal)
+    sale_fee_currency: np.ndarray  # str
+
+    @property
+    def sale_starts(self) -> np.ndarray:
+        """First pair row of every sale (equal to the next start for sales without pairs)."""
+        return np.searchsorted(self.sale_row, np.arange(len(self.sale_time)))
+
+    @classmethod
+    def from_sale_records(cls, sale_records: List[SaleRecord]) -> 'PairingTable':
+        pairs = [(i, br) for i, sale in enumerate(sale_records) for br in sale.buys]
+        buys = [br.buy_t for _, br in pairs]
+        sales = [sale.sale_t for sale in sale_records]
+        return cls(
+            sale_row=np.array([i for i, _ in pairs], dtype=np.int64),
+            count=object_array([br._count_consumed for _, br in pairs]),
+            buy_time=np.array([t.time for t in buys], dtype='datetime64[us]'),
+            buy_price=object_array([t.share_price for t in buys]),
+            buy_currency=np.array([t.currency for t in buys], dtype=str),
+            buy_multiplier=object_array([t._multiplier for t in buys]),
+            buy_fee=object_array([t.fee for t in buys]),
+            buy_fee_currency=np.array([t.fee_currency for t in buys], dtype=str),
+            fee_consumed=np.array([br._fee_consumed for _, br in pairs], dtype=bool),
+            short_cover=np.array([br._is_short_cover for _, br in pairs], dtype=bool),
+            sale_time=np.array([t.time for t in sales], dtype='datetime64[us]'),
+            sale_price=object_array([t.share_price for t in sales]),
+            sale_bep=object_array([t.bep for t in sales]),
+            sale_currency=np.array([t.currency for t in sales], dtype=str),
+            sale_multiplier=object_array([t._multiplier for t in sales]),
+            sale_fee=object_array([t.fee for t in sales]),
+            sale_fee_currency=np.array([t.fee_currency for t in sales], dtype=str),
+        )
+
+
+@dataclass
+class TaxResult:
+    # Per pair
+    buy_fx_rate: np.ndarray
+    cost_tc: np.ndarray         # None for skipped short covers, like BuyRecord.cost_tc
+    fees_tc: np.ndarray
+    time_test_passed: np.ndarray
+    # Per sale
+    fx_rate: np.ndarray
+    income_tc: np.ndarray
+    sale_cost_tc: np.ndarray
+    sale_fees_tc: np.ndarray
+    untaxed_count: np.ndarray
+
+    def totals(self) -> Tuple[Decimal, Decimal, Decimal]:
+        """Income, cost and fees of all sales, rounded like ``optimizer.calculate_totals``."""
+        precision = Decimal('0.0001')
+        return tuple(sum(col, Decimal(0)).quantize(precision)
+                     for col in (self.income_tc, self.sale_cost_tc, self.sale_fees_tc))
+
+    def apply(self, sale_records: List[SaleRecord]) -> None:
+        """Store the results on the records the table was built from."""
+        rows = iter(range(len(self.cost_tc)))
+        for i, sale in enumerate(sale_records):
+            sale._fx_rate = self.fx_rate[i]
+            sale._income_tc = self.income_tc[i]
+            sale._cost_tc = self.sale_cost_tc[i]
+            sale._fees_tc = self.sale_fees_tc[i]
+            sale._untaxed_count = int(self.untaxed_count[i])
+            for br, row in zip(sale.buys, rows):
+                if self.cost_tc[row] is None:
+                    continue
+                br._fx_rate = self.buy_fx_rate[row]
+                br._cost_tc = self.cost_tc[row]
+                br._fees_tc = self.fees_tc[row]
+                if self.time_test_passed[row]:
+                    br.pass_time_test()
+
+
+def fx_rates(years: np.ndarray, currencies: np.ndarray) -> np.ndarray:
+    """``unified_fx_rate`` joined onto (year, currency) columns, one lookup per distinct pair."""
+    if len(years) == 0:
+        return object_array([])
+    names, cur_idx = np.unique(currencies, return_inverse=True)
+    keys, inverse = np.unique(years.astype(np.int64) * len(names) + cur_idx, return_inverse=True)
+    rates = object_array([unified_fx_rate(int(k // len(names)), str(names[k % len(names)])) for k in keys])
+    return rates[inverse]
+
+
+def _group_sum(values: np.ndarray, starts: np.ndarray, n_rows: int, zero=Decimal(0)) -> np.ndarray:
+    sums = np.full(len(starts), zero, dtype=object)
+    nonempty = starts < np.append(starts[1:], n_rows)
+    if n_rows:
+        sums[nonempty] = np.add.reduceat(values, starts[nonempty])
+    return sums
+
+
+def compute_tax(table: PairingTable, tax_year: int, enable_bep: bool = False,
+                enable_ttest: bool = False) -> TaxResult:
+    """Tax every sale in *table*; the caller selects the sales closing in *tax_year*."""
+    n_rows, sale_row = len(table.sale_row), table.sale_row
+    sale_years = table.sale_time.astype('datetime64[Y]').astype(np.int64) + 1970
+    buy_years = table.buy_time.astype('datetime64[Y]').astype(np.int64) + 1970
+    sale_time = table.sale_time[sale_row]
+
+    # Short covers from before the tax year were taxed in their own year.
+    skipped = table.short_cover & (buy_years < tax_year)
+    if np.any(skipped & (table.buy_time < sale_time)):
+        raise ValueError("Not a short cover! Buy transaction is before sale transaction.")
+
+    sale_fx = fx_rates(sale_years, table.sale_currency)
+    buy_fx = fx_rates(buy_years, table.buy_currency)
+    fee_fx = fx_rates(buy_years, table.buy_fee_currency)
+
+    income = table.count * table.sale_price[sale_row] * sale_fx[sale_row] * table.sale_multiplier[sale_row]
+    buy_price = table.sale_bep[sale_row] if enable_bep else table.buy_price
+    cost = buy_price * buy_fx * table.count * table.buy_multiplier
+    fees = np.where(table.fee_consumed, table.buy_fee * fee_fx, Decimal(0))
+
+    age_days = (sale_time - table.buy_time) // np.timedelta64(1, 'D')
+    ttest_passed = ~skipped & (age_days > TTEST_DAYS)
+    untaxed = ttest_passed if enable_ttest else np.zeros(n_rows, dtype=bool)
+    included = ~skipped & ~untaxed
+
+    starts = table.sale_starts
+    included_count = _group_sum(np.where(included, table.count, 0), starts, n_rows, zero=0)
+    sale_fees = _group_sum(np.where(included, fees, Decimal(0)), starts, n_rows)
+    sale_fee_fx = fx_rates(sale_years, table.sale_fee_currency)
+    sale_fees = np.where(included_count > 0, sale_fees + table.sale_fee * sale_fee_fx, sale_fees)
+
+    return TaxResult(
+        buy_fx_rate=buy_fx,
+        cost_tc=np.where(skipped, None, cost),
+        fees_tc=fees,
+        time_test_passed=ttest_passed,
+        fx_rate=sale_fx,
+        income_tc=_group_sum(np.where(included, income, Decimal(0)), starts, n_rows),
+        sale_cost_tc=_group_sum(np.where(included, cost, Decimal(0)), starts, n_rows),
+        sale_fees_tc=sale_fees,
+        untaxed_count=_group_sum(np.where(untaxed, table.count, 0), starts, n_rows, zero=0),
+    )
+
+
+def calculate_tax_batched(sale_records: List[SaleRecord], tax_year: int, enable_bep: bool = False,
+                          enable_ttest: bool = False) -> TaxResult:
+    """Drop-in replacement for ``optimizer.calculate_tax`` that also returns the computed columns."""
+    sales = [s for s in sale_records if s.close_time.year == tax_year]
+    result = compute_tax(PairingTable.from_sale_records(sales), tax_year, enable_bep, enable_ttest)
+    result.apply(sales)
+    return result
@@ -0,0 +1,55 @@
+"""Transactions and scenarios shared by several test modules."""
+from __future__ import annotations
+
+import decimal
+from datetime import datetime
+
+from transaction import Transaction
+
+
+def make_tx(
+    ts: str | datetime,
+    qty: int,
+    *,
+    price: decimal = 10.0,
+    product: str = "TEST",
+    isin: str = "TEST123",
+    currency: str = "USD",
+) -> Transaction:
+    """
+    Build a Transaction in one line.
+
+    Parameters
+    ----------
+    ts   : ISO-date string or datetime
+    qty  : positive (BUY) or negative (SELL) share count
+    """
+    if isinstance(ts, str):
+        ts = datetime.fromisoformat(ts)
+
+    return Transaction(
+        time=ts,
+        product_name=product,
+        isin=isin,
+        count=qty,
+        share_price=price,
+        currency=currency,
+        fee=0,
+        fee_currency=currency,
+    )
+
+
+def scenario_three_years():
+    return [
+        make_tx("2022-01-10", 10, price=100.0),
+        make_tx("2022-03-10", 10, price=130.0),
+        make_tx("2022-06-10", -4, price=120.0),
+        make_tx("2023-01-10", 10, price=90.0),
+        make_tx("2023-05-10", -8, price=150.0),
+        make_tx("2023-11-10", -18, price=140.0),
+        make_tx("2023-12-10", -2, price=140.0),   # opens a short
+        make_tx("2024-01-10", 12, price=110.0),   # covers it
+        make_tx("2024-02-10", 5, price=160.0),
+        make_tx("2024-03-10", -9, price=170.0),
+        make_tx("2024-04-10", -4, price=100.0),
+    ]
@@ -0,0 +1,76 @@
+import random
+import unittest
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import numpy as np
+
+from break_even import MAX_LOG_SCALE, break_even_prices, calculate_break_even_prices_vectorized, \
+    quantized_break_even_prices
+from optimizer import calculate_break_even_prices, add_break_even_prices
+from tests.helpers import make_tx
+from transaction import IMPORT_PRECISION
+
+
+def random_history(rng: random.Random, n: int, *, shrinking: bool = False) -> list:
+    txs, held = [], 0
+    for i in range(n):
+        if held and rng.random() < (0.7 if shrinking else 0.4):
+            count = -held if rng.random() < 0.1 else -(held * 9 // 10 if shrinking else rng.randint(1, held)) or -1
+        else:
+            count = rng.randint(1, 500)
+        held += count
+        txs.append(make_tx(datetime(2018, 1, 1) + timedelta(days=3 * i), count, price=round(rng.uniform(0.5, 3000), 4)))
+    return txs
+
+
+class BreakEvenTestCase(unittest.TestCase):
+    def assert_matches_reference(self, txs):
+        reference = [t.bep.quantize(IMPORT_PRECISION) for t in calculate_break_even_prices(txs)]
+        self.assertEqual(reference, [t.bep for t in calculate_break_even_prices_vectorized(txs)])
+
+    def test_matches_decimal_reference(self):
+        for seed in (1, 7):
+            rng = random.Random(seed)
+            for trial in range(100):
+                with self.subTest(seed=seed, trial=trial):
+                    self.assert_matches_reference(random_history(rng, rng.randint(1, 300), shrinking=trial % 3 == 0))
+
+    def test_rounding_ties(self):
+        # 10.0000015 and 1.0000035 are just below the tie as floats; the reference rounds them half to even.
+        for low, high, expected in (("10.000001", "10.000002", "10.000002"), ("1.000003", "1.000004", "1.000004")):
+            bep = quantized_break_even_prices([1, 1, -1], [Decimal(low), Decimal(high), Decimal(1)])
+            self.assertEqual([Decimal(low), Decimal(expected), Decimal(expected)], bep)
+
+    def test_long_shrinking_position(self):
+        rng = random.Random(3)
+        txs, held = [], 0
+        for i in range(3000):
+            count = -(held * 9 // 10) if i % 3 == 2 else rng.randint(1, 1000)
+            held += count
+            txs.append(make_tx(datetime(2010, 1, 1) + timedelta(hours=i), count, price=round(rng.uniform(1, 500), 4)))
+        count = np.array([t.count for t in txs], dtype=float)
+        held = np.cumsum(count)
+        self.assertTrue(np.all(held > 0))  # One episode, scaled far beyond MAX_LOG_SCALE.
+        carried_share = ((held - count) / held)[count > 0][1:]  # Of the BEP at each later buy.
+        self.assertGreater(-np.log(carried_share).sum(), 2 * MAX_LOG_SCALE)
+        self.assert_matches_reference(txs)
+
+    def test_sales_keep_the_price(self):
+        bep = break_even_prices([10, 5, -8, 1, -8, 2], [100, 120, 130, 140, 1, 50])
+        np.testing.assert_allclose([100, 1600 / 15, 1600 / 15, (1600 / 15 * 7 + 140) / 8, 110.833333333, 50], bep)
+        self.assertRaises(ValueError, break_even_prices, [1, -2], [10, 10])
+
+    def test_yearly_reset(self):
+        txs = [make_tx("2020-03-01", 3, price=10), make_tx("2020-06-01", 6, price=11),
+               make_tx("2021-01-04", 1, price=20), make_tx("2021-05-01", -10, price=30)]
+        continued = calculate_break_even_prices_vectorized(txs)
+        yearly = add_break_even_prices(txs, "yearly")
+        carried = Decimal(32) / 3 * 9  # 9 shares at the 2020 year-end price 10.666...
+        self.assertEqual(((carried + 20) / 10).quantize(IMPORT_PRECISION), continued[2].bep)
+        self.assertEqual(((Decimal('10.666667') * 9 + 20) / 10).quantize(IMPORT_PRECISION), yearly[2].bep)
+        self.assertEqual(yearly[2].bep, yearly[3].bep)
+
+
+if __name__ == '__main__':
+    unittest.main()
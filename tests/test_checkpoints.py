@@ -0,0 +1,47 @@
+import copy
+import tempfile
+import unittest
+
+from checkpoints import CheckpointStore
+from optimizer import pair_transactions, pair_product_alternatives, calculate_tax, calculate_totals
+from tests.helpers import scenario_three_years
+
+
+class CheckpointTestCase(unittest.TestCase):
+    STRATEGIES = {2022: 'fifo', 2023: 'max_cost', 2024: 'fifo'}
+
+    def test_snapshots_are_copy_on_write(self):
+        checkpoints = CheckpointStore()
+        pair_transactions(scenario_three_years(), self.STRATEGIES, checkpoints=checkpoints)
+
+        self.assertEqual([2022, 2023, 2024], checkpoints.years)
+        self.assertEqual(5, len(checkpoints.load(2022).lots))  # All buys
+        self.assertEqual({0}, set(checkpoints.load(2023).lots))  # Consumed in 2022
+        self.assertEqual({0, 1, 3}, set(checkpoints.load(2024).lots))
+        self.assertEqual([(6, 2)], checkpoints.load(2024).open_shorts)
+        self.assertEqual((6, False), checkpoints.lot_state(2023)[0])
+        self.assertEqual((10, True), checkpoints.lot_state(2023)[3])
+
+    def test_rerun_matches_full_runs(self):
+        alternatives = ['lifo', 'max_cost', 'min_cost', 'micol']
+        for spill_dir in (None, tempfile.mkdtemp()):
+            results = pair_product_alternatives(scenario_three_years(), 2024, self.STRATEGIES, alternatives,
+                                                spill_dir=spill_dir)
+            self.assertEqual(['fifo'] + alternatives, list(results))
+            for name, result in results.items():
+                expected = pair_transactions(scenario_three_years(), {**self.STRATEGIES, 2024: name})
+                self.assertEqual(list(expected.sale_trans), list(result.sale_trans))
+                self.assertEqual(list(expected.pair_buy), list(result.pair_buy))
+                self.assertEqual(list(expected.pair_count), list(result.pair_count))
+                self.assertEqual(list(expected.pair_fee_consumed), list(result.pair_fee_consumed))
+
+    def test_rerun_totals(self):
+        txs = scenario_three_years()
+        results = pair_product_alternatives(copy.deepcopy(txs), 2024, self.STRATEGIES, ['max_cost'])
+        expected = pair_transactions(txs, {**self.STRATEGIES, 2024: 'max_cost'}).sale_records()
+        calculate_tax(expected, 2024)
+        self.assertEqual(calculate_totals(expected, 2024), calculate_totals(results['max_cost'].sale_records(), 2024))
+
+
+if __name__ == '__main__':
+    unittest.main()
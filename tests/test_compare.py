@@ -0,0 +1,41 @@
+import unittest
+
+from compare import compare_product, compare_products, best_by_year, Totals
+from optimizer import pair_product, calculate_totals, calculate_untaxed_totals
+from tests.helpers import scenario_three_years
+
+
+class CompareTestCase(unittest.TestCase):
+    STRATEGIES = {2022: 'fifo', 2023: 'max_cost', 2024: 'fifo'}
+    CANDIDATES = ['fifo', 'lifo', 'max_cost', 'min_cost', 'micol']
+    YEARS = [2022, 2023, 2024]
+
+    def test_matches_full_runs(self):
+        comparison = compare_product(scenario_three_years(), self.YEARS, self.STRATEGIES, self.CANDIDATES,
+                                     enable_ttest=True)
+        for year in self.YEARS:
+            for name in self.CANDIDATES:
+                with self.subTest(year=year, strategy=name):
+                    report = pair_product(scenario_three_years(), year, {**self.STRATEGIES, year: name},
+                                          enable_ttest=True).sale_records()
+                    expected = Totals(*calculate_totals(report, year), calculate_untaxed_totals(report, year))
+                    self.assertEqual(expected, comparison[year][name])
+
+    def test_workers(self):
+        products = {"A": scenario_three_years(), "B": scenario_three_years()[:6]}
+        sequential = compare_products(products, self.YEARS, self.STRATEGIES, self.CANDIDATES)
+        parallel = compare_products(products, self.YEARS, self.STRATEGIES, self.CANDIDATES, workers=2)
+        self.assertEqual(sequential, parallel)
+
+    def test_best_by_year(self):
+        comparisons = [
+            {2023: {'fifo': Totals(income=10, cost=5), 'lifo': Totals(income=10, cost=8)}},
+            {2023: {'fifo': Totals(income=10, cost=5), 'lifo': Totals(income=10, cost=2, fees=1)}},
+        ]
+        best, totals = best_by_year(comparisons)[2023]
+        self.assertEqual('lifo', best)
+        self.assertEqual(Totals(income=20, cost=10), totals['fifo'])
+
+
+if __name__ == '__main__':
+    unittest.main()
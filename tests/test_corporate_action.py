@@ -21,18 +21,19 @@ class SplitTests(unittest.TestCase):
             fee_currency="USD",
         )
 
-    def test_apply_split_simple(self):
-        tx = self._tx("TSLA", datetime(2022, 1, 10), 10, 900)
-        tx.apply_split(3, 1)                      # 3-for-1
+    def test_with_split_simple(self):
+        original = self._tx("TSLA", datetime(2022, 1, 10), 10, 900)
+        tx = original.with_split(3, 1)            # 3-for-1
         self.assertEqual(tx.count, 30)
-        self.assertEqual(tx.remaining_count, 30)
         self.assertEqual(tx.share_price, Decimal("300"))
+        self.assertEqual(original.count, 10)      # trade records are immutable
+        self.assertEqual(original.share_price, Decimal("900"))
 
-    def test_apply_split_fractional_raises(self):
+    def test_with_split_fractional_raises(self):
         tx = self._tx("TSLA", datetime(2022, 1, 10), 7, 100)
         # 3/2 would leave 10.5 shares → error
         with self.assertRaises(ValueError):
-            tx.apply_split(3, 2)
+            tx.with_split(3, 2)
 
     def test_ignore_splits_before_first_trade(self):
         txs = [
@@ -80,9 +81,10 @@ class SplitTests(unittest.TestCase):
             }
         )
         apply_stock_splits_for_product(txs, splits, "SHOP", id_col="Symbol")
-        self.assertEqual(old.count, 30)     # adjusted
-        self.assertEqual(old.split_ratio, Decimal("10"))
-        self.assertEqual(new.count, 3)      # untouched
+        self.assertEqual(txs[0].count, 30)  # adjusted
+        self.assertEqual(txs[0].split_ratio, Decimal("10"))
+        self.assertEqual(old.count, 3)      # replaced, not mutated
+        self.assertIs(txs[1], new)          # untouched
         self.assertEqual(new.split_ratio, Decimal("1"))
 
     def test_split_by_isin(self):
@@ -99,8 +101,8 @@ class SplitTests(unittest.TestCase):
             }
         )
         apply_stock_splits_for_product(txs, splits, "CA82509L1076", id_col="ISIN")
-        self.assertEqual(old.count, 30)     # adjusted
-        self.assertEqual(new.count, 3)      # untouched
+        self.assertEqual(txs[0].count, 30)  # adjusted
+        self.assertEqual(txs[1].count, 3)   # untouched
 
 
 if __name__ == "__main__":
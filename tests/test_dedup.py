@@ -0,0 +1,56 @@
+import contextlib
+import io
+import unittest
+from pathlib import Path
+
+from dedup import drop_duplicate_trades
+from import_deg import import_transactions
+from import_ibkr import import_ibkr_stock_transactions
+
+TEST_DATA = Path(__file__).parent / "test_data"
+
+
+class DropDuplicateTradesTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with contextlib.redirect_stdout(io.StringIO()):
+            cls.deg = import_transactions(str(TEST_DATA / "Transactions-deg-en-2021.csv")).reset_index(drop=True)
+
+    def drop(self, frames):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            df = drop_duplicate_trades(frames, [f"{i}.csv" for i in range(len(frames))])
+        return df, out.getvalue().splitlines()
+
+    def test_overlapping_statements(self):
+        df, report = self.drop([self.deg.iloc[:50], self.deg.iloc[30:], self.deg.iloc[:10]])
+        self.assertEqual(len(self.deg), len(df))
+        self.assertTrue(df["Order ID"].is_unique)
+        self.assertEqual(["0.csv: 0 of 50 trades already imported from other statements, dropped",
+                          "1.csv: 20 of 58 trades already imported from other statements, dropped",
+                          "2.csv: 10 of 10 trades already imported from other statements, dropped"], report)
+
+    def test_identical_fills_in_one_statement(self):
+        first = self.deg.iloc[[0, 0, 1]]
+        df, _ = self.drop([first, self.deg.iloc[[0, 1, 2]]])
+        self.assertEqual(4, len(df))
+        # A later statement with more identical fills adds the extra ones.
+        df, _ = self.drop([first, self.deg.iloc[[0, 0, 0]]])
+        self.assertEqual(4, len(df))
+
+    def test_partial_fills_of_one_order(self):
+        fills = self.deg.iloc[[0, 1]].copy()
+        fills["Order ID"] = "same-order"
+        df, _ = self.drop([fills.iloc[:1], fills])
+        self.assertEqual(2, len(df))
+
+    def test_ibkr_statement_imported_twice(self):
+        path = TEST_DATA / "U74_2022_test.csv"
+        with contextlib.redirect_stdout(io.StringIO()):
+            once = import_ibkr_stock_transactions([path])
+            twice = import_ibkr_stock_transactions([path, path])
+        self.assertEqual(len(once), len(twice))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import contextlib
+import io
+import unittest
+from pathlib import Path
+
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from fills import aggregate_fills
+from import_deg import FEE_COLUMN, import_transactions
+from import_ibkr import import_ibkr_stock_transactions
+
+TEST_DATA = Path(__file__).parent / "test_data"
+
+
+def split_row(df: pd.DataFrame, row: int, quantity: int, price_col: str, *, price_step: float = 1.0,
+              time_step: str = None) -> pd.DataFrame:
+    """*df* with the trade at *row* split into fills of *quantity* and of the rest, the second one pricier."""
+    first, second = df.iloc[[row]].copy(), df.iloc[[row]].copy()
+    first["Quantity"] = quantity
+    second["Quantity"] -= quantity
+    second[price_col] += price_step
+    if time_step:
+        date_col = "DateTime" if "DateTime" in df else "Date/Time"
+        second[date_col] += pd.Timedelta(time_step)
+    return pd.concat([df.iloc[:row], second, first, df.iloc[row + 1:]])
+
+
+class FillsTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with contextlib.redirect_stdout(io.StringIO()):
+            cls.deg = import_transactions(str(TEST_DATA / "Transactions-deg-en-2021.csv"))
+            cls.ibkr = import_ibkr_stock_transactions([TEST_DATA / "U74_2022_test.csv"])
+
+    def test_single_fills_unchanged(self):
+        for df in (self.deg, self.ibkr):
+            orders, fills = aggregate_fills(df)
+            self.assertTrue((orders["Fills"] == 1).all())
+            assert_frame_equal(df, orders.drop(columns="Fills"))
+            self.assertTrue(fills.empty)
+
+    def test_degiro_order(self):
+        row = self.deg.iloc[3]
+        self.assertEqual(3, row["Quantity"])
+        df = split_row(self.deg, 3, 1, "Price", time_step="10s")
+        orders, fills = aggregate_fills(df)
+        self.assertEqual(len(self.deg), len(orders))
+        order = orders.iloc[3]
+        self.assertEqual((3, 2), (order["Quantity"], order["Fills"]))
+        self.assertAlmostEqual(row["Price"] + 2 / 3, order["Price"])
+        self.assertEqual(row["DateTime"], order["DateTime"])
+        self.assertAlmostEqual(2 * row[FEE_COLUMN], order[FEE_COLUMN])
+        self.assertEqual([2, 1], list(fills["Quantity"]))
+        self.assertEqual([row["DateTime"]] * 2, list(fills["OrderTime"]))
+        self.assertEqual([order["Price"]] * 2, list(fills["OrderPrice"]))
+
+    def test_ibkr_executions(self):
+        df = split_row(self.ibkr, 3, 1, "T. Price", price_step=2.0)
+        df = split_row(df, 11, -1, "T. Price", time_step="1s")  # A later execution is an order of its own.
+        orders, fills = aggregate_fills(df)
+        self.assertEqual(len(self.ibkr) + 1, len(orders))
+        self.assertEqual(2, orders["Fills"].iloc[3])
+        self.assertAlmostEqual(self.ibkr["T. Price"].iloc[3] + 1, orders["T. Price"].iloc[3])
+        self.assertEqual(self.ibkr["Quantity"].sum(), orders["Quantity"].sum())
+        self.assertEqual(2, len(fills))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import contextlib
+import io
+import tempfile
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+from corporate_action import load_stock_splits
+from identifiers import IdentifierIndex, build_identifier_index, load_identifier_index, parse_identifier_change
+from import_ibkr import import_ibkr_stock_transactions, process_corporate_actions
+
+TEST_DATA = Path(__file__).parent / "test_data"
+
+WEJO_CHANGE = "WEJO(BMG9525W1091) CUSIP/ISIN Change to (BMG9525W1174) (WEJO.NEW, WEJO GROUP LTD, BMG9525W1174)"
+
+
+class IdentifierIndexTestCase(unittest.TestCase):
+    def test_changes_resolve_to_newest(self):
+        index = IdentifierIndex()
+        index.join(["ABC", "US0000000018"], ["ABC", "US0000000026"])
+        index.join(["ABC", "US0000000026"], ["XYZ", "US0000000034"])
+        for old in ("ABC", "XYZ"):
+            self.assertEqual("XYZ", index.canonical(old))
+        for old in ("US0000000018", "US0000000026", "US0000000034"):
+            self.assertEqual("US0000000034", index.canonical(old))
+        self.assertEqual("TSLA", index.canonical("TSLA"))
+        self.assertEqual({"ABC", "XYZ", "US0000000018", "US0000000026", "US0000000034"}, set(index.members("ABC")))
+        self.assertEqual(["TSLA"], index.members("TSLA"))
+
+    def test_aliases_take_precedence(self):
+        actions = pd.DataFrame({"Date/Time": ["2023-01-10 20:25:00"], "Description": [WEJO_CHANGE]})
+        index = build_identifier_index(actions, [("WEJO", "WEJO.NEW"), ("META", "FB")])
+        self.assertEqual(("WEJO", "BMG9525W1091", "WEJO.NEW", "BMG9525W1174"), parse_identifier_change(WEJO_CHANGE))
+        self.assertEqual("WEJO", index.canonical("WEJO.NEW"))
+        self.assertEqual("BMG9525W1174", index.canonical("BMG9525W1091"))
+        self.assertEqual("META", index.canonical("FB"))
+        self.assertRaises(ValueError, parse_identifier_change, "WEJO(BMG9525W1091) Split 1 for 10")
+
+    def test_resolve_trades(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            df = import_ibkr_stock_transactions([TEST_DATA / "U74_2022_test.csv"])
+        meli = (df["Symbol"] == "MELI").to_numpy()
+        renamed = df.astype({"Symbol": object})
+        renamed.loc[meli & (renamed["Date/Time"] < "2022-06-01").to_numpy(), "Symbol"] = "MELI.OLD"
+        self.assertEqual(2, renamed.loc[meli, "Symbol"].nunique())
+
+        index = build_identifier_index(aliases=[("MELI", "MELI.OLD")])
+        resolved = index.resolve_ids(renamed.astype({"Symbol": "category"}))
+        self.assertEqual("category", resolved["Symbol"].dtype.name)
+        self.assertEqual(df["Symbol"].tolist(), resolved["Symbol"].tolist())
+        self.assertIs(df, index.resolve_ids(df))
+
+    def test_corporate_action_files(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            statement = Path(tmp) / "statement.csv"
+            lines = (TEST_DATA / "U74_2022_test.csv").read_text(encoding="utf-8").splitlines()
+            header = next(i for i, line in enumerate(lines) if line.startswith("Corporate Actions,Header"))
+            lines.insert(header + 1, f'Corporate Actions,Data,Stocks,USD,2022-12-05,"2022-12-02, 20:25:00",'
+                                     f'"{WEJO_CHANGE}",0,0,0,0,')
+            statement.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+            actions = process_corporate_actions([statement])
+            self.assertEqual(6, len(actions))
+            self.assertEqual(1, actions["Numerator"].isna().sum())
+            exported = Path(tmp) / "corporate_actions.csv"
+            actions.drop("Quantity", axis=1).to_csv(exported, index=False)
+
+            self.assertEqual(5, len(load_stock_splits(str(exported))))
+            index = load_identifier_index(exported)
+            self.assertEqual("WEJO.NEW", index.canonical("WEJO"))
+            self.assertEqual(4, len(index))
+
+
+if __name__ == '__main__':
+    unittest.main()
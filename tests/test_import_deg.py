@@ -3,6 +3,8 @@ import os
 
 from decimal import Decimal
 
+from pandas.testing import assert_frame_equal
+
 from import_deg import import_transactions, convert_to_transactions_deg
 from import_utils import get_product_id_by_prefix
 from optimizer import optimize_product, calculate_totals
@@ -27,6 +29,24 @@ class ImportTestCase(unittest.TestCase):
         df_transactions = self.import_test_transactions_en()
         self.assertEqual(88, df_transactions.shape[0])
 
+    def test_import_filtered(self):
+        df_all = self.import_test_transactions_en()
+        isin = get_product_id_by_prefix(df_all, "CLOUDFLARE", id_col="ISIN")
+        df = import_transactions("test_data/Transactions-deg-en-2021.csv", products={isin}, until_year=self.TAX_YEAR)
+        expected = df_all[(df_all["ISIN"] == isin) & (df_all["DateTime"].dt.year <= self.TAX_YEAR)]
+        self.assertTrue(len(df) > 0)
+        assert_frame_equal(expected.reset_index(drop=True), df.reset_index(drop=True),
+                           check_categorical=False, check_dtype=False)
+
+    def test_import_compact(self):
+        df = self.import_test_transactions_en()
+        self.assertNotIn('Reference', df.columns)
+        self.assertEqual(['Date', 'Time', 'Product', 'ISIN', 'Quantity', 'Price', 'Unnamed: 8',
+                          'Transaction and/or third', 'Unnamed: 15', 'Order ID', 'DateTime'], list(df.columns))
+        for col in ['Product', 'ISIN', 'Unnamed: 8', 'Unnamed: 15']:
+            self.assertEqual('category', df[col].dtype.name, col)
+        self.assertEqual('int32', df['Quantity'].dtype.name)
+
     def test_conversion(self):
         df_transactions = self.import_test_transactions_en()
 
@@ -4,6 +4,7 @@ import os
 from import_ibkr import import_corporate_actions, import_ibkr_stock_transactions, extract_split_ratio
 from transaction_ibkr import convert_to_transactions_ibkr
 from pandas import DataFrame
+from pandas.testing import assert_frame_equal
 from transaction import Transaction
 
 
@@ -48,6 +49,14 @@ class ImportTestCase(unittest.TestCase):
         df_ca = self.import_test_ca()
         self.assertEqual(df_ca[df_ca['Symbol'] == 'TSLA']['ISIN'].iloc[0], 'US88160R1014')
 
+    def test_import_filtered(self):
+        df_all = self.import_test_transactions()
+        df = import_ibkr_stock_transactions(["test_data/U74_2022_test.csv"], symbols={"MELI", "WEJO"},
+                                            until_year=self.TAX_YEAR)
+        expected = df_all[df_all["Symbol"].isin(["MELI", "WEJO"])].reset_index(drop=True)
+        assert_frame_equal(expected, df.reset_index(drop=True), check_categorical=False, check_dtype=False)
+        self.assertEqual(0, len(import_ibkr_stock_transactions(["test_data/U74_2022_test.csv"], until_year=2021)))
+
 
 class TestExtractSplitRatio(unittest.TestCase):
     def test_valid_line(self):
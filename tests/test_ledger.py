@@ -0,0 +1,46 @@
+import unittest
+
+from ledger import Ledger
+from optimizer import pair_transactions
+from tests.helpers import scenario_three_years
+
+
+class LedgerTestCase(unittest.TestCase):
+    STRATEGIES = {2022: 'fifo', 2023: 'max_cost', 2024: 'fifo'}
+
+    def setUp(self):
+        self.ledger = Ledger(":memory:")
+        self.run_id = self.ledger.start_run("test", 2024, self.STRATEGIES)
+        self.result = pair_transactions(scenario_three_years(), self.STRATEGIES)
+        self.ledger.add_product(self.run_id, "TEST", self.result)
+
+    def tearDown(self):
+        self.ledger.close()
+
+    def test_open_lots_as_of(self):
+        self.assertEqual([(1, 10), (2, 10)], [(r["id"], r["remaining"]) for r in
+                                              self.ledger.open_lots("TEST", "2022-05-01")])
+        self.assertEqual([(1, 6), (2, 10)], [(r["id"], r["remaining"]) for r in
+                                             self.ledger.open_lots("TEST", "2022-06-10")])
+        # The final state agrees with the run's lot overlay.
+        final = {r["id"]: r["remaining"] for r in self.ledger.open_lots("TEST", "2024-12-31")}
+        expected = {i + 1: self.result.lots.remaining[i] for i, t in enumerate(self.result.trans)
+                    if not t.is_sale and self.result.lots.remaining[i]}
+        self.assertEqual(expected, final)
+
+    def test_lot_pairings(self):
+        rows = self.ledger.lot_pairings(8)  # The 2024-01-10 buy covers the 2023-12-10 short, then is sold.
+        self.assertEqual([(7, 2, 1), (10, 9, 0), (11, 1, 0)],
+                         [(r["sale_id"], r["quantity"], r["short_cover"]) for r in rows])
+        self.assertEqual("2024-01-10T00:00:00", rows[0]["pair_time"])
+
+    def test_runs_are_separate(self):
+        second = self.ledger.start_run("test", 2024, self.STRATEGIES)
+        self.ledger.add_product(second, "TEST", pair_transactions(scenario_three_years(), {2022: 'lifo'}))
+        self.assertEqual(second, self.ledger.latest_run())
+        self.assertEqual([12, 13], [r["id"] for r in self.ledger.open_lots("TEST", "2022-05-01")])
+        self.assertEqual([1, 2], [r["id"] for r in self.ledger.open_lots("TEST", "2022-05-01", self.run_id)])
+
+
+if __name__ == '__main__':
+    unittest.main()
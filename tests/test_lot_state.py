@@ -0,0 +1,47 @@
+import unittest
+
+from lot_state import LotOverlay
+from optimizer import pair_transactions, pair_product
+from tests.test_optimizer import scenario_sell_in_two_parts, scenario_sell_multiple_buys
+
+
+class LotOverlayTestCase(unittest.TestCase):
+    TAX_YEAR = 2021
+
+    def test_consume(self):
+        trans = scenario_sell_in_two_parts()
+        lots = LotOverlay(trans)
+
+        self.assertTrue(lots.lot(trans[0]).consume_shares(4))
+        self.assertFalse(lots.lot(trans[0]).consume_shares(6))
+        self.assertEqual((0, False), lots.state(0))
+        with self.assertRaises(ValueError):
+            lots.consume(0, 1)
+        with self.assertRaises(ValueError):
+            lots.remaining_count(trans[1])
+        self.assertIs(trans[1], lots.lots[1])  # Sales are not wrapped.
+
+    def test_runs_share_transactions(self):
+        trans = scenario_sell_multiple_buys()
+        first = pair_transactions(trans, {self.TAX_YEAR: 'fifo'})
+        second = pair_transactions(trans, {self.TAX_YEAR: 'lifo'})
+
+        self.assertEqual([5, 4, 1], list(first.pair_count))
+        self.assertEqual([0, 0, 2], [first.lots.remaining_count(t) for t in trans[:3]])
+        self.assertEqual([2, 0, 0], [second.lots.remaining_count(t) for t in trans[:3]])
+        self.assertEqual([5, 4, 3], [t.count for t in trans[:3]])
+
+    def test_bep_keeps_buy_prices(self):
+        trans = scenario_sell_multiple_buys()
+        prices = [t.share_price for t in trans]
+        report = pair_product(trans, self.TAX_YEAR, {self.TAX_YEAR: 'fifo'}, enable_bep=True).sale_records()
+
+        self.assertEqual(prices, [t.share_price for t in trans])
+        self.assertEqual(prices[:3], [br.buy_t.share_price for br in report[0].buys])
+        bep = report[0].sale_t.bep
+        self.assertEqual([bep * br.fx_rate * br._count_consumed for br in report[0].buys],
+                         [br.cost_tc for br in report[0].buys])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def imported_modules(code: str) -> set[str]:
+    out = subprocess.run([sys.executable, "-c", code + "; import sys; print(' '.join(sys.modules))"],
+                         cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    return set(out.split())
+
+
+class StartupTestCase(unittest.TestCase):
+    def test_core_is_pandas_free(self):
+        modules = imported_modules("import optimizer, transaction")
+        self.assertNotIn("pandas", modules)
+
+    def test_main_import_is_pandas_free(self):
+        modules = imported_modules("import main")
+        self.assertNotIn("pandas", modules)
+        self.assertNotIn("import_deg", modules)
+        self.assertNotIn("import_ibkr", modules)
+
+    def test_help_does_not_import_pandas(self):
+        result = subprocess.run([sys.executable, "-X", "importtime", "main.py", "--help"],
+                                cwd=ROOT, capture_output=True, text=True)
+        self.assertEqual(0, result.returncode)
+        self.assertNotIn(" pandas\n", result.stderr)
+
+    def test_compare_before_configured_years(self):
+        result = subprocess.run([sys.executable, "main.py", "--ibkr", "--year", "2016", "--compare",
+                                 "tests/test_data/U74_2022_test.csv"], cwd=ROOT, capture_output=True, text=True)
+        self.assertEqual(2, result.returncode)
+        self.assertIn("--compare needs a strategy configured for 2016", result.stderr)
+
+    def test_watch_rejects_ledger(self):
+        result = subprocess.run([sys.executable, "main.py", "--deg", "--watch", "--ledger", "ledger.db", "statements"],
+                                cwd=ROOT, capture_output=True, text=True)
+        self.assertEqual(2, result.returncode)
+        self.assertIn("--ledger cannot be used with --watch", result.stderr)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,192 @@
+import itertools
+import random
+import time
+import unittest
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import List, Tuple
+
+from currency import unified_fx_rate
+from lot_state import LotOverlay
+from min_cost_flow import MinCostFlow
+from optimal import solve_allocation, czk_per_share, TTEST_MIN_AGE, COST_SCALE
+from optimizer import optimize_product, pair_product, calculate_totals
+from tests.test_transaction import create_t
+from transaction import Transaction
+
+
+def scenario_time_test_exchange():
+    # max_cost pairs the first sale with the expensive lot, which would pass the time test for the second one.
+    return [
+        create_t(1, price=150.0, day=1, month=6, year_offset=-3),
+        create_t(1, price=100.0, day=1, month=6, year_offset=-1),
+        create_t(-1, price=200.0, day=10, month=1),
+        create_t(-1, price=200.0, day=10, month=12),
+    ]
+
+
+def pair_cost(sale_t: Transaction, buy_t: Transaction, enable_ttest: bool) -> Decimal:
+    if enable_ttest and sale_t.time - buy_t.time >= TTEST_MIN_AGE:
+        return Decimal(0)
+    return czk_per_share(sale_t) - czk_per_share(buy_t)
+
+
+def reference_cost(sales: List[Transaction], lots: List[Transaction], enable_ttest: bool) -> (int, Decimal):
+    """Covered share count and taxable profit of a plain sale x lot min-cost flow."""
+    g = MinCostFlow()
+    source, sink = g.add_node(), g.add_node()
+    sale_nodes, lot_nodes = g.add_nodes(len(sales)), g.add_nodes(len(lots))
+    short = int(10 ** 6 * COST_SCALE)
+    for i, (s, sale_t) in enumerate(zip(sale_nodes, sales)):
+        g.add_edge(source, s, -sale_t.count, 0)
+        g.add_edge(s, sink, -sale_t.count, short * (len(sales) - i))  # Earlier sales are covered first.
+        for l, buy_t in zip(lot_nodes, lots):
+            if buy_t.time < sale_t.time:
+                g.add_edge(s, l, -sale_t.count, int(pair_cost(sale_t, buy_t, enable_ttest) * COST_SCALE))
+    for l, buy_t in zip(lot_nodes, lots):
+        g.add_edge(l, sink, buy_t.count, 0)
+    g.send(source, sink, -sum(t.count for t in sales))
+
+    covered, cost = 0, Decimal(0)
+    for s, sale_t in zip(sale_nodes, sales):
+        for e in g.out_edges(s):
+            if g.edge_head(e) in lot_nodes and g.edge_flow(e):
+                buy_t = lots[g.edge_head(e) - lot_nodes.start]
+                covered += g.edge_flow(e)
+                cost += g.edge_flow(e) * pair_cost(sale_t, buy_t, enable_ttest)
+    return covered, cost
+
+
+def random_scenario(rnd: random.Random) -> (List[Transaction], List[Transaction]):
+    def t(time, count, price):
+        return Transaction(time, "Foo", "X123", count, price, 'USD', 0, 'USD')
+
+    start = datetime(2018, 1, 1)
+    lots = [t(start + timedelta(days=rnd.randint(0, 6 * 365)), rnd.randint(1, 5), rnd.choice([50, 100, 150, 200]))
+            for _ in range(rnd.randint(1, 12))]
+    lots = [l for l in lots if l.time.year < 2024]
+    sales = [t(datetime(2023, 1, 1) + timedelta(days=rnd.randint(0, 360)), -rnd.randint(1, 8),
+               rnd.choice([50, 100, 150, 200])) for _ in range(rnd.randint(1, 6))]
+    return sorted(sales, key=lambda s: s.time), lots
+
+
+def taxable_after_fees(sales: List[Transaction], lots: List[Transaction], allocation: List[List[Tuple[int, int]]]) -> Decimal:
+    """Taxable profit after fees of the (sale index order) allocation, lot fees going with each lot's first sale."""
+    def fee(t: Transaction) -> Decimal:
+        return t.fee * unified_fx_rate(t.time.year, t.fee_currency)
+
+    total, fee_used = Decimal(0), set()
+    for sale_t, pairs in zip(sales, allocation):
+        taxed = False
+        for k, count in pairs:
+            first = k not in fee_used
+            fee_used.add(k)
+            if sale_t.time - lots[k].time < TTEST_MIN_AGE:
+                taxed = True
+                total += count * (czk_per_share(sale_t) - czk_per_share(lots[k])) - (fee(lots[k]) if first else 0)
+        if taxed:
+            total -= fee(sale_t)
+    return total
+
+
+def brute_force_after_fees(sales: List[Transaction], lots: List[Transaction]) -> Decimal:
+    """Lowest taxable profit after fees over all allocations covering every sale."""
+    best = None
+
+    def allocate(i: int, left: List[int], allocation: List[List[Tuple[int, int]]]):
+        nonlocal best
+        if i == len(sales):
+            profit = taxable_after_fees(sales, lots, allocation)
+            best = profit if best is None else min(best, profit)
+            return
+        eligible = [k for k, t in enumerate(lots) if t.time < sales[i].time]
+        for counts in itertools.product(*(range(left[k] + 1) for k in eligible)):
+            if sum(counts) == -sales[i].count:
+                pairs = [(k, c) for k, c in zip(eligible, counts) if c]
+                allocate(i + 1, [left[k] - dict(pairs).get(k, 0) for k in range(len(lots))], allocation + [pairs])
+
+    allocate(0, [t.count for t in lots], [])
+    return best
+
+
+class OptimalStrategyTestCase(unittest.TestCase):
+    TAX_YEAR = 2021
+
+    def taxable_profit(self, strategy: str, enable_ttest: bool) -> Decimal:
+        report = optimize_product(scenario_time_test_exchange(), self.TAX_YEAR, {self.TAX_YEAR: strategy},
+                                  enable_ttest=enable_ttest)
+        income, cost, _ = calculate_totals(report, self.TAX_YEAR)
+        return income - cost
+
+    def test_prefers_expensive_lots(self):
+        self.assertEqual(self.taxable_profit('max_cost', False), self.taxable_profit('optimal', False))
+
+    def test_plans_for_time_test(self):
+        report = optimize_product(scenario_time_test_exchange(), self.TAX_YEAR, {self.TAX_YEAR: 'optimal'},
+                                  enable_ttest=True)
+        self.assertEqual([Decimal(100), Decimal(150)], [s.buys[0].buy_t.share_price for s in report])
+        self.assertLess(self.taxable_profit('optimal', True), self.taxable_profit('max_cost', True))
+
+    def test_short_when_no_lots(self):
+        trans = [create_t(-3, price=100.0, day=1), create_t(2, price=90.0, day=2), create_t(-2, price=95.0, day=3)]
+        result = pair_product(trans, self.TAX_YEAR, {self.TAX_YEAR: 'optimal'})
+        self.assertEqual(2, len(result))
+        self.assertEqual(0, sum(result.lots.remaining))
+
+    def test_matches_reference_flow(self):
+        rnd = random.Random(7)
+        for _ in range(150):
+            sales, lots = random_scenario(rnd)
+            for enable_ttest in (False, True):
+                allocation = solve_allocation(sales, LotOverlay(lots).lots, enable_ttest=enable_ttest)
+                covered = sum(c for pairs in allocation.values() for _, c in pairs)
+                cost = sum(c * pair_cost(s, l, enable_ttest) for s, pairs in allocation.items() for l, c in pairs)
+                self.assertEqual(reference_cost(sales, lots, enable_ttest), (covered, cost))
+
+    def test_fees_in_objective(self):
+        rnd = random.Random(11)
+        checked = 0
+        while checked < 60:
+            def t(when, count, price):
+                return Transaction(when, "Foo", "X123", count, price, 'USD', rnd.choice([0, 1, 30]), 'USD')
+
+            lots = sorted((t(datetime(2018, 1, 1) + timedelta(days=rnd.randint(0, 5 * 365)), rnd.randint(1, 3),
+                             rnd.choice([50, 100, 150, 200])) for _ in range(rnd.randint(1, 4))), key=lambda l: l.time)
+            sales = sorted((t(datetime(2023, 1, 1) + timedelta(days=rnd.randint(0, 360)), -rnd.randint(1, 3),
+                              rnd.choice([50, 100, 150, 200])) for _ in range(rnd.randint(1, 3))), key=lambda s: s.time)
+            expected = brute_force_after_fees(sales, lots)
+            if expected is None:
+                continue  # Some sale cannot be covered.
+            report = optimize_product(sorted(lots + sales, key=lambda t: t.time), 2023, {2023: 'optimal'},
+                                      enable_ttest=True)
+            income, cost, fees = calculate_totals(report, 2023)
+            self.assertEqual(expected.quantize(Decimal('0.0001')), income - cost - fees)
+            checked += 1
+
+    def test_tens_of_thousands_of_lots(self):
+        rnd = random.Random(3)
+
+        def t(when, count, price):
+            return Transaction(when, "Foo", "X123", count, price, 'USD', rnd.choice([0, 1]), 'USD')
+
+        lots = [t(datetime(2018, 1, 1) + timedelta(minutes=rnd.randint(0, 6 * 365 * 24 * 60)), rnd.randint(1, 5),
+                  rnd.randint(50, 250)) for _ in range(30000)]
+        lots = sorted((l for l in lots if l.time.year < 2024), key=lambda l: l.time)
+        sales = sorted((t(datetime(2023, 1, 1) + timedelta(minutes=rnd.randint(0, 360 * 24 * 60)),
+                          -rnd.randint(1, 5), rnd.randint(50, 250)) for _ in range(2000)), key=lambda s: s.time)
+        start = time.perf_counter()
+        allocation = solve_allocation(sales, LotOverlay(lots).lots, enable_ttest=True)
+        self.assertLess(time.perf_counter() - start, 60)
+
+        used = {}
+        for sale_t, pairs in allocation.items():
+            self.assertEqual(-sale_t.count, sum(c for _, c in pairs))
+            for lot, count in pairs:
+                self.assertLess(lot.time, sale_t.time)
+                used[lot] = used.get(lot, 0) + count
+        self.assertEqual(len(sales), len(allocation))
+        self.assertTrue(all(count <= lot.count for lot, count in used.items()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,16 +1,17 @@
 import os
 import decimal
 from decimal import Decimal
-from datetime import datetime
 import unittest
 
 from currency import unified_fx_rate
 from import_deg import import_transactions, convert_to_transactions_deg
 from import_utils import get_product_id_by_prefix
+from lot_state import LotOverlay
 from optimizer import optimize_transaction_pairing, is_better_cost_pair, calculate_tax, optimize_product, \
-    calculate_totals, calculate_break_even_prices
+    calculate_totals, calculate_break_even_prices, pair_transactions, find_buys
+from strategy_registry import AgePartitionedLotIndex, LotPartition
+from tests.helpers import make_tx
 from tests.test_transaction import create_t
-from transaction import Transaction
 
 
 def scenario_sell_in_two_parts():
@@ -56,10 +57,12 @@ class OptimizerTestCase(unittest.TestCase):
 
     def test_sell_in_two_parts(self):
         trans = scenario_sell_in_two_parts()
-        report = optimize_transaction_pairing(trans, self.STRATEGIES)
+        result = pair_transactions(trans, self.STRATEGIES)
+        report = result.sale_records()
 
         self.assertEqual(2, len(report))
-        self.assertEqual(0, trans[0].remaining_count)
+        self.assertEqual(0, result.lots.remaining_count(trans[0]))
+        self.assertEqual(10, trans[0].count)  # The trade record itself is left alone.
 
         self.assertEqual(-2, report[0].sale_t.count)
         self.assertEqual(2, report[0].buys[0]._count_consumed)
@@ -115,11 +118,12 @@ class OptimizerTestCase(unittest.TestCase):
 
     def test_sell_multiple_buys(self):
         trans = scenario_sell_multiple_buys()
-        report = optimize_transaction_pairing(trans, self.STRATEGIES)
+        result = pair_transactions(trans, self.STRATEGIES)
+        report = result.sale_records()
 
         self.assertEqual(1, len(report))
         self.assertEqual(3, len(report[0].buys))
-        self.assertEqual(2, sum([buy.trans.remaining_count for buy in report[0].buys]))
+        self.assertEqual(2, sum([result.lots.remaining_count(buy.trans) for buy in report[0].buys]))
 
     def test_calculate_profit(self):
         transactions = [
@@ -144,7 +148,7 @@ class OptimizerTestCase(unittest.TestCase):
             create_t(-10, 500.0, day=15)
         ]
 
-        calculate_break_even_prices(transactions)
+        transactions = calculate_break_even_prices(transactions)
         report = optimize_transaction_pairing(transactions, {self.TAX_YEAR: 'fifo'})
         self.assertEqual(2, len(report))
 
@@ -190,7 +194,7 @@ class OptimizerTestCase(unittest.TestCase):
             create_t(3, price=150.0, day=2)   # 3 shares at $150 each
         ]
         
-        calculate_break_even_prices(transactions)
+        transactions = calculate_break_even_prices(transactions)
         
         # First transaction: 5 shares at $100, BEP = $100
         self.assertEqual(Decimal('100.0'), transactions[0].bep)
@@ -210,7 +214,7 @@ class OptimizerTestCase(unittest.TestCase):
             create_t(1, price=140.0, day=4)      # Buy 1 at $140
         ]
         
-        calculate_break_even_prices(transactions)
+        transactions = calculate_break_even_prices(transactions)
         
         # First transaction: 10 shares at $100, BEP = $100
         self.assertEqual(Decimal('100.0'), transactions[0].bep)
@@ -303,38 +307,6 @@ class PairingStrategiesTestCase(unittest.TestCase):
     # Test that the profit calculation correctly includes/excludes buy-sell pairs based on close_time.
     # Test the situation when a sale swings from a long directly to short position and vice versa.
 
-def make_tx(
-    ts: str | datetime,
-    qty: int,
-    *,
-    price: decimal = 10.0,
-    product: str = "TEST",
-    isin: str = "TEST123",
-    currency: str = "USD",
-) -> Transaction:
-    """
-    Build a Transaction in one line.
-
-    Parameters
-    ----------
-    ts   : ISO-date string or datetime
-    qty  : positive (BUY) or negative (SELL) share count
-    """
-    if isinstance(ts, str):
-        ts = datetime.fromisoformat(ts)
-
-    return Transaction(
-        time=ts,
-        product_name=product,
-        isin=isin,
-        count=qty,
-        share_price=price,
-        currency=currency,
-        fee=0,
-        fee_currency=currency,
-    )
-
-
 class OptimizerShortSellingTestCase(unittest.TestCase):
     """Extra short-selling coverage for the optimiser."""
 
@@ -351,13 +323,14 @@ class OptimizerShortSellingTestCase(unittest.TestCase):
         short_open = make_tx("2024-01-02", -100, price=100.0)
         cover_buy  = make_tx("2024-01-05",  100, price=150.0)
 
-        records = optimize_transaction_pairing([short_open, cover_buy], self.STRATEGIES)
+        result = pair_transactions([short_open, cover_buy], self.STRATEGIES)
+        records = result.sale_records()
         self.assertEqual(len(records), 1)
 
         short_record = records[0]
         self.assertIs(short_record.sale_t, short_open)
         self.assertEqual(sum(br._count_consumed for br in short_record.buys), 100)
-        self.assertEqual(cover_buy.remaining_count, 0)
+        self.assertEqual(result.lots.remaining_count(cover_buy), 0)
 
         calculate_tax(records, self.TAX_YEAR)
         income, cost, fees = calculate_totals(records, self.TAX_YEAR)
@@ -486,5 +459,58 @@ class OptimizerShortSellingTestCase(unittest.TestCase):
         self.assertEqual(sr2.profit_tc, expected_profit_sr2_tc, f"Profit (TC) for second sale (open short) was {sr2.profit_tc}, expected {expected_profit_sr2_tc}")
 
 
+
+class TimeTestStrategiesTestCase(unittest.TestCase):
+    TAX_YEAR = 2021
+
+    def scenario(self):
+        return [
+            make_tx("2017-06-01", 4, price=150.0),   # aged, at a loss
+            make_tx("2017-09-01", 4, price=50.0),    # aged, gain
+            make_tx("2018-01-01", 4, price=60.0),    # aged, gain
+            make_tx("2019-01-01", 4, price=190.0),   # young
+            make_tx("2020-06-01", 4, price=110.0),   # young
+            make_tx("2021-01-10", -10, price=100.0),
+        ]
+
+    def pairs(self, strategy: str):
+        result = pair_transactions(self.scenario(), {self.TAX_YEAR: strategy}, enable_ttest=True)
+        return [(result.pair_buy[i], result.pair_count[i]) for i in range(len(result.pair_buy))]
+
+    def test_age_partitioned_index(self):
+        txs = self.scenario()
+        index = AgePartitionedLotIndex(txs)
+        lots = LotOverlay(txs).lots
+        for lot in lots[:5]:
+            index.add(lot)
+
+        partition = index.candidates(make_tx("2020-12-31", -1))
+        self.assertEqual([lots[0], lots[1]], partition.aged)  # 2018-01-01 is 1095 days old, not enough.
+        self.assertEqual(lots[2:5], partition.young)
+        lots[1].consume_shares(4)
+        partition = index.candidates(make_tx("2021-01-01", -1))
+        self.assertEqual([lots[0], lots[2]], partition.aged)
+        self.assertEqual(lots[3:5], partition.young)
+        self.assertEqual(partition, LotPartition.of(make_tx("2021-01-01", -1), lots))
+
+    def test_ttest_first(self):
+        self.assertEqual([(0, 4), (1, 4), (2, 2)], self.pairs('ttest_first'))
+
+        lots = LotOverlay(self.scenario()[:5]).lots  # A one-off call with a plain lot list.
+        buys = find_buys(make_tx("2020-06-02", -6), lots, {2020: 'ttest_first'})
+        self.assertEqual([(lots[0].transaction, 4), (lots[4].transaction, 2)],
+                         [(br.buy_t, br._count_consumed) for br in buys])
+
+    def test_ttest_max_cost(self):
+        # Aged gains first (cheapest first), then young lots by max_cost; the aged loss is left open.
+        self.assertEqual([(1, 4), (2, 4), (3, 2)], self.pairs('ttest_max_cost'))
+        self.assertEqual([(3, 4), (0, 4), (4, 2)], self.pairs('max_cost'))
+
+        report = pair_transactions(self.scenario(), {self.TAX_YEAR: 'ttest_max_cost'},
+                                   enable_ttest=True).sale_records()
+        calculate_tax(report, self.TAX_YEAR, enable_ttest=True)
+        self.assertEqual(8, report[0].untaxed_count)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+from decimal import Decimal
+
+import numpy as np
+
+from optimizer import pair_transactions, pair_product
+from tests.helpers import make_tx
+from tests.test_optimizer import scenario_sell_multiple_buys, scenario_time_test
+
+
+class PairingResultTestCase(unittest.TestCase):
+    TAX_YEAR = 2021
+
+    def test_columns(self):
+        trans = scenario_sell_multiple_buys()
+        result = pair_transactions(trans, {self.TAX_YEAR: 'fifo'})
+
+        self.assertEqual([3], list(result.sale_trans))
+        self.assertEqual([0, 1, 2], list(result.pair_buy))
+        self.assertEqual([5, 4, 1], list(result.pair_count))
+        self.assertEqual([1, 1, 1], list(result.pair_fee_consumed))
+
+        records = result.sale_records()
+        self.assertIs(records, result.sale_records())
+        self.assertIs(trans[3], records[0].sale_t)
+        self.assertEqual([5, 4, 1], [br._count_consumed for br in records[0].buys])
+
+    def test_zero_copy_frame(self):
+        result = pair_transactions(scenario_sell_multiple_buys(), {self.TAX_YEAR: 'fifo'})
+        df = result.to_frame()
+
+        self.assertEqual([5, 4, 1], df["Quantity"].tolist())
+        self.assertEqual([3, 3, 3], df["Sale"].tolist())
+        self.assertTrue(np.shares_memory(df["Quantity"].to_numpy(), np.frombuffer(result.pair_count, np.int64)))
+
+    def test_pairings_frame(self):
+        result = pair_product(scenario_time_test(), self.TAX_YEAR, {self.TAX_YEAR: 'fifo'}, enable_ttest=True)
+        df = result.pairings_frame("ISIN")
+
+        self.assertEqual(["close", "open", "open"], df["Side"].tolist())
+        self.assertEqual([-8, 5, 3], df["Quantity"].tolist())
+        self.assertEqual(["--", "T", ""], df["TimeTestPassed"].tolist())
+        self.assertEqual(["", Decimal(100), Decimal(80)], df["ProfitPerShare (ignores FX!)"].tolist())
+        self.assertEqual(["", "", ""], df["CloseTime"].tolist())
+        self.assertEqual(1, df["PairID"].nunique())
+
+    def test_short_cover_rows(self):
+        trans = [
+            make_tx("2024-01-02", -10, price=100.0),
+            make_tx("2024-01-05", 4, price=90.0),
+            make_tx("2024-01-03", 5, price=80.0),
+            make_tx("2024-02-01", -2, price=120.0),
+            make_tx("2024-02-10", 6, price=95.0),
+        ]
+        result = pair_transactions(trans, {2024: 'fifo'})
+        df = result.pairings_frame("Symbol")
+
+        # The first short is fully covered only after the second one was opened, its rows still stay together.
+        self.assertEqual(["close", "open", "open", "open", "close", "open"], df["Side"].tolist())
+        self.assertEqual([-10, 5, 4, 1, -2, 2], df["Quantity"].tolist())
+        self.assertEqual([r.close_time for r in result.sale_records()], [df["CloseTime"][0], df["CloseTime"][4]])
+
+
+if __name__ == '__main__':
+    unittest.main()
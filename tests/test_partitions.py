@@ -0,0 +1,62 @@
+import contextlib
+import io
+import tempfile
+import unittest
+from pathlib import Path
+
+from pandas.testing import assert_frame_equal
+
+from import_deg import import_transactions, iter_transactions
+from import_ibkr import import_ibkr_stock_transactions, iter_ibkr_transactions, ASSET_STOCKS
+from main import get_unique_product_ids
+from partitions import PartitionStore
+
+TEST_DATA = Path(__file__).parent / "test_data"
+DEGIRO_FILE = str(TEST_DATA / "Transactions-deg-en-2021.csv")
+IBKR_FILE = TEST_DATA / "U74_2022_test.csv"
+
+
+class PartitionStoreTestCase(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.store = PartitionStore(tmp.name, id_col="ISIN")
+
+    def assert_same_rows(self, expected, df, sort_by):
+        assert_frame_equal(expected.sort_values(sort_by).reset_index(drop=True),
+                           df.sort_values(sort_by).reset_index(drop=True),
+                           check_categorical=False, check_dtype=False)
+
+    def test_degiro_chunks(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            df = import_transactions(DEGIRO_FILE)
+            # The same statement twice: its trades are loaded once.
+            for name in ["a.csv", "b.csv"]:
+                source = self.store.add_source(name)
+                for chunk in iter_transactions(DEGIRO_FILE, 9):
+                    self.store.add(chunk, source)
+
+        self.assertEqual(2 * len(df), self.store.rows)
+        self.assertEqual(list(get_unique_product_ids(df, 2021, id_col="ISIN", date_col="DateTime",
+                                                     product_col="Product")), self.store.products(2021))
+        for pid in df["ISIN"].unique():
+            with contextlib.redirect_stdout(io.StringIO()):
+                loaded = self.store.load(pid)
+            self.assertEqual("category", loaded["ISIN"].dtype.name)
+            self.assert_same_rows(df[df["ISIN"] == pid], loaded, ["DateTime", "Order ID", "Quantity"])
+
+    def test_ibkr_chunks(self):
+        df = import_ibkr_stock_transactions([IBKR_FILE])
+        chunks = list(iter_ibkr_transactions(IBKR_FILE, ASSET_STOCKS, 50))
+        self.assertEqual([50] * 5 + [28], [len(chunk) for chunk in chunks])
+
+        self.store.id_col = "Symbol"
+        source = self.store.add_source(IBKR_FILE.name)
+        for chunk in chunks:
+            self.store.add(chunk, source)
+        self.assertEqual(sorted(df["Symbol"].unique()), self.store.products(2022, since_year=2000))
+        self.assert_same_rows(df[df["Symbol"] == "MELI"], self.store.load("MELI"), ["Date/Time", "Quantity"])
+
+
+if __name__ == '__main__':
+    unittest.main()
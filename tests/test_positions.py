@@ -0,0 +1,55 @@
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+from corporate_action import load_stock_splits
+from positions import positions_as_of, holdings_timeline
+
+REPO_ROOT = Path(__file__).parent.parent
+SPLITS = load_stock_splits(str(REPO_ROOT / "config" / "corporate_actions.csv"))
+
+
+def trades(*rows) -> pd.DataFrame:
+    symbols, times, quantities = zip(*rows)
+    return pd.DataFrame({"Symbol": symbols, "Date/Time": pd.to_datetime(times), "Quantity": quantities})
+
+
+class PositionsTestCase(unittest.TestCase):
+    def setUp(self):
+        # TSLA splits 5:1 reported 2020-08-31 and 3:1 reported 2022-08-25.
+        self.df = trades(("TSLA", "2020-01-05 10:00", 2.0), ("TSLA", "2022-08-24 15:00", 1.0),
+                         ("TSLA", "2022-09-01 10:00", -15.0), ("AAPL", "2021-01-04 10:00", 3.0),
+                         ("AAPL", "2021-02-01 10:00", -3.0))
+
+    def test_as_of(self):
+        def held(as_of, splits=SPLITS):
+            return positions_as_of(self.df, as_of, splits).set_index("Symbol")["Quantity"].to_dict()
+
+        self.assertEqual({"TSLA": 2}, held("2020-08-30"))
+        self.assertEqual({"TSLA": 10}, held("2020-08-31"))
+        self.assertEqual({"TSLA": 10, "AAPL": 3}, held("2021-01-31"))
+        self.assertEqual({"TSLA": 11}, held("2022-08-24"))
+        self.assertEqual({"TSLA": 33}, held("2022-08-25"))
+        self.assertEqual({"TSLA": 18}, held("2022-12-31"))
+        self.assertEqual({"TSLA": -12}, held("2022-12-31", None))  # Unadjusted.
+
+    def test_timeline(self):
+        monthly = holdings_timeline(self.df, SPLITS, "M", start="2022-07", end="2022-10")
+        self.assertEqual([10, 33, 18, 18], list(monthly["TSLA"]))
+        self.assertEqual([0, 0, 0, 0], list(monthly["AAPL"]))
+
+        daily = holdings_timeline(self.df, SPLITS, "D", start="2022-08-23", end="2022-08-26")
+        self.assertEqual([pd.Timestamp(d).date() for d in ("2022-08-23", "2022-08-24", "2022-08-25", "2022-08-26")],
+                         list(daily.index))
+        self.assertEqual([10, 11, 33, 33], list(daily["TSLA"]))
+
+    def test_timeline_agrees_with_as_of(self):
+        monthly = holdings_timeline(self.df, SPLITS, "M")
+        for day, row in monthly.iterrows():
+            held = positions_as_of(self.df, day, SPLITS).set_index("Symbol")["Quantity"]
+            self.assertEqual(row[row != 0].to_dict(), held.to_dict(), day)
+
+
+if __name__ == '__main__':
+    unittest.main()
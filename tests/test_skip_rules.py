@@ -0,0 +1,58 @@
+import contextlib
+import io
+import unittest
+from pathlib import Path
+
+from import_deg import import_transactions
+from import_ibkr import import_ibkr_stock_transactions
+from skip_rules import SkipRule, load_skip_rules, apply_skip_rules
+
+TEST_DATA = Path(__file__).parent / "test_data"
+RULES = load_skip_rules(TEST_DATA.parent.parent / "config" / "skip_rules.json")
+
+
+class SkipRulesTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with contextlib.redirect_stdout(io.StringIO()):
+            cls.deg = import_transactions(str(TEST_DATA / "Transactions-deg-en-2021.csv")).reset_index(drop=True)
+            cls.ibkr = import_ibkr_stock_transactions([TEST_DATA / "U74_2022_test.csv"])
+
+    def apply(self, df, rules=RULES):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            result = apply_skip_rules(df, rules)
+        return result, out.getvalue().splitlines()
+
+    def test_degiro_special_cases(self):
+        df = self.deg.astype({"Product": object, "ISIN": object})
+        rows_2021 = df.index[df["DateTime"].dt.year == 2021][:3]
+        row_2022 = df.index[df["DateTime"].dt.year == 2022][0]
+        df.loc[[*rows_2021, row_2022], "Product"] = "WEJO GROUP LTD"
+        df.loc[[*rows_2021[:2], row_2022], "Order ID"] = float("nan")  # The third one has an Order ID.
+        df.loc[df.index[-1], "ISIN"] = "CA88035N1033"
+
+        result, report = self.apply(df)
+        self.assertEqual(sorted(set(df.index) - {*rows_2021[:2], df.index[-1]}), list(result.index))
+        self.assertEqual(["Skipping 2 transaction(s) by rule: " + RULES[0].name,
+                          "Skipping 1 transaction(s) by rule: TENET FINTECH"], report)
+
+    def test_clean_imports_unchanged(self):
+        self.assertIs(self.deg, self.apply(self.deg)[0])
+        # IBKR has WEJO trades, but no Order ID column to be missing.
+        self.assertIs(self.ibkr, self.apply(self.ibkr)[0])
+
+    def test_ibkr_rule(self):
+        rule = SkipRule.from_dict({"name": "WEJO 2022", "ids": ["WEJO"], "years": [2022]})
+        result, report = self.apply(self.ibkr, [rule])
+        self.assertEqual(len(self.ibkr) - 3, len(result))
+        self.assertFalse((result["Symbol"] == "WEJO").any())
+        self.assertEqual(["Skipping 3 transaction(s) by rule: WEJO 2022"], report)
+
+    def test_invalid_rules(self):
+        self.assertRaises(ValueError, SkipRule.from_dict, {"name": "everything"})
+        self.assertRaises(ValueError, SkipRule.from_dict, {"name": "typo", "isin": ["X"]})
+
+
+if __name__ == '__main__':
+    unittest.main()
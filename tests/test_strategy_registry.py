@@ -0,0 +1,109 @@
+import unittest
+from decimal import Decimal
+from typing import List
+
+from optimizer import optimize_transaction_pairing, add_buy_record
+from strategy_registry import register_strategy, register_lot_index, compile_strategies, list_strategies, \
+    get_strategy, FindBuys
+from tests.test_transaction import create_t
+from transaction import Transaction, BuyRecord
+
+
+class CheapestFirstIndex:
+    """Open lots ordered by price, used to test custom lot-index requirements."""
+    def __init__(self, trans: List[Transaction]):
+        self._lots: List[Transaction] = []
+
+    def add(self, buy_t: Transaction) -> None:
+        self._lots.append(buy_t)
+
+    def candidates(self, sale_t: Transaction) -> List[Transaction]:
+        return sorted((t for t in self._lots if t.remaining_count > 0 and t.time < sale_t.time),
+                      key=lambda t: t.share_price)
+
+
+def find_buys_cheapest(sale_t: Transaction, lots: List[Transaction]) -> List[BuyRecord]:
+    remaining_sold_count = -sale_t.count
+    buy_records = []
+    for buy_t in lots:
+        remaining_sold_count = add_buy_record(buy_records, buy_t, remaining_sold_count)
+        if remaining_sold_count == 0:
+            break
+    return buy_records
+
+
+register_lot_index("test_cheapest", CheapestFirstIndex)
+register_strategy("test_cheapest", find_buys_cheapest, lot_index="test_cheapest")
+
+planned_years = []
+
+
+def plan_lifo_year(year: int, trans: List[Transaction], options) -> FindBuys:
+    planned_years.append((year, sum(t.is_sale for t in trans)))
+    return lambda sale_t, lots: find_buys_cheapest(sale_t, lots[::-1])
+
+
+register_strategy("test_planned_lifo", find_buys_cheapest, plan_year=plan_lifo_year, plan_index="transactions")
+
+
+class StrategyRegistryTestCase(unittest.TestCase):
+    def test_builtins_registered(self):
+        self.assertEqual(["fifo", "lifo", "max_cost", "min_cost", "micol"], list_strategies()[:5])
+        self.assertEqual("open_lots", get_strategy("fifo").lot_index)
+
+    def test_unknown_strategy(self):
+        with self.assertRaises(ValueError):
+            compile_strategies({2021: "no_such_strategy"})
+
+    def test_duplicate_registration(self):
+        with self.assertRaises(ValueError):
+            register_strategy("fifo", find_buys_cheapest)
+
+    def test_unknown_lot_index(self):
+        with self.assertRaises(ValueError):
+            register_strategy("test_bad_index", find_buys_cheapest, lot_index="no_such_index")
+
+    def test_unknown_plan_index(self):
+        with self.assertRaises(ValueError):
+            register_strategy("test_bad_plan_index", find_buys_cheapest, plan_year=plan_lifo_year,
+                              plan_index="no_such_index")
+
+    def test_plan_index(self):
+        self.assertEqual(["open_lots", "transactions"], compile_strategies({2021: "optimal"}).lot_indexes)
+        trans = [
+            create_t(5, price=120.0, day=1),
+            create_t(5, price=100.0, day=2),
+            create_t(-2, price=150.0, day=10),
+            create_t(-4, price=150.0, day=11),
+        ]
+        del planned_years[:]
+        report = optimize_transaction_pairing(trans, {2021: "test_planned_lifo"})
+
+        # Planned once with every transaction, sales included; pairing still gets the open lots only.
+        self.assertEqual([(2021, 2)], planned_years)
+        self.assertEqual([[(Decimal(100), 2)], [(Decimal(100), 3), (Decimal(120), 1)]],
+                         [[(br.buy_t.share_price, br._count_consumed) for br in r.buys] for r in report])
+
+    def test_dispatch_table(self):
+        table = compile_strategies({2020: "lifo", 2021: "max_cost"})
+        self.assertEqual("fifo", table.for_year(2019).name)
+        self.assertEqual("lifo", table.for_year(2020).name)
+        self.assertEqual("max_cost", table.for_year(2021).name)
+        with self.assertRaises(ValueError):
+            table.for_year(2022)
+
+    def test_custom_strategy_with_own_lot_index(self):
+        trans = [
+            create_t(5, price=120.0, day=1),
+            create_t(5, price=100.0, day=2),
+            create_t(5, price=110.0, day=3),
+            create_t(-7, price=150.0, day=10),
+        ]
+        report = optimize_transaction_pairing(trans, {2021: "test_cheapest"})
+
+        self.assertEqual([Decimal(100), Decimal(110)], [br.buy_t.share_price for br in report[0].buys])
+        self.assertEqual([5, 2], [br._count_consumed for br in report[0].buys])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+from decimal import Decimal
+
+from optimizer import optimize_transaction_pairing, MICOL_THRESHOLDS, CostThresholds
+from strategy_registry import get_strategy, is_strategy
+from sweep import parse_grid, threshold_grid, sweep, sensitivity, FAMILY_DEFAULTS
+from tests.helpers import scenario_three_years
+
+
+class SweepTestCase(unittest.TestCase):
+    STRATEGIES = {2022: 'fifo', 2023: 'max_cost', 2024: 'fifo'}
+
+    def test_family_strategies(self):
+        self.assertEqual(MICOL_THRESHOLDS, CostThresholds.parse(str(MICOL_THRESHOLDS)))
+        self.assertEqual("micol:0.97_0.75_0.085", get_strategy("micol:0.97_0.75_0.085").name)
+        self.assertFalse(is_strategy("micol:0.97"))
+        self.assertFalse(is_strategy("no_such_family:1_2_3"))
+
+        for family in ("max_cost", "min_cost", "micol"):
+            with self.subTest(family=family):
+                default = optimize_transaction_pairing(scenario_three_years(), {2023: family})
+                thresholds = str(FAMILY_DEFAULTS[family])
+                named = optimize_transaction_pairing(scenario_three_years(), {2023: f"{family}:{thresholds}"})
+                self.assertEqual([[(br.buy_t.time, br._count_consumed) for br in r.buys] for r in default],
+                                 [[(br.buy_t.time, br._count_consumed) for br in r.buys] for r in named])
+
+    def test_grid(self):
+        grid = parse_grid(["far=0.05,0.085", "near_days=10,20,30"])
+        self.assertEqual([10, 20, 30], grid["near_days"])
+        points = threshold_grid(MICOL_THRESHOLDS, grid)
+        self.assertEqual(6, len(points))
+        self.assertEqual({Decimal('0.75')}, {p.mid for p in points})
+        with self.assertRaises(ValueError):
+            parse_grid(["no_such_parameter=1"])
+
+    def test_sweep(self):
+        grid = {"near": [Decimal('0.9'), Decimal('1.5')], "far": [Decimal('0.5'), Decimal('1.5')]}
+        points, failed = sweep({"A": scenario_three_years()}, 2023, self.STRATEGIES, "max_cost", grid)
+
+        self.assertEqual({}, failed)
+        self.assertEqual(4, len(points))
+        self.assertEqual(sorted(p.totals.taxable for p in points), [p.totals.taxable for p in points])
+        rows = sensitivity(points)
+        self.assertEqual(["near", "near", "far", "far"], [r[0] for r in rows])
+        for _, _, low, mean, high in rows:
+            self.assertLessEqual(low, mean)
+            self.assertLessEqual(mean, high)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import os
+import unittest
+from typing import Callable, List
+
+from import_ibkr import import_ibkr_stock_transactions
+from optimizer import optimize_transaction_pairing, calculate_tax, calculate_totals, calculate_untaxed_totals
+from tax_batch import calculate_tax_batched, compute_tax, PairingTable
+from tests.test_optimizer import scenario_sell_in_two_parts, scenario_sell_multiple_buys, scenario_time_test, \
+    make_tx
+from transaction import Transaction, SaleRecord
+from transaction_ibkr import convert_to_transactions_ibkr
+
+
+def scenario_short_across_years():
+    return [
+        make_tx("2023-12-01", -10, price=100.0),
+        make_tx("2024-01-05", 4, price=90.0),
+        make_tx("2024-02-01", 20, price=80.0),
+        make_tx("2024-03-01", -12, price=120.0),
+    ]
+
+
+class BatchedTaxTestCase(unittest.TestCase):
+    def assert_same_as_object_path(self, make_trans: Callable[[], List[Transaction]], tax_year: int,
+                                   strategies=None, enable_ttest: bool = False) -> List[SaleRecord]:
+        strategies = strategies or {tax_year: 'fifo'}
+        expected = optimize_transaction_pairing(make_trans(), strategies)
+        calculate_tax(expected, tax_year, enable_ttest=enable_ttest)
+        actual = optimize_transaction_pairing(make_trans(), strategies)
+        result = calculate_tax_batched(actual, tax_year, enable_ttest=enable_ttest)
+
+        self.assertEqual(calculate_totals(expected, tax_year), calculate_totals(actual, tax_year))
+        self.assertEqual(calculate_totals(expected, tax_year), result.totals())
+        self.assertEqual(calculate_untaxed_totals(expected, tax_year), calculate_untaxed_totals(actual, tax_year))
+        for exp, act in zip(expected, actual):
+            self.assertEqual((exp.income_tc, exp.cost_tc, exp.fees_tc, exp.fx_rate),
+                             (act.income_tc, act.cost_tc, act.fees_tc, act.fx_rate))
+            self.assertEqual([(br.cost_tc, br.fees_tc, br.time_test_passed) for br in exp.buys],
+                             [(br.cost_tc, br.fees_tc, br.time_test_passed) for br in act.buys])
+        return actual
+
+    def test_simple_scenarios(self):
+        for scenario in (scenario_sell_in_two_parts, scenario_sell_multiple_buys):
+            self.assert_same_as_object_path(scenario, 2021)
+
+    def test_time_test(self):
+        for enable_ttest in (False, True):
+            self.assert_same_as_object_path(scenario_time_test, 2021, enable_ttest=enable_ttest)
+
+    def test_short_covers_across_years(self):
+        for tax_year in (2023, 2024):
+            self.assert_same_as_object_path(scenario_short_across_years, tax_year, {2023: 'fifo', 2024: 'fifo'})
+
+    def test_empty_table(self):
+        result = compute_tax(PairingTable.from_sale_records([]), 2021)
+        self.assertEqual(0, len(result.income_tc))
+
+    def test_ibkr_statement(self):
+        if not os.path.exists('test_data'):
+            os.chdir(os.path.dirname(__file__))
+        df = import_ibkr_stock_transactions(["test_data/U74_2022_test.csv"])
+        for symbol in sorted(df[df['Date/Time'].dt.year == 2022]['Symbol'].unique()):
+            with self.subTest(symbol=symbol):
+                self.assert_same_as_object_path(
+                    lambda: convert_to_transactions_ibkr(df, symbol, 2022, options=False), 2022,
+                    {2022: 'max_cost'}, enable_ttest=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+from datetime import datetime
+from decimal import Decimal
+
+from currency import unified_fx_rate
+from optimizer import pair_transactions
+from tests.helpers import make_tx
+from time_test import open_lots_frame, eligibility_calendar
+from transaction import SaleRecord, BuyRecord
+
+
+class TimeTestCalendarTestCase(unittest.TestCase):
+    STRATEGIES = {2021: 'fifo', 2022: 'fifo'}
+
+    def setUp(self):
+        self.txs = [
+            make_tx("2021-01-10", 10, price=100.0),
+            make_tx("2021-03-10", 10, price=130.0),
+            make_tx("2022-06-10", -12, price=120.0),
+            make_tx("2022-07-10", 4, price=90.0),
+        ]
+
+    def test_open_lots(self):
+        lots = open_lots_frame(pair_transactions(self.txs, self.STRATEGIES), "ISIN")
+        self.assertEqual([8, 4], list(lots["Remaining"]))
+        self.assertEqual(8 * Decimal(130) * unified_fx_rate(2021, 'USD'), lots["CostCZK"][0])
+        self.assertEqual(datetime(2024, 3, 10), lots["TaxFreeFrom"][0])  # 2024 is a leap year.
+
+        # A sale at TaxFreeFrom is the first to pass the time test of the tax calculation.
+        buy = self.txs[1]
+        for sale_time, passed in ((datetime(2024, 3, 9, 23, 59), False), (datetime(2024, 3, 10), True)):
+            sale = SaleRecord(make_tx(sale_time.isoformat(), -1, price=150.0), [BuyRecord(buy, 1, False)])
+            sale.calculate_income_and_cost(2024, enable_ttest=True)
+            self.assertEqual(passed, sale.buys[0].time_test_passed, sale_time)
+
+    def test_calendar(self):
+        lots = open_lots_frame(pair_transactions(self.txs, self.STRATEGIES), "ISIN")
+        other = open_lots_frame(pair_transactions([make_tx("2021-03-20", 5, price=110.0, product="OTHER",
+                                                           isin="OTHER1")], self.STRATEGIES), "ISIN")
+        calendar = eligibility_calendar([lots, other, lots.iloc[:0]])
+        self.assertEqual(["2024-03", "2025-07"], [str(m) for m in calendar["Month"]])
+        self.assertEqual([2, 1], list(calendar["Lots"]))
+        self.assertEqual([2, 1], list(calendar["Products"]))
+        self.assertEqual([13, 4], list(calendar["Quantity"]))
+        self.assertEqual(sum(lots["CostCZK"]) + sum(other["CostCZK"]), calendar["CumulativeCostCZK"].iloc[-1])
+        self.assertTrue(eligibility_calendar([]).empty)
+
+
+if __name__ == '__main__':
+    unittest.main()
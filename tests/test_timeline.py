@@ -0,0 +1,40 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from timeline import MAX_RUNS, SPLIT, TRADE, ordered_runs, product_timeline, time_order
+
+
+def days(*values: int) -> np.ndarray:
+    return (np.datetime64("2021-01-01") + np.array(values, dtype="timedelta64[D]")).astype("datetime64[ns]")
+
+
+class TimelineTestCase(unittest.TestCase):
+    def test_runs(self):
+        # A newest-first statement with two trades on day 3, then an oldest-first one.
+        runs = ordered_runs(days(5, 3, 3, 1, 0, 4, 4, 6))
+        self.assertEqual([[4, 3, 1, 2, 0], [5, 6, 7]], [r.tolist() for r in runs])
+        self.assertEqual([], ordered_runs(days()))
+
+    def test_matches_stable_sort(self):
+        rng = np.random.default_rng(5)
+        for trial in range(200):
+            with self.subTest(trial=trial):
+                parts = [np.sort(rng.integers(0, 10, rng.integers(0, 12))) for _ in range(rng.integers(1, 5))]
+                times = days(*np.concatenate([p[::-1] if rng.random() < 0.5 else p for p in parts]))
+                expected = np.argsort(times, kind="stable")
+                np.testing.assert_array_equal(expected, time_order(times))
+                self.assertEqual(list(expected), [e.index for e in product_timeline(times)])
+        shuffled = days(*rng.permutation(np.arange(4 * MAX_RUNS) % 7))
+        np.testing.assert_array_equal(np.argsort(shuffled, kind="stable"), time_order(shuffled))
+
+    def test_splits_before_trades_of_their_day(self):
+        trades = pd.to_datetime(["2022-08-25 15:30", "2022-08-24 18:00", "2022-08-25 00:00"]).to_numpy()
+        events = list(product_timeline(trades, pd.to_datetime(["2022-08-25"]).to_numpy()))
+        self.assertEqual([(TRADE, 1), (SPLIT, 0), (TRADE, 2), (TRADE, 0)], [(e.kind, e.index) for e in events])
+        self.assertEqual(np.datetime64("2022-08-25"), events[1].time)
+
+
+if __name__ == '__main__':
+    unittest.main()
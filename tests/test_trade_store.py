@@ -0,0 +1,60 @@
+import contextlib
+import io
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+from pandas.testing import assert_frame_equal
+
+from import_deg import import_transactions
+from import_ibkr import import_ibkr_stock_transactions
+from main import get_unique_product_ids
+from trade_store import TradeStore
+
+TEST_DATA = Path(__file__).parent / "test_data"
+
+
+class TradeStoreTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with contextlib.redirect_stdout(io.StringIO()):
+            cls.deg = import_transactions(str(TEST_DATA / "Transactions-deg-en-2021.csv"))
+            cls.ibkr = import_ibkr_stock_transactions([TEST_DATA / "U74_2022_test.csv"])
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.store = TradeStore(tmp.name)
+        self.store.write("deg", self.deg)
+        self.store.write("ibkr", self.ibkr)
+
+    def assert_same_rows(self, expected, df):
+        assert_frame_equal(expected.reset_index(drop=True), df, check_categorical=False, check_dtype=False)
+
+    def test_accounts(self):
+        self.assertEqual(["deg", "ibkr"], self.store.accounts())
+        self.store.write("deg", self.deg.iloc[:10])
+        self.assertEqual(10, self.store.open("deg").rows)
+        with self.assertRaisesRegex(ValueError, "stored accounts"):
+            self.store.open("cz")
+
+    def test_degiro_products(self):
+        account = self.store.open("deg")
+        self.assertIsInstance(account._arrays["Quantity"], np.memmap)
+        self.assertEqual(list(get_unique_product_ids(self.deg, 2021, id_col="ISIN", date_col="DateTime",
+                                                     product_col="Product")), account.products(2021))
+        for pid in self.deg["ISIN"].unique():
+            df = account.load(pid)
+            self.assertEqual("category", df["ISIN"].dtype.name)
+            self.assert_same_rows(self.deg[self.deg["ISIN"] == pid].sort_values("DateTime", kind="stable"), df)
+
+    def test_ibkr_products(self):
+        account = self.store.open("ibkr")
+        self.assertEqual("Symbol", account.id_col)
+        self.assertEqual(len(self.ibkr["Symbol"].unique()), len(account))
+        self.assert_same_rows(self.ibkr[self.ibkr["Symbol"] == "MELI"], account.load("MELI"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,7 +3,7 @@ from decimal import Decimal
 import unittest
 from datetime import datetime
 
-from transaction import Transaction, BuyRecord, SaleRecord
+from transaction import Transaction, BuyRecord, SaleRecord, transactions_from_records
 
 TAX_YEAR = 2021
 
@@ -54,6 +54,19 @@ class TransactionTestCase(unittest.TestCase):
         self.assertEqual(Decimal('21720.0'), sale_record.income_tc)
 
 
-
-
-
+class RecordsTestCase(unittest.TestCase):
+    def test_transactions_from_records(self):
+        records = [
+            {"time": "2021-03-05", "product_name": "Foo", "count": "-3", "share_price": "120",
+             "currency": "USD", "fee": "0.5", "fee_currency": "EUR"},
+            {"time": datetime(2021, 3, 1), "product_name": "Foo", "count": 10, "share_price": 100.0,
+             "currency": "USD"},
+        ]
+        buy_t, sale_t = transactions_from_records(records)
+
+        self.assertEqual(datetime(2021, 3, 1), buy_t.time)
+        self.assertEqual("Foo", buy_t.isin)
+        self.assertEqual(Decimal(0), buy_t.fee)
+        self.assertEqual("USD", buy_t.fee_currency)
+        self.assertEqual(-3, sale_t.count)
+        self.assertEqual(Decimal('0.5'), sale_t.fee)
@@ -0,0 +1,60 @@
+import contextlib
+import io
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+from import_deg import import_transactions
+from import_ibkr import import_ibkr_stock_transactions
+from main import build_transactions
+from validation import validate_trades
+
+TEST_DATA = Path(__file__).parent / "test_data"
+
+
+class ValidateTradesTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with contextlib.redirect_stdout(io.StringIO()):
+            cls.deg = import_transactions(str(TEST_DATA / "Transactions-deg-en-2021.csv")).reset_index(drop=True)
+            cls.ibkr = import_ibkr_stock_transactions([TEST_DATA / "U74_2022_test.csv"])
+
+    def test_clean_statements(self):
+        self.assertEqual(0, len(validate_trades(self.deg, 2022)))
+        self.assertEqual(0, len(validate_trades(self.ibkr, 2022).errors))
+
+    def test_all_problems_reported_at_once(self):
+        df = self.deg.astype({"Unnamed: 8": object, "Unnamed: 15": object})
+        df.loc[0, "Transaction and/or third"] = 1.5
+        df.loc[1, "Unnamed: 15"] = "USD"
+        df.loc[2, "Price"] = float("nan")
+        df.loc[3, "Quantity"] = 0
+        df.loc[4, "Unnamed: 8"] = "GBP"
+        df.loc[5, "DateTime"] = pd.NaT
+        report = validate_trades(df, 2022)
+        self.assertEqual(["negative fee", "unexpected fee currency", "missing price", "zero quantity",
+                          "no FX rate", "unparseable date"], list(report.errors["problem"]))
+        self.assertEqual(list(range(6)), list(report.errors["row"]))
+
+        invalid = report.product_errors()
+        self.assertEqual(set(df.loc[:5, "ISIN"]), set(invalid))
+        with self.assertRaisesRegex(ValueError, "negative fee"):
+            build_transactions(df, df.loc[0, "ISIN"], 2022, None, id_col="ISIN", options=False, invalid=invalid)
+
+    def test_rows_after_tax_year_ignored(self):
+        df = self.ibkr.astype({"Currency": object})
+        df.loc[0, "Currency"] = "GBP"
+        self.assertEqual(1, len(validate_trades(df, 2022).errors))
+        self.assertEqual(0, len(validate_trades(df, 2021).errors))
+
+    def test_ibkr_negative_fee_is_warning(self):
+        df = self.ibkr.copy()
+        df.loc[0, "Comm/Fee"] = 0.5
+        report = validate_trades(df, 2022)
+        self.assertEqual(0, len(report.errors))
+        self.assertEqual(["negative fee"], list(report.warnings["problem"]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from watch import StatementWatcher
+
+TEST_DATA = Path(__file__).parent / "test_data"
+
+
+class StatementWatcherTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+        with open(TEST_DATA / "Transactions-deg-en-2021.csv", encoding="utf8") as f:
+            self.lines = f.readlines()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name: str, rows: int) -> None:
+        path = self.dir / name
+        path.write_text("".join(self.lines[:rows + 1]), encoding="utf8")
+        os.utime(path, ns=(rows, rows))  # Distinct mtimes even within the filesystem's time resolution.
+
+    def test_only_new_rows(self):
+        watcher = StatementWatcher([self.dir], deg=True)
+        self.write("a.csv", 10)
+        self.assertEqual([self.dir / "a.csv"], watcher.poll())
+        self.assertEqual(10, len(watcher.ingest(watcher.poll())))
+        self.assertEqual([], watcher.poll())
+
+        self.write("a.csv", 15)  # Re-exported with more rows.
+        new_rows = watcher.ingest(watcher.poll())
+        self.assertEqual(5, len(new_rows))
+        self.assertEqual(15, len(watcher.df))
+
+        self.write("b.csv", 12)  # Overlaps the rows already loaded.
+        self.assertEqual(0, len(watcher.ingest(watcher.poll())))
+        self.assertEqual(15, len(watcher.df))
+
+    def test_identical_rows_in_one_file(self):
+        self.lines.insert(2, self.lines[1])
+        watcher = StatementWatcher([self.dir], deg=True)
+        self.write("a.csv", 3)
+        self.assertEqual(3, len(watcher.ingest(watcher.poll())))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+"""
+Time-test eligibility calendar of open lots.
+
+After pairing, every buy with shares left in the run's lot overlay is listed with its remaining quantity,
+its CZK cost basis (unified rate of the buy year) and the time from which selling it passes the 3-year
+time test, i.e. ``(sale - buy).days > TTEST_DAYS`` as in the tax calculation. The lots are gathered from
+the overlay's columns with numpy; ``eligibility_calendar`` aggregates them by month.
+"""
+from __future__ import annotations
+
+from typing import List
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from pairing_result import PairingResult
+from tax_batch import fx_rates, object_array
+from transaction import TTEST_DAYS
+
+LOT_COLUMNS = ["Product", "BuyTime", "Remaining", "SharePrice", "Currency", "CostCZK", "TaxFreeFrom"]
+
+
+def open_lots_frame(result: PairingResult, id_col: str) -> DataFrame:
+    """Open lots of a finished run, one row per buy with shares left."""
+    if result.lots is None:
+        raise ValueError("Pairing result has no lot state (truncated run)")
+    trans = result.trans
+    remaining = np.frombuffer(result.lots.remaining, dtype=np.int64)
+    rows = np.flatnonzero(remaining > 0)
+    if not len(rows):
+        return DataFrame(columns=[LOT_COLUMNS[0], id_col] + LOT_COLUMNS[1:])
+
+    lots = [trans[i] for i in rows]
+    buy_time = np.array([t.time for t in lots], dtype='datetime64[us]')
+    price = object_array([t.share_price for t in lots])
+    currency = np.array([t.currency for t in lots], dtype=str)
+    multiplier = object_array([t._multiplier for t in lots])
+    count = remaining[rows]
+
+    fx = fx_rates(buy_time.astype('datetime64[Y]').astype(np.int64) + 1970, currency)
+    return DataFrame({
+        "Product": [t.product_name for t in lots],
+        id_col: [(t.isin if id_col == "ISIN" else t.product_name) for t in lots],
+        "BuyTime": buy_time,
+        "Remaining": count,
+        "SharePrice": price,
+        "Currency": currency,
+        "CostCZK": count.astype(object) * price * fx * multiplier,
+        "TaxFreeFrom": buy_time + np.timedelta64(TTEST_DAYS + 1, 'D'),
+    })
+
+
+def eligibility_calendar(lot_frames: List[DataFrame]) -> DataFrame:
+    """Lots, shares and CZK cost basis becoming tax-free per month, with running totals."""
+    lot_frames = [f for f in lot_frames if not f.empty]
+    lots = pd.concat(lot_frames, ignore_index=True) if lot_frames else DataFrame(columns=LOT_COLUMNS)
+    month = pd.to_datetime(lots["TaxFreeFrom"]).dt.to_period("M")
+    calendar = lots.groupby(month).agg(
+        Lots=("Remaining", "size"),
+        Products=("Product", "nunique"),
+        Quantity=("Remaining", "sum"),
+        CostCZK=("CostCZK", "sum"),
+    )
+    calendar.index.name = "Month"
+    calendar["CumulativeCostCZK"] = calendar["CostCZK"].cumsum()
+    return calendar.reset_index()
@@ -0,0 +1,86 @@
+"""
+Time order of a product's trades and corporate actions by merging pre-sorted streams.
+
+The imported frames concatenate the statements in file order, and every statement is already sorted:
+Degiro exports newest first, IBKR sections oldest first. ``ordered_runs`` recovers these streams as the
+maximal runs of rising or falling times, reversing the falling ones; ``time_order`` heap-merges the runs
+into the order of a stable sort by time, and ``product_timeline`` merges the stock splits in as events.
+Inputs in no particular order fall back to a stable sort.
+"""
+from __future__ import annotations
+
+import heapq
+from typing import Iterable, Iterator, List, NamedTuple
+
+import numpy as np
+
+TRADE = "trade"
+SPLIT = "split"
+
+MAX_RUNS = 64  # More runs than this are sorted instead of merged.
+
+
+class Event(NamedTuple):
+    time: np.datetime64
+    kind: str    # TRADE or SPLIT
+    index: int   # Row of the trade, or position of the split
+
+
+def _time_keys(times) -> np.ndarray:
+    return np.asarray(times, dtype="datetime64[ns]").view(np.int64)
+
+
+def _rising(keys: np.ndarray, start: int, stop: int, direction: int) -> np.ndarray:
+    """Rows start:stop in time order; a falling run is reversed, keeping equal times in row order."""
+    if direction >= 0:
+        return np.arange(start, stop)
+    bounds = np.r_[start + np.flatnonzero(np.r_[True, keys[start + 1:stop] != keys[start:stop - 1]]), stop]
+    return np.concatenate([np.arange(b, e) for b, e in zip(bounds[-2::-1], bounds[:0:-1])])
+
+
+def ordered_runs(times) -> List[np.ndarray]:
+    """Row numbers of the maximal runs of rising or falling *times*, each in time order."""
+    keys = _time_keys(times)
+    runs, start, direction = [], 0, 0
+    for i, step in enumerate(np.sign(np.diff(keys)).tolist()):
+        if step == 0 or step == direction:
+            continue
+        if direction == 0:
+            direction = step
+            continue
+        runs.append(_rising(keys, start, i + 1, direction))
+        start, direction = i + 1, 0
+    if len(keys):
+        runs.append(_rising(keys, start, len(keys), direction))
+    return runs
+
+
+def _streams(keys: np.ndarray, runs: List[np.ndarray]) -> List[Iterable[tuple]]:
+    return [zip(keys[rows].tolist(), rows.tolist()) for rows in runs]
+
+
+def time_order(times) -> np.ndarray:
+    """Row numbers of *times* in the order of a stable sort, merged from their pre-sorted runs."""
+    keys = _time_keys(times)
+    runs = ordered_runs(keys)
+    if len(runs) <= 1:
+        return runs[0] if runs else np.arange(0)
+    if len(runs) > MAX_RUNS:
+        return np.argsort(keys, kind="stable")
+    # Runs are consecutive rows, so (time, row) breaks ties like a stable sort.
+    return np.fromiter((row for _, row in heapq.merge(*_streams(keys, runs))), dtype=np.intp, count=len(keys))
+
+
+def product_timeline(trade_times, split_times=()) -> Iterator[Event]:
+    """
+    The trades and the stock splits (*split_times* ascending) of one product in time order. A split comes
+    before the trades at its time, since it applies to the trades before its time.
+    """
+    keys = _time_keys(trade_times)
+    runs = ordered_runs(keys)
+    if len(runs) > MAX_RUNS:
+        runs = [np.argsort(keys, kind="stable")]
+    trades = [((key, 1, row) for key, row in stream) for stream in _streams(keys, runs)]
+    splits = ((key, 0, i) for i, key in enumerate(_time_keys(split_times).tolist()))
+    for key, rank, index in heapq.merge(splits, *trades):
+        yield Event(np.datetime64(key, "ns"), SPLIT if rank == 0 else TRADE, index)
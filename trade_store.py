@@ -0,0 +1,116 @@
+"""
+Columnar archive of imported trades, one directory per account.
+
+``TradeStore.write`` stores an account's imported frame (after validation-ready normalization by the
+importers) sorted by product and time: every column as a NumPy ``.npy`` file, text columns as int32 codes
+into a ``.categories.npy`` array of fixed-width strings, plus ``index.json`` with each product's row
+offsets, name and trade years. ``open`` maps the columns with ``np.load(mmap_mode='r')``, so
+``AccountStore.load`` reads only the slice of one product's rows. An ``AccountStore`` has the interface
+of ``partitions.PartitionStore`` and runs through the same product loop.
+"""
+from __future__ import annotations
+
+import json
+import shutil
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from import_utils import compact_frame, detect_columns
+
+INDEX_FILE = "index.json"
+VERSION = 1
+
+
+class AccountStore:
+    def __init__(self, directory: Path):
+        with (directory / INDEX_FILE).open(encoding="utf-8") as f:
+            index = json.load(f)
+        if index["version"] != VERSION:
+            raise ValueError(f"{directory}: unsupported store version {index['version']}")
+        self.directory = directory
+        self.id_col: str = index["id_col"]
+        self.rows: int = index["rows"]
+        self._columns: List[dict] = index["columns"]
+        self._products: Dict[str, dict] = index["products"]
+        self._arrays = {c["name"]: np.load(directory / c["file"], mmap_mode="r") for c in self._columns}
+        self._categories = {c["name"]: np.load(directory / c["categories"], mmap_mode="r")
+                            for c in self._columns if "categories" in c}
+
+    def __len__(self) -> int:
+        return len(self._products)
+
+    def products(self, tax_year: int, since_year: int = None) -> List[str]:
+        """Products traded from *since_year* (default: *tax_year*) to *tax_year*, sorted by name."""
+        years = range(since_year or tax_year, tax_year + 1)
+        selected = [pid for pid, p in self._products.items() if any(y in p["years"] for y in years)]
+        return sorted(selected, key=lambda pid: self._products[pid]["name"])
+
+    def load(self, pid: str) -> DataFrame:
+        """The rows of *pid*, read from the mapped columns by offset."""
+        start, stop = self._products[pid]["rows"]
+        data = {}
+        for column in self._columns:
+            values = self._arrays[column["name"]][start:stop]
+            if "categories" in column:
+                categories = self._categories[column["name"]]
+                values = np.where(values >= 0, categories[np.maximum(values, 0)].astype(object), None)
+            data[column["name"]] = values
+        df = DataFrame(data, copy=False)
+        return compact_frame(df, [c["name"] for c in self._columns if c["dtype"] == "category"])
+
+
+class TradeStore:
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+
+    def accounts(self) -> List[str]:
+        return sorted(p.parent.name for p in self.root.glob(f"*/{INDEX_FILE}"))
+
+    def open(self, account: str) -> AccountStore:
+        directory = self.root / account
+        if not (directory / INDEX_FILE).exists():
+            raise ValueError(f"No account {account!r} in {self.root}, stored accounts: {self.accounts()}")
+        return AccountStore(directory)
+
+    def write(self, account: str, df_trans: DataFrame) -> None:
+        """Store the imported trades of *account*, replacing those stored before."""
+        id_col, date_col, product_col = detect_columns(df_trans)
+        df = df_trans[df_trans[id_col].notna()].sort_values([id_col, date_col], kind="stable")
+        df = df.reset_index(drop=True)
+
+        tmp = self.root / f".{account}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        columns = []
+        for i, (name, values) in enumerate(df.items()):
+            column = {"name": name, "dtype": str(values.dtype), "file": f"{i:03d}.npy"}
+            if values.dtype == object or isinstance(values.dtype, pd.CategoricalDtype):
+                codes, categories = pd.factorize(values.astype(object))
+                column["categories"] = f"{i:03d}.categories.npy"
+                np.save(tmp / column["categories"], np.asarray(categories, dtype=str))
+                np.save(tmp / column["file"], codes.astype(np.int32))
+            else:
+                np.save(tmp / column["file"], values.to_numpy())
+            columns.append(column)
+
+        ids = df[id_col].astype(object).to_numpy()
+        bounds = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1], True]) if len(df) else np.array([0])
+        years = df[date_col].dt.year
+        products = {}
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            products[ids[start]] = {
+                "rows": [int(start), int(stop)],
+                "name": str(df[product_col].iat[start]),
+                "years": sorted(int(y) for y in years.iloc[start:stop].dropna().unique()),
+            }
+        index = {"version": VERSION, "id_col": id_col, "rows": len(df), "columns": columns, "products": products}
+        with (tmp / INDEX_FILE).open("w", encoding="utf-8") as f:
+            json.dump(index, f, indent=1)
+
+        target = self.root / account
+        shutil.rmtree(target, ignore_errors=True)
+        tmp.rename(target)
@@ -1,8 +1,9 @@
+import copy
 import decimal
 import math
 from decimal import Decimal
-from datetime import datetime
-from typing import List
+from datetime import datetime, timedelta
+from typing import Any, Iterable, List, Mapping
 
 from currency import unified_fx_rate, check_currency
 
@@ -10,21 +11,31 @@ IMPORT_PRECISION = Decimal('0.000001')  # Prices have up to 4 decimal digits, pl
 
 TSLA_SPLIT = datetime(2022, 8, 25)
 
+TTEST_DAYS = 3 * 365  # The time test passes when (sale - buy).days > TTEST_DAYS.
+
+
+def passes_time_test(buy_time: datetime, sale_time: datetime) -> bool:
+    return (sale_time - buy_time).days > TTEST_DAYS
+
+
+def time_test_cutoff(sale_time: datetime) -> datetime:
+    """Latest buy time that passes the time test when sold at *sale_time*."""
+    return sale_time - timedelta(days=TTEST_DAYS + 1)
+
 
 class Transaction:
+    """Immutable trade record; per-run lot state (remaining count, fee flag) is kept in ``lot_state``."""
     def __init__(self, time: datetime, product_name: str, isin: str, count: int, share_price: decimal, currency: str,
                  fee: decimal, fee_currency: str, option_contract: bool = False):
         self._time = time
         self._product_name = product_name
         self.isin = isin  # TODO: rename to product_id
         self._count = int(count)  # count is negative for sales
-        self._remaining_count = self._count  # This is only valid for buy transactions.
         self._share_price = Decimal(share_price).quantize(IMPORT_PRECISION)  # 'cause pandas stores it in doubles (TODO)
-        self._currency = check_currency(currency)
-        self._fee_currency = check_currency(fee_currency)
-        self._fee = Decimal(fee).quantize(IMPORT_PRECISION) if not math.isnan(fee) else Decimal(0)
+        self._currency = currency  # Checked by validation.validate_trades (or transactions_from_records).
+        self._fee_currency = fee_currency
+        self._fee = Decimal(fee).quantize(IMPORT_PRECISION) if fee is not None and not math.isnan(fee) else Decimal(0)
 
-        self._fee_available = True  # Not used for sale transactions
         self._split_ratio = Decimal(1)
         self._bep = None
 
@@ -45,12 +56,6 @@ class Transaction:
     def count(self) -> int:
         return self._count
 
-    @property
-    def remaining_count(self) -> int:
-        if self.is_sale:
-            raise ValueError("Remaining count not applicable to sell transactions.")
-        return self._remaining_count
-
     @property
     def time(self) -> datetime:
         return self._time
@@ -78,50 +83,65 @@ class Transaction:
     @property
     def bep(self) -> decimal:
         return self._bep
-    
-    def set_bep(self, bep: decimal):
-        self._bep = bep
 
-    def consume_shares(self, number_sold: int) -> bool:
-        if number_sold < 1:
-            raise ValueError(f"Number sold < 1: {number_sold}")
-
-        if self._remaining_count < 1:
-            raise ValueError(f"Remaining count is 0 (or less): {self._remaining_count}")
-
-        if number_sold > self._remaining_count:
-            raise ValueError(f"Cannot mark {number_sold} shares as sold, only {self._remaining_count} remaining!")
-
-        self._remaining_count -= number_sold
+    @property
+    def transaction(self) -> 'Transaction':
+        """The trade record itself; ``lot_state.Lot`` views return the transaction they wrap."""
+        return self
 
-        if self._fee_available:
-            self._fee_available = False
-            return True
-        else:
-            return False
+    def with_bep(self, bep: decimal) -> 'Transaction':
+        tx = copy.copy(self)
+        tx._bep = bep
+        return tx
 
-    def apply_split(self, numerator: int, denominator: int) -> None:
-        """Scale share count / price by *numerator/denominator* (in-place)."""
+    def with_split(self, numerator: int, denominator: int) -> 'Transaction':
+        """Copy with share count / price scaled by *numerator/denominator*."""
         if numerator == denominator:
-            return
-        
+            return self
+
         # must stay integral
         if (self._count * numerator) % denominator:
             raise ValueError(f"split leaves fractional share in {self}")
-        
-        self._count = self._count * numerator // denominator
-        self._split_ratio = self._split_ratio * numerator / denominator
-        
-        if not self.is_sale:
-            self._remaining_count = self._remaining_count * numerator // denominator
-        
+
+        tx = copy.copy(self)
+        tx._count = self._count * numerator // denominator
+        tx._split_ratio = self._split_ratio * numerator / denominator
+
         factor = Decimal(denominator) / Decimal(numerator)
-        self._share_price = (self._share_price * factor).quantize(IMPORT_PRECISION)
+        tx._share_price = (self._share_price * factor).quantize(IMPORT_PRECISION)
+        return tx
+
+
+def transactions_from_records(records: Iterable[Mapping[str, Any]], *,
+                              option_contract: bool = False) -> List[Transaction]:
+    """
+    Build Transactions from plain mappings (csv.DictReader rows, JSON objects, ...), no pandas needed.
+
+    Keys follow the Transaction constructor. ``time`` may also be an ISO string, ``fee`` defaults to zero
+    and ``fee_currency`` to ``currency``. The result is sorted chronologically, like the converters do.
+    """
+    txs = []
+    for rec in records:
+        time = rec['time']
+        if isinstance(time, str):
+            time = datetime.fromisoformat(time)
+        txs.append(Transaction(
+            time=time,
+            product_name=rec['product_name'],
+            isin=rec.get('isin', rec['product_name']),
+            count=int(Decimal(str(rec['count']))),
+            share_price=Decimal(str(rec['share_price'])),
+            currency=check_currency(rec['currency']),
+            fee=Decimal(str(rec.get('fee') or 0)),
+            fee_currency=check_currency(rec.get('fee_currency') or rec['currency']),
+            option_contract=option_contract,
+        ))
+    return sorted(txs, key=lambda t: t.time)
 
 
 class BuyRecord:
     def __init__(self, buy_t: Transaction, count_consumed: int, fee_consumed: bool, is_short_cover: bool = False):
-        self.buy_t = buy_t
+        self.buy_t = buy_t.transaction  # Unwraps lot views.
         self._count_consumed = count_consumed
         self._fee_consumed = fee_consumed
         self._is_short_cover = is_short_cover
@@ -154,9 +174,12 @@ class BuyRecord:
     def pass_time_test(self):
         self._time_test_passed = True
 
-    def calculate_cost(self):
+    def calculate_cost(self, share_price: decimal = None):
+        """*share_price* overrides the buy price (BEP mode)."""
+        if share_price is None:
+            share_price = self.buy_t.share_price
         self._fx_rate = unified_fx_rate(self.buy_t.time.year, self.buy_t.currency)
-        self._cost_tc = self.buy_t.share_price * self._fx_rate * self._count_consumed * self.buy_t._multiplier
+        self._cost_tc = share_price * self._fx_rate * self._count_consumed * self.buy_t._multiplier
 
         self._fees_tc = self.buy_t.fee * unified_fx_rate(self.buy_t.time.year, self.buy_t.fee_currency) if self._fee_consumed \
             else Decimal(0)
@@ -231,12 +254,10 @@ class SaleRecord:
 
             pair_income = self._calculate_income_for_buy_sell_pair(buy_rec)
 
-            if enable_bep:  # BEP hack
-                buy_rec.buy_t._share_price = self.sale_t.bep
-
-            buy_rec.calculate_cost()
+            # BEP mode costs every pair at the break-even price of the sale.
+            buy_rec.calculate_cost(self.sale_t.bep if enable_bep else None)
 
-            ttest_passed = (self.sale_t.time - buy_rec.buy_t.time).days > 3 * 365
+            ttest_passed = passes_time_test(buy_rec.buy_t.time, self.sale_t.time)
             if ttest_passed:
                 buy_rec.pass_time_test()
                 pair_profit = (pair_income - buy_rec.cost_tc).quantize(Decimal("0.01"))
@@ -1,3 +1,4 @@
+from timeline import time_order
 from transaction import Transaction
 from pandas import DataFrame
 from typing import List
@@ -9,11 +10,9 @@ def convert_to_transactions_ibkr(
     *,
     options: bool,
 ) -> List[Transaction]:
-    df_sym = (
-        df_trans[df_trans["Symbol"] == symbol]
-        .sort_values("Date/Time")
-        .reset_index(drop=True)
-    )
+    """Transactions of one symbol up to *tax_year*; the rows are expected to pass validation.validate_trades."""
+    df_sym = df_trans[df_trans["Symbol"] == symbol]
+    df_sym = df_sym.iloc[time_order(df_sym["Date/Time"])].reset_index(drop=True)
 
     print(f"Filtered {len(df_sym)} transaction(s) for symbol: {symbol}")
 
@@ -23,11 +22,6 @@ def convert_to_transactions_ibkr(
         if row["Date/Time"].year > tax_year:
             break
 
-        fee = -row["Comm/Fee"]
-        if fee < 0:
-            print(f"Warning: Negative fee: {fee}, Symbol: {symbol}, Date/Time: {row['Date/Time']}, Price: {row['T. Price']}")
-            # raise ValueError("Unexpected negative fee!")
-
         txs.append(Transaction(
             time=row["Date/Time"],
             product_name=symbol,  # For now use symbol as product name
@@ -35,7 +29,7 @@ def convert_to_transactions_ibkr(
             count=row["Quantity"],
             share_price=row["T. Price"],
             currency=row["Currency"],
-            fee=fee,
+            fee=-row["Comm/Fee"],
             fee_currency=row["Currency"],
             option_contract=options,
         ))
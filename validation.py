@@ -0,0 +1,106 @@
+"""
+Validation of imported trades before their conversion to Transactions.
+
+``validate_trades`` checks the whole Degiro or IBKR frame in one pass of column-wise masks: unparseable
+dates, missing or zero quantities, missing prices, currencies without a unified FX rate for the trade
+year, unexpected fee currencies and negative fees. All problems are collected in one report; products
+with errors then fail their conversion with the collected messages, so the converters do no per-row
+checks. IBKR negative fees (rebates) are warnings only.
+"""
+from __future__ import annotations
+
+from typing import Dict, List
+
+import pandas as pd
+from pandas import DataFrame
+
+from currency import FIRST_YEAR, last_rate_year
+from import_deg import FEE_COLUMN, FEE_CURRENCY, currency_columns
+from import_utils import detect_columns
+
+ERROR = "error"
+WARNING = "warning"
+
+class ValidationReport:
+    def __init__(self, problems: DataFrame, id_col: str):
+        self.problems = problems  # One row per problem: row, id_col, time, column, value, problem, severity.
+        self.id_col = id_col
+
+    def __len__(self) -> int:
+        return len(self.problems)
+
+    @property
+    def errors(self) -> DataFrame:
+        return self.problems[self.problems["severity"] == ERROR]
+
+    @property
+    def warnings(self) -> DataFrame:
+        return self.problems[self.problems["severity"] == WARNING]
+
+    def product_errors(self) -> Dict[str, str]:
+        """Products with errors -> one message listing all of them."""
+        return {pid: f"{len(rows)} invalid trade(s): "
+                     + "; ".join(f"{t}: {p} ({c}={v})" for t, p, c, v in
+                                 zip(rows["time"], rows["problem"], rows["column"], rows["value"]))
+                for pid, rows in self.errors.groupby(self.id_col, sort=False)}
+
+    def print(self) -> None:
+        if self.problems.empty:
+            return
+        print(f"*** {len(self.errors)} error(s) and {len(self.warnings)} warning(s) in imported trades ***")
+        print(self.problems.to_string(index=False), "\n")
+
+
+def _degiro_checks(df: DataFrame) -> List[tuple]:
+    currency_col, fee_currency_col = currency_columns(df)
+    fee_currency = df[fee_currency_col]
+    return [
+        ("Quantity", df["Quantity"].isna(), "missing quantity", ERROR),
+        ("Quantity", df["Quantity"] == 0, "zero quantity", ERROR),
+        ("Price", df["Price"].isna(), "missing price", ERROR),
+        (currency_col, _no_fx_rate(df[currency_col], df["DateTime"]), "no FX rate", ERROR),
+        (fee_currency_col, fee_currency.notna() & (fee_currency != FEE_CURRENCY),
+         "unexpected fee currency", ERROR),
+        (FEE_COLUMN, df[FEE_COLUMN] > 0, "negative fee", ERROR),  # Fees are negative in exports.
+    ]
+
+
+def _ibkr_checks(df: DataFrame) -> List[tuple]:
+    return [
+        ("Quantity", df["Quantity"].isna(), "missing quantity", ERROR),
+        ("Quantity", df["Quantity"] == 0, "zero quantity", ERROR),
+        ("T. Price", df["T. Price"].isna(), "missing price", ERROR),
+        ("Currency", _no_fx_rate(df["Currency"], df["Date/Time"]), "no FX rate", ERROR),
+        ("Comm/Fee", df["Comm/Fee"] > 0, "negative fee", WARNING),
+    ]
+
+
+def _no_fx_rate(currency: pd.Series, time: pd.Series) -> pd.Series:
+    """Rows whose currency has no unified rate in the trade's year (rows without a date are not judged)."""
+    last_year = currency.astype(object).map({c: last_rate_year(c) for c in currency.dropna().unique()})
+    year = time.dt.year
+    return currency.isna() | (time.notna() & ((year < FIRST_YEAR) | (year > last_year)))
+
+
+def validate_trades(df: DataFrame, tax_year: int = None) -> ValidationReport:
+    """Check all rows of an imported frame (up to *tax_year*, when given) at once."""
+    id_col, date_col, _ = detect_columns(df)
+    time = df[date_col]
+    checks = [(date_col, time.isna(), "unparseable date", ERROR)]
+    checks += _degiro_checks(df) if id_col == "ISIN" else _ibkr_checks(df)
+
+    in_scope = time.isna() | (time.dt.year <= tax_year) if tax_year is not None else True
+    frames = []
+    for column, mask, problem, severity in checks:
+        rows = df[(mask & in_scope).to_numpy()]
+        if not rows.empty:
+            frames.append(DataFrame({
+                "row": rows.index, id_col: rows[id_col].to_numpy(), "time": rows[date_col].to_numpy(),
+                "column": column, "value": rows[column].to_numpy(), "problem": problem, "severity": severity,
+            }))
+    if not frames:
+        problems = DataFrame(columns=["row", id_col, "time", "column", "value", "problem", "severity"])
+    else:
+        problems = pd.concat(frames, ignore_index=True).sort_values(["row", "column"], kind="stable",
+                                                                    ignore_index=True)
+    return ValidationReport(problems, id_col)
@@ -0,0 +1,72 @@
+"""
+Polling watcher of broker statement folders.
+
+``StatementWatcher.poll`` reports CSV files that are new or changed (by size and mtime) since the last
+poll, ``ingest`` imports them with the Degiro or IBKR importer and keeps only rows that are not loaded
+yet. Rows are matched by the hash of their natural key (``dedup.trade_hashes``) and counted per file, so
+re-exported or overlapping statements add nothing while identical fills within one statement stay
+separate rows.
+
+Both statement formats are re-read as a whole (IBKR files are sectioned, Degiro lists the newest trades
+first), only the returned new rows need further processing.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from pandas import DataFrame
+
+
+class StatementWatcher:
+    def __init__(self, dirs: Iterable[str | Path], *, deg: bool, options: bool = False, pattern: str = "*.csv"):
+        self.dirs = [Path(d) for d in dirs]
+        self.deg = deg
+        self.options = options
+        self.pattern = pattern
+        self.df: DataFrame | None = None                   # All rows loaded so far.
+        self._stamps: Dict[Path, Tuple[int, int]] = {}      # file -> (mtime_ns, size) when last ingested
+        self._loaded: Dict[int, int] = {}                   # row hash -> occurrences loaded
+
+    def poll(self) -> List[Path]:
+        """New or changed statement files, in name order."""
+        changed = []
+        for d in self.dirs:
+            for path in sorted(d.glob(self.pattern)):
+                st = path.stat()
+                if self._stamps.get(path) != (st.st_mtime_ns, st.st_size):
+                    changed.append(path)
+        return changed
+
+    def _import(self, path: Path) -> DataFrame:
+        if self.deg:
+            from import_deg import import_transactions
+            return import_transactions(str(path))
+        from import_ibkr import import_ibkr_stock_transactions, import_ibkr_option_transactions
+        return import_ibkr_option_transactions([path]) if self.options else import_ibkr_stock_transactions([path])
+
+    def ingest(self, paths: Iterable[Path]) -> DataFrame:
+        """Import *paths*, append the rows not loaded yet to ``df`` and return them."""
+        import pandas as pd
+        from dedup import trade_hashes
+
+        new_frames = []
+        for path in paths:
+            st = path.stat()
+            df = self._import(path).reset_index(drop=True)
+            hashes = trade_hashes(df)
+            occurrence = hashes.groupby(hashes).cumcount()
+            loaded = hashes.map(lambda h: self._loaded.get(h, 0))
+            new_rows = df[(occurrence >= loaded).to_numpy()]
+            for h, count in hashes.value_counts().items():
+                self._loaded[h] = max(self._loaded.get(h, 0), count)
+            self._stamps[path] = (st.st_mtime_ns, st.st_size)
+
+            print(f"{path.name}: {len(new_rows)} new of {len(df)} rows")
+            new_frames.append(new_rows)
+
+        new = pd.concat(new_frames, ignore_index=True) if new_frames else pd.DataFrame()
+        if not new.empty:
+            self.df = new if self.df is None else pd.concat([self.df, new], ignore_index=True)
+        return new